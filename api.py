@@ -0,0 +1,355 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Local HTTP API for the calculator, using only the standard library.
+#
+#   python api.py --port 8000
+#
+#   POST /calculate   a JSON object of inputs for one home, or a list of them;
+#                     returns the costs, emissions and energy of each case
+#   GET  /health      {"status": "ok"}
+#   GET  /stats       requests, batches and result cache counts
+#   GET  /metrics     stage timings and counters in the Prometheus text format (--metrics)
+#
+# Adding ?profile=1 to /calculate samples the server's threads while the request
+# is handled and returns {"results": ..., "profile": [[function, samples, own samples], ...]}.
+#
+# Inputs are named as the engine inputs (see engine.DEFAULTS, which the page's
+# Basic and Advanced Settings fill in), missing ones take the page defaults, and EV
+# use can be given as in batch.py.  Homes submitted within BATCH_WINDOW of each
+# other are calculated together in one engine call on a worker thread, so the event
+# loop keeps accepting requests while a batch runs, and results are cached by
+# input key, in memory and optionally on disk (--cache) between runs.
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import engine
+import metrics
+from batch import INPUT_COLUMNS, engine_inputs
+from cache import TieredCache, canonical_inputs, canonical_key, constants_key
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+#seconds a home waits for others to share its engine call
+BATCH_WINDOW = 0.002
+#homes per engine call, a batch is calculated straight away once this full
+MAX_BATCH = 4096
+MAX_BODY_BYTES = 1 << 20
+RESULT_CACHE_SIZE = 4096
+
+#(min, max) of each numeric input, as the page's widgets allow (in the engine's
+#units, so percentages are fractions); boiler efficiencies are divided by, so start
+#above 0 as in uncertainty.BOUNDS
+INPUT_RANGES = {'elec_total_kWh': (0, 100000), 'gas_total_kWh': (0, 100000), 'hw_lday': (0, 1000),
+                'gas_cook_kWhweek': (0, 100), 'elec_ev_kWh': (0, 100*10*52), 'ev_kWh_per_charge': (0, 100),
+                'ev_charges_per_week': (0, 10), 'second_heatsource_kWh': (0, 100000), 'efficiency_boost': (0, 1),
+                'n_tariff_states': (1, 3), 'gas_stand': (0, 100), 'gas_unit': (0, 100), 'elec_stand': (0, 100),
+                'elec_unit': (0, 100), 'elec_unit2': (0, 100), 'elec_unit3': (0, 100),
+                'second_tariff_hours': (1, 12), 'third_tariff_hours': (1, 12),
+                'pc_elec_second_tariff': (0, 1), 'pc_elec_third_tariff': (0, 1),
+                'elec_unit_cosy_standard': (0, 100), 'elec_unit_cosy_offpeak': (0, 100),
+                'elec_unit_cosy_peak': (0, 100), 'cosy_second_tariff_hours': (1, 12),
+                'cosy_third_tariff_hours': (1, 12), 'boiler_heat_eff': (0.01, 1), 'boiler_hw_eff': (0.01, 1),
+                'hp_heat_scop_typ': (0.1, 10), 'hp_hw_cop_typ': (0.1, 10), 'hp_heat_scop_hi': (0.1, 10),
+                'hp_hw_cop_hi': (0.1, 10), 'hw_temp_raise': (1, 100)}
+#inputs that must be whole numbers
+INTEGER_INPUTS = {'n_tariff_states'}
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+def parse_inputs(values):
+    """
+    values - JSON object of inputs for one home
+    returns dict of every engine input, as cache.canonical_inputs
+    raises ValueError if values aren't valid inputs
+    """
+    if not isinstance(values, dict):
+        raise ValueError('inputs must be a JSON object')
+    unknown = sorted(set(values) - INPUT_COLUMNS)
+    if unknown:
+        raise ValueError(f'unknown inputs: {", ".join(unknown)}')
+    for name, val in values.items():
+        if name in engine.FLAG_INPUTS:
+            if not isinstance(val, bool):
+                raise ValueError(f'{name} must be true or false')
+        elif name == 'second_heatsource_type':
+            if isinstance(val, str):
+                if val not in engine.SECOND_HEATSOURCE_TYPES:
+                    raise ValueError(f'{name} must be one of {", ".join(engine.SECOND_HEATSOURCE_TYPES)}')
+            elif isinstance(val, bool) or not isinstance(val, int) or not 0 <= val < len(engine.SECOND_HEATSOURCE_TYPES):
+                raise ValueError(f'{name} must be one of {", ".join(engine.SECOND_HEATSOURCE_TYPES)} or its index')
+        else:
+            if isinstance(val, bool) or not isinstance(val, (int, float)) or not math.isfinite(val):
+                raise ValueError(f'{name} must be a finite number')
+            low, high = INPUT_RANGES[name]
+            if not low <= val <= high:
+                raise ValueError(f'{name} must be between {low} and {high}')
+            if name in INTEGER_INPUTS and val != int(val):
+                raise ValueError(f'{name} must be a whole number')
+    try:
+        return canonical_inputs(engine_inputs(values))
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f'invalid inputs: {exc}') from None
+
+
+def result_dicts(results):
+    """
+    results - output of engine.calculate
+    returns list with a dict per household of case name to its 'energy' and
+    'emissions' by ENERGY_BREAKDOWNS, 'costs' by COST_BREAKDOWNS and totals
+    """
+    cases = {}
+    for case in engine.CASE_NAMES:
+        res = results[case]
+        cases[case] = [res['energy'].T.tolist(), res['emissions'].T.tolist(), res['costs'].T.tolist()] + \
+            [res[key].tolist() for key in ('energy_total', 'emissions_total', 'costs_total')]
+    n = len(cases[engine.CASE_NAMES[0]][0])
+    return [{case: {'energy': dict(zip(engine.ENERGY_BREAKDOWNS, energy[i])),
+                    'emissions': dict(zip(engine.ENERGY_BREAKDOWNS, emissions[i])),
+                    'costs': dict(zip(engine.COST_BREAKDOWNS, costs[i])),
+                    'energy_total': energy_total[i], 'emissions_total': emissions_total[i],
+                    'costs_total': costs_total[i]}
+             for case, (energy, emissions, costs, energy_total, emissions_total, costs_total) in cases.items()}
+            for i in range(n)]
+
+
+def _calculate_batch(canonical):
+    with metrics.span('api.batch'):
+        columns = {name: np.array([values[name] for values in canonical]) for name in engine.DEFAULTS}
+        results = result_dicts(engine.calculate(columns))
+    metrics.count('homes', len(canonical))
+    return results
+
+
+class Batcher:
+    """
+    Calculates homes submitted within window seconds of each other in one engine call
+    """
+
+    def __init__(self, window=BATCH_WINDOW, max_batch=MAX_BATCH, cache_size=RESULT_CACHE_SIZE, cache_path=None):
+        self.window = window
+        self.max_batch = max_batch
+        self.cache = TieredCache(cache_size, cache_path)
+        #the engine's constants don't change while serving
+        self._stamp = constants_key()
+        self.requests = 0
+        self.batches = 0
+        self.calculated = 0
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='engine')
+
+    async def calculate(self, canonical):
+        """
+        canonical - inputs of one home, from parse_inputs
+        returns result dict of the home, as result_dicts
+        """
+        self.requests += 1
+        key = canonical_key(canonical, self._stamp)
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((key, canonical, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.get_running_loop().create_task(self._run(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, pending):
+        #the same home submitted twice in a batch is calculated once
+        unique = {}
+        for key, canonical, _ in pending:
+            unique.setdefault(key, canonical)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._executor, _calculate_batch, list(unique.values()))
+        except Exception as exc:
+            for _, _, future in pending:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        by_key = dict(zip(unique, results))
+        for key, result in by_key.items():
+            self.cache.put(key, result)
+        for key, _, future in pending:
+            if not future.done():
+                future.set_result(by_key[key])
+        self.batches += 1
+        self.calculated += len(unique)
+
+    def stats(self):
+        """
+        returns dict of requests, batches, homes calculated, mean batch size and cache stats
+        """
+        return {'requests': self.requests, 'batches': self.batches, 'calculated': self.calculated,
+                'mean_batch': self.calculated/self.batches if self.batches else 0.0,
+                'cache': self.cache.stats()}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+async def route(method, path, body, batcher):
+    """
+    returns HTTP status and JSON-able response for a request
+    """
+    path, _, query = path.partition('?')
+    if path == '/calculate':
+        if method != 'POST':
+            return 405, {'error': 'use POST'}
+        try:
+            data = json.loads(body or b'null')
+            items = data if isinstance(data, list) else [data]
+            canonical = [parse_inputs(item) for item in items]
+        except ValueError as exc:
+            return 400, {'error': str(exc)}
+        metrics.count('requests')
+        profiler = metrics.Profiler().start() if 'profile=1' in query.split('&') else None
+        try:
+            with metrics.span('api.calculate'):
+                results = await asyncio.gather(*(batcher.calculate(values) for values in canonical))
+        except Exception as exc:
+            return 500, {'error': f'{type(exc).__name__}: {exc}'}
+        finally:
+            if profiler is not None:
+                profiler.stop()
+        results = results if isinstance(data, list) else results[0]
+        if profiler is not None:
+            return 200, {'results': results, 'profile': profiler.top()}
+        return 200, results
+    if path in ('/health', '/stats', '/metrics'):
+        if method != 'GET':
+            return 405, {'error': 'use GET'}
+        if path == '/metrics':
+            return 200, metrics.prometheus_text()
+        return 200, {'status': 'ok'} if path == '/health' else batcher.stats()
+    return 404, {'error': f'no such path {path}'}
+
+
+def _response(status, payload, keep_alive):
+    #text payloads are the Prometheus metrics, everything else is JSON
+    if isinstance(payload, str):
+        body, content_type = payload.encode(), metrics.CONTENT_TYPE
+    else:
+        try:
+            body = json.dumps(payload, separators=(',', ':'), allow_nan=False).encode()
+        except ValueError:
+            #NaN and Infinity aren't JSON
+            status, body = 500, b'{"error":"result is not a finite number"}'
+        content_type = 'application/json'
+    head = (f'HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: {content_type}\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+    return head.encode() + body
+
+
+async def handle_connection(reader, writer, batcher):
+    """
+    serves the requests of one connection, kept open between requests unless the
+    client asks to close it
+    """
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                break
+            request_line, *header_lines = head.decode('latin-1').rstrip('\r\n').split('\r\n')
+            headers = {}
+            for line in header_lines:
+                name, _, val = line.partition(':')
+                headers[name.strip().lower()] = val.strip()
+            try:
+                method, path, version = request_line.split(' ')
+                length = int(headers.get('content-length', 0))
+            except ValueError:
+                writer.write(_response(400, {'error': 'malformed request'}, False))
+                break
+            if length > MAX_BODY_BYTES:
+                writer.write(_response(413, {'error': f'body over {MAX_BODY_BYTES} bytes'}, False))
+                break
+            body = await reader.readexactly(length) if length else b''
+            keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+            status, payload = await route(method, path, body, batcher)
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, window=BATCH_WINDOW, max_batch=MAX_BATCH, cache_path=None):
+    batcher = Batcher(window, max_batch, cache_path=cache_path)
+    server = await asyncio.start_server(lambda reader, writer: handle_connection(reader, writer, batcher),
+                                        host, port)
+    print(f'listening on http://{host}:{port}', file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batcher.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the calculator over HTTP.')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--window', type=float, default=BATCH_WINDOW*1000,
+                        help='milliseconds a request waits for others to share its engine call')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help='most homes per engine call')
+    parser.add_argument('--cache', help='sqlite file keeping results between runs')
+    parser.add_argument('--metrics', action='store_true', help='record stage timings and counters for /metrics')
+    args = parser.parse_args(argv)
+    if args.metrics:
+        metrics.enable()
+    try:
+        asyncio.run(serve(args.host, args.port, args.window/1000, args.max_batch, args.cache))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Command-line batch run of the calculator over a file of households.
+#
+#   python batch.py homes.csv results.parquet --chunk-size 100000
+#
+# The input (CSV or Parquet) has one row per home, with columns named as the
+# engine inputs (see engine.DEFAULTS) - missing columns and empty cells take the
+# page defaults.
+# EV use can be given as 'ev_kWh_per_charge' and 'ev_charges_per_week' instead
+# of 'elec_ev_kWh'.  Rows are read, calculated and written a chunk at a time, so
+# memory depends on the chunk size and not on the size of the file.  The output
+# has the Case / Breakdown layout of helper.generate_df, one row per home, case
+# and breakdown.  Parquet files need pyarrow.
+#
+# With --workers the chunks are spread over a process pool (or a thread pool
+# with --executor thread), results are written in input order and throughput
+# is reported for each worker.
+#
+# With --cache the energy use of each chunk is kept in an sqlite file (see
+# cache.cached_calculate), so re-running the same homes after changing only
+# prices or tariffs recomputes just their costs.
+#
+# --metrics writes the chunk and engine stage timings and counters in the
+# Prometheus text format when the run ends (e.g. for node_exporter's textfile
+# collector), and --profile samples the run's stacks into a file for flame graph
+# tools.  Engine stages are timed in this process only, so not with --workers.
+
+import argparse
+import collections
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import cache
+import engine
+import metrics
+from columnar import ResultTable
+
+#the page's EV inputs, used when elec_ev_kWh isn't given
+EV_DEFAULTS = {'ev_kWh_per_charge': 30, 'ev_charges_per_week': 0}
+EV_COLUMNS = list(EV_DEFAULTS)
+INPUT_COLUMNS = set(engine.DEFAULTS) | set(EV_COLUMNS)
+DEFAULT_CHUNK_SIZE = 100000
+#chunks of energy results each process keeps in memory in front of the --cache file
+CHUNK_CACHE_SIZE = 4
+
+_stores = {}
+
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1].lower() in ('.parquet', '.pq')
+
+
+def read_chunks(path, chunk_size, id_column=None, extra_columns=()):
+    """
+    path - CSV or Parquet file of households
+    chunk_size - number of households per chunk
+    id_column - optional column identifying each home, read along with the inputs
+    extra_columns - other columns to read along with the inputs, e.g. a region
+    yields dict of column name to 1d array for each chunk, holding only input columns
+    and those asked for
+    """
+    wanted = INPUT_COLUMNS | ({id_column} if id_column else set()) | set(extra_columns)
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        columns = [name for name in parquet_file.schema_arrow.names if name in wanted]
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield {name: batch.column(i).to_numpy(zero_copy_only=False) for i, name in enumerate(batch.schema.names)}
+    else:
+        for df in pd.read_csv(path, chunksize=chunk_size, usecols=lambda name: name in wanted):
+            yield {name: df[name].to_numpy() for name in df.columns}
+
+
+def engine_inputs(chunk):
+    """
+    chunk - dict of input columns, as from read_chunks
+    returns mapping of engine inputs, with missing values taken from
+    engine.DEFAULTS (and EV_DEFAULTS)
+    """
+    defaults = dict(engine.DEFAULTS, **EV_DEFAULTS)
+    chunk = {name: val for name, val in chunk.items() if name in defaults}
+    for name, val in chunk.items():
+        #an empty cell is read as NaN, which would be cast to True, code 0 or give NaN results
+        missing = pd.isna(val)
+        if np.any(missing):
+            default = defaults[name]
+            if name == 'second_heatsource_type' and np.asarray(val).dtype.kind in 'OSU':
+                default = engine.SECOND_HEATSOURCE_TYPES[default]
+            chunk[name] = np.where(missing, default, val)
+    inputs = {name: val for name, val in chunk.items() if name in engine.DEFAULTS}
+    if 'elec_ev_kWh' not in inputs and any(name in chunk for name in EV_COLUMNS):
+        #as on the page - energy per charge * charges per week * 52 weeks
+        inputs['elec_ev_kWh'] = chunk.get('ev_kWh_per_charge', EV_DEFAULTS['ev_kWh_per_charge']) * \
+            chunk.get('ev_charges_per_week', EV_DEFAULTS['ev_charges_per_week']) * 52
+    return inputs
+
+
+def _store(path):
+    #one store per process, opened by the first chunk that uses it
+    if path not in _stores:
+        _stores[path] = cache.TieredCache(CHUNK_CACHE_SIZE, path)
+    return _stores[path]
+
+
+def calculate_chunk(chunk, start=0, id_column=None, cache_path=None):
+    """
+    chunk - dict of input columns, as from read_chunks
+    start - row number of the first home in the chunk, used as its label if no id_column
+    id_column - column labelling each home
+    cache_path - sqlite file keeping the energy use of chunks between runs
+    returns long table of results for the chunk, see engine.result_columns
+    """
+    n = max((np.size(val) for val in chunk.values()), default=0)
+    home = chunk[id_column] if id_column else np.arange(start, start + n)
+    inputs = engine_inputs(chunk)
+    results = cache.cached_calculate(inputs, _store(cache_path)) if cache_path else engine.calculate(inputs)
+    return engine.result_columns(results, home)
+
+
+def _timed_calculate_chunk(chunk, start, id_column, cache_path=None):
+    t = time.perf_counter()
+    columns = calculate_chunk(chunk, start, id_column, cache_path)
+    worker = f'{os.getpid()}/{threading.current_thread().name}'
+    return columns, worker, time.perf_counter() - t
+
+
+def _numbered(chunks):
+    start = 0
+    for chunk in chunks:
+        yield chunk, start
+        start += max((np.size(val) for val in chunk.values()), default=0)
+
+
+def calculate_chunks(chunks, id_column=None, workers=1, executor='process', worker_stats=None, cache_path=None):
+    """
+    chunks - iterable of dicts of input columns, as from read_chunks
+    id_column - column labelling each home
+    cache_path - sqlite file keeping the energy use of chunks between runs
+    workers - number of worker processes (or threads), 1 to calculate in this process
+    executor - 'process' or 'thread'
+    worker_stats - optional dict, filled with worker name: [homes, busy seconds]
+    yields long table of results for each chunk, in input order
+    """
+    if worker_stats is None:
+        worker_stats = {}
+    n_rows = len(engine.CASE_NAMES)*len(engine.BREAKDOWNS)
+
+    def collect(result):
+        columns, worker, seconds = result
+        homes = len(columns['home']) // n_rows
+        stats = worker_stats.setdefault(worker, [0, 0.0])
+        stats[0] += homes
+        stats[1] += seconds
+        metrics.observe('batch.chunk', seconds)
+        metrics.count('requests')
+        metrics.count('homes', homes)
+        return columns
+
+    if workers <= 1:
+        for chunk, start in _numbered(chunks):
+            yield collect(_timed_calculate_chunk(chunk, start, id_column, cache_path))
+        return
+
+    pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+    with pool_class(workers) as pool:
+        #keep a couple of chunks per worker in flight, so memory stays bounded by
+        #the chunk size while results are taken in the order they were submitted
+        pending = collections.deque()
+        for chunk, start in _numbered(chunks):
+            pending.append(pool.submit(_timed_calculate_chunk, chunk, start, id_column, cache_path))
+            if len(pending) >= 2*workers:
+                yield collect(pending.popleft().result())
+        while pending:
+            yield collect(pending.popleft().result())
+
+
+class ResultWriter:
+    """
+    Appends chunks of results to a CSV or Parquet file, writing Case and
+    Breakdown as their labels (dictionary encoded in Parquet)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+        self._is_parquet = _is_parquet(path)
+        if not self._is_parquet:
+            self._file = open(path, 'w', newline='')
+
+    def write(self, columns):
+        table = ResultTable(columns)
+        if self._is_parquet:
+            import pyarrow.parquet as pq
+
+            batch = table.record_batch()
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, batch.schema)
+            self._writer.write_batch(batch)
+        else:
+            table.frame().to_csv(self._file, header=self._writer is None, index=False)
+            self._writer = True
+
+    def close(self):
+        if self._is_parquet:
+            if self._writer is not None:
+                self._writer.close()
+        else:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run(input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE, id_column=None, workers=1, executor='process',
+        worker_stats=None, cache_path=None):
+    """
+    input_path, output_path - CSV or Parquet files of households and results
+    chunk_size - number of households held in memory at a time (per worker)
+    id_column - input column labelling each home in the output, default row number
+    workers, executor, worker_stats, cache_path - see calculate_chunks
+    returns number of households calculated
+    """
+    n = 0
+    chunks = read_chunks(input_path, chunk_size, id_column)
+    with ResultWriter(output_path) as writer:
+        for columns in calculate_chunks(chunks, id_column, workers, executor, worker_stats, cache_path):
+            with metrics.span('batch.write'):
+                writer.write(columns)
+            n += len(columns['home']) // (len(engine.CASE_NAMES)*len(engine.BREAKDOWNS))
+    return n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Calculate heat pump running costs and emissions for a file of homes.')
+    parser.add_argument('input', help='CSV or Parquet file, one row per home')
+    parser.add_argument('output', help='CSV or Parquet file for the results')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='homes calculated at a time')
+    parser.add_argument('--id-column', help='input column identifying each home (default: row number)')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes or threads (default: 1, no pool)')
+    parser.add_argument('--executor', choices=['process', 'thread'], default='process', help='kind of worker pool')
+    parser.add_argument('--cache', help='sqlite file keeping energy use between runs, so price changes re-run quickly')
+    parser.add_argument('--metrics', help='file for stage timings and counters in the Prometheus text format')
+    parser.add_argument('--profile', help='file for the sampled stacks of the run, in collapsed flame graph format')
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        metrics.enable()
+    profiler = metrics.Profiler().start() if args.profile else None
+    worker_stats = {}
+    t = time.perf_counter()
+    try:
+        n = run(args.input, args.output, args.chunk_size, args.id_column, args.workers, args.executor, worker_stats,
+                args.cache)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            with open(args.profile, 'w') as f:
+                f.write(profiler.collapsed())
+    t = time.perf_counter() - t
+    if args.metrics:
+        with open(args.metrics, 'w') as f:
+            f.write(metrics.prometheus_text())
+    for worker, (homes, seconds) in sorted(worker_stats.items()):
+        print(f'  worker {worker}: {homes:,} homes in {seconds:.1f} s ({homes/max(seconds, 1e-9):,.0f} homes/s)',
+              file=sys.stderr)
+    print(f'{n:,} homes in {t:.1f} s ({n/max(t, 1e-9):,.0f} homes/s)', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+
+# Load generator for api.py: starts the server in a subprocess (or uses a running
+# one with --port), sends single-home requests from many keep-alive connections
+# at once and reports throughput, p50/p99 latency and how the server batched them.
+#
+#   python benchmarks/bench_api.py [--requests 20000] [--concurrency 64] [--repeat]
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def _request(reader, writer, method, path, body=b''):
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+    head = await reader.readuntil(b'\r\n\r\n')
+    length = next(int(line.split(b':', 1)[1]) for line in head.split(b'\r\n')
+                  if line.lower().startswith(b'content-length:'))
+    status = int(head.split(b' ', 2)[1])
+    return status, await reader.readexactly(length)
+
+
+async def _client(port, bodies, latencies):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        for body in bodies:
+            t = time.perf_counter()
+            status, _ = await _request(reader, writer, 'POST', '/calculate', body)
+            latencies.append(time.perf_counter() - t)
+            if status != 200:
+                raise RuntimeError(f'status {status}')
+    finally:
+        writer.close()
+
+
+async def _get(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        return json.loads((await _request(reader, writer, 'GET', path))[1])
+    finally:
+        writer.close()
+
+
+async def _wait_ready(port, timeout=30):
+    start = time.perf_counter()
+    while True:
+        try:
+            return await _get(port, '/health')
+        except OSError:
+            if time.perf_counter() - start > timeout:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def run(port, n_requests, concurrency, repeat):
+    rng = np.random.default_rng(0)
+    gas = rng.uniform(5000, 25000, n_requests)
+    if repeat:
+        gas = np.round(gas, -3)
+    bodies = [json.dumps({'gas_total_kWh': float(g), 'elec_total_kWh': 3000, 'n_tariff_states': 2}).encode()
+              for g in gas]
+    await _wait_ready(port)
+    latencies = []
+    t = time.perf_counter()
+    await asyncio.gather(*(_client(port, bodies[i::concurrency], latencies) for i in range(concurrency)))
+    elapsed = time.perf_counter() - t
+    stats = await _get(port, '/stats')
+
+    ms = 1000*np.array(latencies)
+    print(f'{n_requests:,} requests, {concurrency} connections: {elapsed:.2f} s ({n_requests/elapsed:,.0f} requests/s)')
+    print(f'latency p50 {np.percentile(ms, 50):.1f} ms, p99 {np.percentile(ms, 99):.1f} ms, max {ms.max():.1f} ms')
+    print(f'server: {stats["batches"]:,} batches, mean {stats["mean_batch"]:.1f} homes, '
+          f'cache hit rate {stats["cache"]["hit_rate"]:.0%}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the HTTP API.')
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=64, help='connections sending requests at once')
+    parser.add_argument('--repeat', action='store_true', help='repeat inputs, so the result cache is used')
+    parser.add_argument('--port', type=int, help='port of a running server, default start one')
+    parser.add_argument('--window', type=float, help='batch window of the started server, ms')
+    args = parser.parse_args()
+
+    server = None
+    port = args.port
+    if port is None:
+        port = 18000 + os.getpid() % 1000
+        command = [sys.executable, os.path.join(ROOT, 'api.py'), '--port', str(port)]
+        if args.window is not None:
+            command += ['--window', str(args.window)]
+        server = subprocess.Popen(command, stderr=subprocess.DEVNULL)
+    try:
+        asyncio.run(run(port, args.requests, args.concurrency, args.repeat))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Memory allocated and time taken to turn results into tables, charts and Parquet:
+# the columnar.ResultTable path against building DataFrames.
+#
+#   python benchmarks/bench_columnar.py [--size 100k] [--repeat 5]
+#
+# page       one home's cost and energy tables and the records of its three charts,
+#            from lists of rows (one DataFrame per case, concatenated, zeros masked
+#            and the value column copied for the chart, as the page used to) and
+#            from a ResultTable
+# portfolio  the long results table of --size homes as a DataFrame and as an Arrow
+#            record batch, from a DataFrame of the columns (as batch.py used to) and
+#            from a ResultTable
+#
+# Python and NumPy allocations are traced with tracemalloc; Arrow's own are read
+# from its memory pool.  'peak MB' is the most held at once while building, over
+# what the inputs already held, 'held MB' what the result still holds.
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine
+import helper
+from columnar import ResultTable
+from corpus import SIZES, synthetic_homes
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t)
+    return min(times)
+
+
+def allocated(func):
+    """
+    returns (peak, held) bytes allocated by func over what was held before: the
+    most at once while it runs and what its result still holds
+    """
+    import pyarrow as pa
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        arrow_before = pa.total_allocated_bytes()
+        out = func()
+        held, peak = tracemalloc.get_traced_memory()
+        arrow = pa.total_allocated_bytes() - arrow_before
+    finally:
+        tracemalloc.stop()
+    del out
+    return peak - before + arrow, held - before + arrow
+
+
+def concat_frame(data_list, data_list_new, value_names):
+    #the tables as generate_df used to build them: a frame per case, concatenated,
+    #with the zeros masked over the whole frame
+    cols = ['Case', 'Breakdown'] + value_names
+    df = pd.concat([pd.DataFrame(data, columns=cols) for data in [data_list] + data_list_new])
+    df[df == 0] = np.NaN
+    return df
+
+
+def page_lists(results):
+    rows = {case: engine.case_rows(results, case) for case in engine.CASE_NAMES}
+    (energy, costs), others = rows[engine.CASE_NAMES[0]], [rows[case] for case in engine.CASE_NAMES[1:]]
+    df_costs = concat_frame(costs, [c for _, c in others], ['Costs (£)'])
+    df_energy = concat_frame(energy, [e for e, _ in others], ['Energy (kWh)', 'Emissions (kg of CO2)'])
+    return [helper.stacked_bar_horiz_spec(df.astype({value: 'float'}), value, scheme)
+            for df, value, scheme in ((df_costs, 'Costs (£)', 1), (df_energy, 'Emissions (kg of CO2)', 2),
+                                      (df_energy, 'Energy (kWh)', 2))]
+
+
+def page_table(results):
+    n_energy = len(engine.ENERGY_BREAKDOWNS)
+    values = np.stack([results[case]['costs'][:, 0] for case in engine.CASE_NAMES])
+    costs = ResultTable.from_cases(values[..., None], engine.CASE_NAMES, engine.COST_BREAKDOWNS, ['Costs (£)'])
+    values = np.stack([np.stack([results[case]['energy'][:n_energy, 0], results[case]['emissions'][:, 0]], axis=-1)
+                       for case in engine.CASE_NAMES])
+    energy = ResultTable.from_cases(values, engine.CASE_NAMES, engine.ENERGY_BREAKDOWNS,
+                                    ['Energy (kWh)', 'Emissions (kg of CO2)'])
+    return [helper.stacked_bar_horiz_spec(costs, 'Costs (£)', 1),
+            helper.stacked_bar_horiz_spec(energy, 'Emissions (kg of CO2)'),
+            helper.stacked_bar_horiz_spec(energy, 'Energy (kWh)')]
+
+
+def frame_of_columns(columns):
+    df = pd.DataFrame(columns)
+    df['Case'] = pd.Categorical.from_codes(df['Case'], engine.CASE_NAMES)
+    df['Breakdown'] = pd.Categorical.from_codes(df['Breakdown'], engine.BREAKDOWNS)
+    return df
+
+
+def batch_of_columns(columns):
+    import pyarrow as pa
+
+    return pa.RecordBatch.from_pandas(frame_of_columns(columns), preserve_index=False)
+
+
+def report(label, func, repeat):
+    peak, held = allocated(func)
+    seconds = best_of(func, repeat)
+    print(f'{label:40s} {peak/1e6:10.2f} {held/1e6:10.2f} {1000*seconds:10.2f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare allocations of columnar and DataFrame results.')
+    parser.add_argument('--size', default='100k', choices=list(SIZES))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    results = engine.calculate(dict(engine.DEFAULTS))
+    #altair builds each chart layout once, so leave that out of both
+    page_lists(results), page_table(results)
+    assert page_lists(results) == page_table(results)
+
+    columns = engine.result_columns(engine.calculate(synthetic_homes(SIZES[args.size])))
+    rows = len(columns['home'])
+    print(f'{"":40s} {"peak MB":>10s} {"held MB":>10s} {"ms":>10s}')
+    report('page: lists, concat', lambda: page_lists(results), args.repeat)
+    report('page: ResultTable', lambda: page_table(results), args.repeat)
+    report(f'portfolio ({rows:,} rows): DataFrame', lambda: frame_of_columns(columns), args.repeat)
+    report('  ResultTable.frame', lambda: ResultTable(columns).frame(), args.repeat)
+    report('  record batch of DataFrame', lambda: batch_of_columns(columns), args.repeat)
+    report('  ResultTable.record_batch', lambda: ResultTable(columns).record_batch(), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Time to compare N heat pump configurations: the page's results (one home, its
+# tables and its three charts) and a corpus of homes, as N grows.
+#
+#   python benchmarks/bench_configs.py [--configs 2,10,100,500] [--size 10k] [--repeat 5]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import configs
+import engine
+import helper
+from corpus import SIZES, synthetic_homes
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t)
+    return min(times)
+
+
+def page(inputs, sweep):
+    results = configs.calculate(inputs, sweep)
+    df_costs, df_energy = configs.case_frames(results, sweep)
+    return [helper.make_stacked_bar_horiz(df_costs, 'Costs (£)', 1).to_dict(),
+            helper.make_stacked_bar_horiz(df_energy, 'Emissions (kg of CO2)').to_dict(),
+            helper.make_stacked_bar_horiz(df_energy, 'Energy (kWh)').to_dict()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time N heat pump configurations.')
+    parser.add_argument('--configs', default='2,10,100,500')
+    parser.add_argument('--size', default='10k', choices=list(SIZES))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    inputs = dict(engine.DEFAULTS)
+    homes = synthetic_homes(SIZES[args.size])
+    print(f'{"configs":>8s} {"page ms":>10s} {"calculate " + args.size + " ms":>18s} {"per config ms":>14s}')
+    for n in [int(n) for n in args.configs.split(',')]:
+        sweep = configs.HeatPumpConfigs([f'System {i + 1}' for i in range(n)], np.linspace(2.5, 5.0, n), 2.8)
+        page_s = best_of(lambda: page(inputs, sweep), args.repeat)
+        corpus_s = best_of(lambda: configs.result_columns(configs.calculate(homes, sweep), sweep), args.repeat)
+        print(f'{n:8d} {1000*page_s:10.2f} {1000*corpus_s:18.2f} {1000*corpus_s/n:14.3f}')
+
+
+if __name__ == '__main__':
+    main()
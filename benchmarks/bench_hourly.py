@@ -0,0 +1,59 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Time of the hourly (8760 step) calculation over a synthetic corpus.  With
+# --distinct every household gets its own flow temperature, so none of the
+# hourly work is shared between households (the worst case).
+#
+#   python benchmarks/bench_hourly.py [--size 100k] [--distinct]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hourly
+from corpus import SIZES, synthetic_homes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the hourly calculation.')
+    parser.add_argument('--size', choices=SIZES, default='100k')
+    parser.add_argument('--distinct', action='store_true', help='give every household its own flow temperature')
+    args = parser.parse_args()
+
+    n = SIZES[args.size]
+    homes = synthetic_homes(n)
+    if args.distinct:
+        homes['hp_flow_temp_typ'] = np.random.default_rng(1).uniform(35, 55, n)
+
+    t = time.perf_counter()
+    hourly.calculate(homes)
+    elapsed = time.perf_counter() - t
+    print(f'{n:,} homes x {hourly.HOURS_PER_YEAR} hours: {elapsed:.2f} s ({n/elapsed:,.0f} homes/s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Cold-import benchmark for the headless calculation modules.
+#
+# Each module is imported in a fresh interpreter, timing only the import itself
+# (not interpreter start-up), and the modules it pulled in are checked so that
+# the engine never drags in Streamlit, pandas, Altair or PIL.  NumPy itself is
+# most of the cost, so the pass/fail budget is on the time over importing NumPy.
+#
+#   python benchmarks/bench_import.py [--repeat 7] [--max-overhead-ms 20]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ['engine', 'helper']
+HEAVY_MODULES = ['streamlit', 'pandas', 'altair', 'PIL']
+
+_PROBE = '''
+import json, sys, time
+t = time.perf_counter()
+import {module}
+t = time.perf_counter() - t
+print(json.dumps({{'seconds': t, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+
+def time_import(module, repeat):
+    """
+    module - name of module to import
+    repeat - number of fresh interpreters to time it in
+    returns (median import time in ms, heavy modules loaded by the import)
+    """
+    times = []
+    heavy = set()
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                             cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        res = json.loads(out)
+        times.append(1000*res['seconds'])
+        heavy.update(res['heavy'])
+    times.sort()
+    return times[len(times)//2], sorted(heavy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time cold imports of the calculation modules.')
+    parser.add_argument('--repeat', type=int, default=7, help='fresh interpreters per module')
+    parser.add_argument('--max-overhead-ms', type=float, default=20,
+                        help='fail if a module takes this much longer to import than numpy')
+    args = parser.parse_args()
+
+    numpy_ms, _ = time_import('numpy', args.repeat)
+    print(f'{"numpy":10s} {numpy_ms:7.1f} ms')
+    failed = False
+    for module in MODULES:
+        ms, heavy = time_import(module, args.repeat)
+        print(f'{module:10s} {ms:7.1f} ms  (+{ms - numpy_ms:.1f} ms over numpy)' +
+              (f'  loads {", ".join(heavy)}' if heavy else ''))
+        failed |= bool(heavy) or ms - numpy_ms > args.max_overhead_ms
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+
+# Time of the load-shifting optimiser, a year of days for every household, on
+# each household's own tariff or on one half-hourly agile-style tariff, with the
+# costs against the fixed fraction and the hourly calculations.
+#
+#   python benchmarks/bench_loadshift.py [--homes 10000] [--agile] [--levels 16]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine
+import hourly
+import loadshift
+import tariffs
+from corpus import synthetic_homes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the load-shifting optimiser.')
+    parser.add_argument('--homes', type=int, default=10000)
+    parser.add_argument('--agile', action='store_true', help='put every household on an agile-style tariff')
+    parser.add_argument('--levels', type=int, default=loadshift.LEVELS)
+    args = parser.parse_args()
+
+    homes = synthetic_homes(args.homes)
+    tariff = None
+    hp_tariff = None
+    if args.agile:
+        hour = np.arange(17520) % 48
+        tariff = tariffs.Tariff(24 + 8*np.sin(2*np.pi*(hour - 22)/48), 50, 'agile')
+        hp_tariff = tariff.compile(17520).hp_tariff()
+
+    t = time.perf_counter()
+    results = loadshift.calculate(homes, tariff, levels=args.levels)
+    elapsed = time.perf_counter() - t
+    days = args.homes*hourly.DAYS_PER_YEAR
+    print(f'{args.homes:,} homes x {hourly.DAYS_PER_YEAR} days: {elapsed:.2f} s ({days/elapsed:,.0f} home-days/s)')
+
+    case = 'Typical HP Install'
+    fixed = engine.calculate(homes, hp_tariff=hp_tariff)[case]['costs_total'].mean()
+    print(f'mean {case} bill: fixed fractions £{fixed:,.0f}, scheduled £{results[case]["costs_total"].mean():,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Latency of a Monte Carlo run for one household, sampling the heat pump and
+# boiler performance, hot water temperature and prices.
+#
+#   python benchmarks/bench_montecarlo.py [--samples 100000] [--repeat 5]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uncertainty
+
+DISTRIBUTIONS = {'hp_heat_scop_typ': ('normal', 3.4, 0.4),
+                 'hp_heat_scop_hi': ('normal', 4.0, 0.3),
+                 'hp_hw_cop_typ': ('normal', 2.8, 0.3),
+                 'boiler_heat_eff': ('uniform', 0.8, 0.92),
+                 'hw_temp_raise': ('triangular', 20, 25, 35),
+                 'gas_unit': ('normal', 6.29, 0.5),
+                 'elec_unit_cosy_standard': ('normal', 26.35, 2.0)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time a Monte Carlo run for one household.')
+    parser.add_argument('--samples', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    times = []
+    for i in range(args.repeat):
+        t = time.perf_counter()
+        summary = uncertainty.summarise(uncertainty.simulate({}, DISTRIBUTIONS, args.samples, seed=i))
+        times.append(time.perf_counter() - t)
+    q = summary['Typical HP Install']['saving']['quantiles']
+    print(f'{args.samples:,} samples: best {1000*min(times):.1f} ms, median {1000*sorted(times)[len(times)//2]:.1f} ms')
+    print('Typical HP Install saving P10/P50/P90: ' + ' / '.join(f'£{v[0]:,.0f}' for v in q.values()))
+
+
+if __name__ == '__main__':
+    main()
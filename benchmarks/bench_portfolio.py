@@ -0,0 +1,110 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Time for the portfolio page on a large run: aggregating the run into tiles once,
+# loading the tiles, and a filter change (adding up tiles and building the charts).
+#
+#   python benchmarks/bench_portfolio.py [--homes 10000000] [--regions 14] [--repeat 20]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine
+import portfolio
+import resultstore
+from corpus import synthetic_homes
+
+CHUNK_SIZE = 500000
+#filter changes as a session might make them: (metric, filters, group by)
+CHANGES = [('saving', {}, None),
+           ('saving', {'n_tariff_states': [3]}, None),
+           ('saving', {'n_tariff_states': [3], 'is_cook_gas': [True]}, 'region'),
+           ('emissions_reduction', {'n_tariff_states': [2, 3], 'region': [1, 2, 3]}, 'is_hw_gas'),
+           ('energy_change', {'is_second_heatsource': [False]}, 'n_tariff_states')]
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t)
+    return min(times)
+
+
+def charts(view, by):
+    #the page's charts, as the specs that go to the browser
+    import altair as alt
+    import pandas as pd
+
+    specs = [alt.Chart(pd.DataFrame(view['histogram'])).mark_bar().encode(
+        x=alt.X('start:Q', bin='binned'), x2='end:Q', y='homes:Q').to_dict()]
+    if by is not None:
+        groups = view['groups']
+        df = pd.DataFrame({'value': groups['value'].astype(str), 'median': groups['quantiles'][:, 1],
+                           'low': groups['quantiles'][:, 0], 'high': groups['quantiles'][:, 2]})
+        specs.append(alt.Chart(df).mark_rule().encode(x='low:Q', x2='high:Q', y='value:N').to_dict())
+    return specs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the portfolio page on a large run.')
+    parser.add_argument('--homes', type=int, default=1000000)
+    parser.add_argument('--regions', type=int, default=14)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = resultstore.ResultStore(tmp)
+        t = time.perf_counter()
+        with resultstore.RunWriter(tmp, 'bench', 'region') as writer:
+            for start in range(0, args.homes, CHUNK_SIZE):
+                n = min(CHUNK_SIZE, args.homes - start)
+                p = engine.prepare_inputs(synthetic_homes(n, seed=start))
+                region = np.random.default_rng(start).integers(1, args.regions + 1, n)
+                writer.write(np.arange(start, start + n), p, engine.calculate(p), region)
+        print(f'{args.homes:,} homes written in {time.perf_counter() - t:.1f} s')
+
+        t = time.perf_counter()
+        tiles = portfolio.load_tiles(store, 'bench')
+        print(f'tiles built in {time.perf_counter() - t:.2f} s: {tiles.counts.nbytes/1e6:.1f} MB of counts')
+        path = portfolio.tiles_path(store, 'bench')
+        print(f'tiles loaded in {1000*best_of(lambda: portfolio.Tiles.load(path), 5):.1f} ms')
+
+        case = tiles.cases[0]
+        for metric, filters, by in CHANGES:
+            select = best_of(lambda: tiles.select(metric, case, filters, by), args.repeat)
+            view = tiles.select(metric, case, filters, by)
+            redraw = best_of(lambda: charts(tiles.select(metric, case, filters, by), by), args.repeat)
+            size = sum(len(str(spec)) for spec in charts(view, by))
+            print(f'{metric:20s} {str(filters):55s} by {str(by):16s} select {1000*select:6.2f} ms, '
+                  f'with charts {1000*redraw:6.1f} ms, {size/1e3:.1f} kB of specs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Time to build the tariff matrix of a synthetic library and to find the top k
+# tariffs (with and without peak shutdown) for every home of a corpus.
+#
+#   python benchmarks/bench_recommend.py [--size 100k] [--tariffs 1000] [--top-k 3]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import recommend
+from corpus import SIZES, synthetic_homes, synthetic_tariffs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the tariff recommender.')
+    parser.add_argument('--size', choices=SIZES, default='100k')
+    parser.add_argument('--tariffs', type=int, default=1000)
+    parser.add_argument('--top-k', type=int, default=recommend.DEFAULT_TOP_K)
+    args = parser.parse_args()
+
+    library = synthetic_tariffs(args.tariffs)
+    homes = synthetic_homes(SIZES[args.size])
+
+    t = time.perf_counter()
+    matrix = recommend.TariffMatrix.build(library)
+    build = time.perf_counter() - t
+    t = time.perf_counter()
+    rec = recommend.recommend(homes, matrix, args.top_k)
+    search = time.perf_counter() - t
+    print(f'tariff matrix of {args.tariffs:,} tariffs: {build:.2f} s')
+    print(f'{SIZES[args.size]:,} homes x {args.tariffs:,} tariffs x 2 peak options, top {args.top_k}: {search:.2f} s')
+    print(f'homes switching off at peak in their best option: {rec["peak_off"][:, 0].mean():.1%}')
+
+
+if __name__ == '__main__':
+    main()
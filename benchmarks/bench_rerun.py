@@ -0,0 +1,72 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Time taken by a rerun of the web app, as happens on every widget change in every
+# session.  Results are live, so by default this includes them (from the memos of
+# the page's pipeline); --change edits the typical heat pump SCOP before each rerun,
+# so the stages downstream of it are recomputed, and --no-results turns live results
+# off, leaving the cost of everything outside the results (page, sidebar, images).
+#
+#   python benchmarks/bench_rerun.py [--repeat 20] [--change | --no-results]
+
+import argparse
+import os
+import time
+
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time reruns of the web app.')
+    parser.add_argument('--repeat', type=int, default=20)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--change', action='store_true', help='change a setting before each rerun')
+    mode.add_argument('--no-results', action='store_true', help='turn live results off')
+    args = parser.parse_args()
+
+    #the app opens its images relative to the working directory
+    os.chdir(os.path.dirname(APP))
+    at = AppTest.from_file(APP, default_timeout=120)
+    t = time.perf_counter()
+    at.run()
+    first = time.perf_counter() - t
+    assert not at.exception, at.exception
+    if args.no_results:
+        at.toggle(key='live').set_value(False)
+        at.run()
+
+    times = []
+    for i in range(args.repeat):
+        if args.change:
+            at.number_input(key='typ1').set_value(3.0 + (i % 10)/10)
+        t = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - t)
+        assert not at.exception, at.exception
+    times.sort()
+    print(f'first run {1000*first:.1f} ms')
+    print(f'{args.repeat} reruns: best {1000*times[0]:.1f} ms, median {1000*times[len(times)//2]:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Time to find the best efficiency package for every home of a corpus, over the
+# pruned candidates and over every subset of the measures, and to build the
+# candidates of a longer synthetic measure list.
+#
+#   python benchmarks/bench_retrofit.py [--size 100k] [--measures 20] [--repeat 3]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import retrofit
+from corpus import SIZES, synthetic_homes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the retrofit package optimiser.')
+    parser.add_argument('--size', choices=SIZES, default='100k')
+    parser.add_argument('--measures', type=int, default=20, help='length of the synthetic measure list')
+    parser.add_argument('--repeat', type=int, default=3, help='best of this many runs is reported')
+    args = parser.parse_args()
+
+    homes = synthetic_homes(SIZES[args.size])
+    for label, packages in [('pruned', retrofit.Packages.front()), ('every subset', retrofit.Packages.all())]:
+        times = []
+        for _ in range(args.repeat):
+            t = time.perf_counter()
+            result = retrofit.optimise(homes, packages)
+            times.append(time.perf_counter() - t)
+        t = min(times)
+        print(f'{SIZES[args.size]:,} homes x {len(packages)} packages ({label}): {t:.2f} s, '
+              f'best NPV £{np.median(result["npv"][np.arange(len(result["best"])), result["best"]]):,.0f} median')
+
+    rng = np.random.default_rng(0)
+    measures = [(f'measure {i}', rng.uniform(0.01, 0.15), rng.uniform(200, 10000)) for i in range(args.measures)]
+    t = time.perf_counter()
+    packages = retrofit.Packages.front(measures)
+    print(f'{args.measures} measures: {len(packages):,} of {2**args.measures:,} packages kept, '
+          f'{1000*(time.perf_counter() - t):.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
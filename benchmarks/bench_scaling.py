@@ -0,0 +1,69 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Scaling benchmark for the pooled batch runner.
+#
+# Runs a fixed synthetic corpus through batch.calculate_chunks with 1, 2, 4, ...
+# workers up to the number of cores and reports throughput, speed-up over one
+# worker and parallel efficiency.
+#
+#   python benchmarks/bench_scaling.py [--homes 1000000] [--chunk-size 50000] [--executor process]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch
+from corpus import synthetic_homes, chunked
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure batch throughput against number of workers.')
+    parser.add_argument('--homes', type=int, default=1000000)
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--executor', choices=['process', 'thread'], default='process')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    homes = synthetic_homes(args.homes)
+    counts = [1]
+    while counts[-1]*2 <= args.max_workers:
+        counts.append(counts[-1]*2)
+    if counts[-1] != args.max_workers:
+        counts.append(args.max_workers)
+
+    print(f'{args.homes:,} homes, chunks of {args.chunk_size:,}, {args.executor} pool')
+    print(f'{"workers":>8s} {"homes/s":>12s} {"speed-up":>9s} {"efficiency":>11s}')
+    base = None
+    for workers in counts:
+        t = time.perf_counter()
+        for _ in batch.calculate_chunks(chunked(homes, args.chunk_size), workers=workers, executor=args.executor):
+            pass
+        rate = args.homes / (time.perf_counter() - t)
+        base = base or rate
+        print(f'{workers:8d} {rate:12,.0f} {rate/base:9.2f} {rate/base/workers:11.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Throughput of smartmeter.py on a synthetic year of half-hourly readings, and
+# the time to re-derive the calculator inputs from the saved profiles.
+#
+#   python benchmarks/bench_smartmeter.py [--meters 200] [--days 365] [--repeat 3]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import smartmeter
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t)
+    return min(times)
+
+
+def write_readings(path, meters, days, fuel, seed=0):
+    """
+    writes CSV of half-hourly readings of meters meters over days days from 1 Jan 2023:
+    electricity with an evening peak, gas with a winter heating load over a flat baseload
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    rng = np.random.default_rng(seed)
+    slots = days*smartmeter.SLOTS
+    time = np.datetime64('2023-01-01T00:00:00') + np.arange(slots)*np.timedelta64(1800, 's')
+    hour = np.arange(slots) % smartmeter.SLOTS / 2
+    day = np.arange(slots) // smartmeter.SLOTS
+    if fuel == 'elec':
+        shape = 0.15 + 0.25*np.exp(-(hour - 18.5)**2/4)
+    else:
+        shape = 0.35 + 2.0*np.clip(np.cos(2*np.pi*(day - 15)/365), 0, None)*(hour > 6)
+    with pacsv.CSVWriter(path, pa.schema([('meter', pa.string()), ('time', pa.timestamp('s')),
+                                          ('kWh', pa.float64())])) as writer:
+        for m in range(meters):
+            kWh = np.round(shape*rng.uniform(0.5, 1.5)*rng.gamma(4, 0.25, slots), 3)
+            writer.write_table(pa.table({'meter': pa.array([f'M{m:06d}']*slots), 'time': time, 'kWh': kWh}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time smart meter ingestion.')
+    parser.add_argument('--meters', type=int, default=200)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for fuel in smartmeter.FUELS:
+            paths[fuel] = os.path.join(tmp, f'{fuel}.csv')
+            write_readings(paths[fuel], args.meters, args.days, fuel, seed=len(paths))
+        size = os.path.getsize(paths['elec'])
+        rows = args.meters*args.days*smartmeter.SLOTS
+        print(f'{rows:,} readings per fuel, {size/1e6:.1f} MB')
+
+        seconds = best_of(lambda: smartmeter.ingest([paths['elec']]), args.repeat)
+        print(f'ingest                       {seconds:10.2f} s  {size/1e6/seconds:8.1f} MB/s  {rows/seconds:12,.0f} rows/s')
+        profiles = os.path.join(tmp, 'profiles')
+        for fuel in smartmeter.FUELS:
+            smartmeter.ingest([paths[fuel]]).save(os.path.join(profiles, fuel))
+        elec, gas = (smartmeter.Profile.load(os.path.join(profiles, fuel)) for fuel in smartmeter.FUELS)
+        print(f'load profiles and derive     {1000*best_of(lambda: smartmeter.derive(elec, gas, 7, 0), 10):10.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Time to write a run of synthetic homes into the result store and to answer a
+# filtered aggregate from it (median saving of homes cooking with gas on 3-rate
+# tariffs, by region), against reading the whole run with pandas and filtering.
+#
+#   python benchmarks/bench_store.py [--size 100k] [--regions 14] [--repeat 5]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import resultstore
+from corpus import SIZES, synthetic_homes
+
+VALUE = 'Typical HP Install: saving'
+WHERE = [('is_cook_gas', '==', True), ('n_tariff_states', '==', 3)]
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the result store.')
+    parser.add_argument('--size', default='100k', choices=list(SIZES))
+    parser.add_argument('--regions', type=int, default=14)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    with tempfile.TemporaryDirectory() as tmp:
+        homes = pd.DataFrame(synthetic_homes(SIZES[args.size]))
+        homes['region'] = np.random.default_rng(0).integers(1, args.regions + 1, len(homes))
+        homes_path = os.path.join(tmp, 'homes.parquet')
+        homes.to_parquet(homes_path)
+        root = os.path.join(tmp, 'store')
+
+        t = time.perf_counter()
+        resultstore.write_run(root, homes_path, 'bench', 'region')
+        t = time.perf_counter() - t
+        files = [os.path.join(folder, name) for folder, _, names in os.walk(root) for name in names
+                 if name.endswith('.parquet')]
+        groups = sum(pq.ParquetFile(path).num_row_groups for path in files)
+        size = sum(os.path.getsize(path) for path in files)
+        print(f'{len(homes):,} homes: written in {t:.2f} s ({len(homes)/t:,.0f} homes/s), '
+              f'{len(files)} files, {groups} row groups, {size/1e6:.1f} MB')
+
+        def read_all():
+            df = pd.read_parquet(os.path.join(root, 'run=bench'))
+            df = df[df['is_cook_gas'] & (df['n_tariff_states'] == 3)]
+            return df.groupby('region', observed=True)[VALUE].median()
+
+        store = resultstore.ResultStore(root)
+        #pandas reads region from the directory names as strings
+        expected = read_all()
+        expected = expected.set_axis(expected.index.astype(int)).sort_index().to_numpy()
+        assert np.allclose(store.aggregate(VALUE, 'region', WHERE)['median'].to_numpy(), expected)
+        print(f'read run with pandas, filter  {1000*best_of(read_all, args.repeat):10.2f} ms')
+        print(f'store aggregate               {1000*best_of(lambda: store.aggregate(VALUE, "region", WHERE), args.repeat):10.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Time to open the weather-year store, read a year of every region and get
+# seasonal COPs from the binned hours, against reading the same data from CSV
+# with pandas.
+#
+#   python benchmarks/bench_weather.py [--years 10] [--repeat 1000]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import weather
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the weather-year store.')
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    with tempfile.TemporaryDirectory() as tmp:
+        temperature, series_region, series_year, regions = weather.synthetic_years(years=range(2010, 2010 + args.years))
+        store = weather.WeatherStore.create(os.path.join(tmp, 'store'), temperature, series_region, series_year,
+                                            regions)
+        csv_path = os.path.join(tmp, 'temperatures.csv')
+        pd.DataFrame(temperature.T.astype(np.float32), columns=[f'{regions[r]} {y}' for r, y in
+                                                                zip(series_region, series_year)]).to_csv(csv_path)
+        size = sum(os.path.getsize(os.path.join(store.path, name)) for name in os.listdir(store.path))
+        print(f'{len(store)} region years: store {size/1e6:.1f} MB, CSV {os.path.getsize(csv_path)/1e6:.1f} MB')
+
+        repeat = max(args.repeat // 100, 1)
+        print(f'read CSV with pandas         {1000*best_of(lambda: pd.read_csv(csv_path), repeat):10.2f} ms')
+        print(f'open store                   {1000*best_of(lambda: weather.WeatherStore(store.path), repeat):10.2f} ms')
+        print(f'one year of every region     {1000*best_of(lambda: store.year(2015), repeat):10.2f} ms')
+        row = store.row('Thames', 2015)
+        print(f'seasonal COP, one series     {1e6*best_of(lambda: store.seasonal_cop(45, rows=[row]), args.repeat):10.1f} us')
+        print(f'seasonal COP, every series   {1e6*best_of(lambda: store.seasonal_cop(45), args.repeat):10.1f} us')
+        del store
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Fixed synthetic household corpora for the benchmarks.  The same seed always
+# gives the same homes, with a mix of every branch of the calculation.
+
+import numpy as np
+
+import engine
+
+SIZES = {'1': 1, '1k': 1000, '100k': 100000, '1M': 1000000}
+
+
+def synthetic_homes(n, seed=0):
+    """
+    n - number of households
+    seed - random seed, the same seed always gives the same corpus
+    returns dict of engine input columns
+    """
+    rng = np.random.default_rng(seed)
+    n_tariff_states = rng.choice([1, 2, 3], n, p=[0.7, 0.2, 0.1])
+    return {
+        'elec_total_kWh': rng.integers(15, 60, n) * 100.0,
+        'gas_total_kWh': rng.integers(50, 200, n) * 100.0,
+        'is_elec_renewable': rng.random(n) < 0.2,
+        'is_hw_gas': rng.random(n) < 0.85,
+        'hw_lday': rng.integers(50, 600, n).astype(float),
+        'is_cook_gas': rng.random(n) < 0.3,
+        'gas_cook_kWhweek': rng.integers(3, 15, n).astype(float),
+        'elec_ev_kWh': np.where(rng.random(n) < 0.15, 30 * rng.integers(1, 5, n) * 52, 0).astype(float),
+        'is_second_heatsource': rng.random(n) < 0.1,
+        'second_heatsource_type': rng.integers(0, len(engine.SECOND_HEATSOURCE_TYPES), n),
+        'is_second_heatsource_remains': rng.random(n) < 0.5,
+        'second_heatsource_kWh': rng.integers(0, 30, n) * 100.0,
+        'is_free_summer_hw': rng.random(n) < 0.1,
+        'efficiency_boost': rng.choice([0, 0.03, 0.08, 0.13, 0.25], n),
+        'switch_tariff_for_hp': rng.random(n) < 0.6,
+        'turn_off_hp_in_peak_hours': rng.random(n) < 0.5,
+        'is_disconnect_gas': rng.random(n) < 0.7,
+        'n_tariff_states': n_tariff_states,
+        'elec_unit': np.round(rng.normal(engine.elec_unit, 2, n), 2),
+        'hp_heat_scop_typ': np.round(rng.uniform(2.8, 3.8, n), 1),
+    }
+
+
+def synthetic_tariffs(n, seed=0):
+    """
+    n - number of tariffs
+    seed - random seed
+    returns list of tariffs.Tariff: flat, two and three rate tariffs with random
+    windows and prices, and a tenth half-hourly agile-style tariffs over the year
+    """
+    import tariffs
+
+    rng = np.random.default_rng(seed)
+    library = []
+    for i in range(n):
+        kind = rng.choice(['flat', 'two rate', 'three rate', 'agile'], p=[0.3, 0.3, 0.3, 0.1])
+        unit, standing = rng.uniform(20, 32), rng.uniform(40, 65)
+        if kind == 'flat':
+            library.append(tariffs.Tariff.flat(unit, standing, f'{kind} {i}'))
+        elif kind == 'agile':
+            day = unit + 8*np.sin(2*np.pi*(np.arange(17520) % 48 - 22)/48) + rng.normal(0, 4, 17520)
+            library.append(tariffs.Tariff(np.maximum(day, -5), standing, f'{kind} {i}'))
+        else:
+            windows = [(rng.integers(0, 24), rng.integers(3, 8), unit*rng.uniform(0.3, 0.7))]
+            if kind == 'three rate':
+                windows.append((rng.integers(15, 18), 3, unit*rng.uniform(1.3, 1.7)))
+            library.append(tariffs.Tariff.time_of_use(unit, standing, windows, f'{kind} {i}'))
+    return library
+
+
+def chunked(columns, chunk_size):
+    """
+    columns - dict of equal length columns
+    chunk_size - rows per chunk
+    yields dicts of column slices
+    """
+    n = len(next(iter(columns.values())))
+    for start in range(0, n, chunk_size):
+        yield {name: val[start:start + chunk_size] for name, val in columns.items()}
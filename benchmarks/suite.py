@@ -0,0 +1,282 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Benchmark suite over the fixed corpora of corpus.py (1, 1k, 100k and 1M homes).
+#
+#   python benchmarks/suite.py run results.json [--sizes 1,1k,100k,1M] [--only engine,altair]
+#   python benchmarks/suite.py compare baseline.json results.json [--threshold 0.1]
+#
+# run times each benchmark and writes a JSON file of the median, best and spread
+# of its repeats, with the machine and library versions it ran on.  compare
+# prints the change in every median against a stored baseline and exits with
+# status 1 if any got slower by more than the threshold, so it can gate CI.
+#
+# Benchmarks (name/size):
+#   latency/1          engine.calculate for one home, as on the page
+#   engine/<size>      engine.calculate over a corpus, reported as homes/s
+#   batch/<size>       batch.calculate_chunks over a corpus in 100k chunks
+#   dataframe/page     helper.generate_df of the page's tables
+#   dataframe/<size>   long results table (engine.result_columns) as a DataFrame
+#   altair/page        helper.make_stacked_bar_horiz specs of the page's three charts
+#   rerun/page         a rerun of the page with live results, via Streamlit's AppTest
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import batch
+import engine
+import helper
+from corpus import SIZES, chunked, synthetic_homes
+
+GROUPS = ['latency', 'engine', 'batch', 'dataframe', 'altair', 'rerun']
+#a benchmark is repeated at least MIN_REPEAT times and until MIN_SECONDS have passed
+MIN_REPEAT = 3
+MAX_REPEAT = 1000
+MIN_SECONDS = 1.0
+#a 1M home results table is ~30M rows, more than is sensible to hold as a DataFrame
+DATAFRAME_MAX_HOMES = 100000
+CHUNK_SIZE = 100000
+DEFAULT_THRESHOLD = 0.1
+
+
+def measure(func, min_repeat=MIN_REPEAT, min_seconds=MIN_SECONDS):
+    """
+    func - callable to time, called once untimed first to warm up
+    returns dict of median, min and max seconds per call and number of repeats
+    """
+    func()
+    times = []
+    start = time.perf_counter()
+    while len(times) < MAX_REPEAT and (len(times) < min_repeat or time.perf_counter() - start < min_seconds):
+        t = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t)
+    return {'median': float(np.median(times)), 'min': min(times), 'max': max(times), 'repeat': len(times)}
+
+
+def corpus_key(homes):
+    """
+    returns short hex digest of a corpus, so results from different corpora aren't compared
+    """
+    digest = hashlib.sha256()
+    for name in sorted(homes):
+        digest.update(name.encode() + np.ascontiguousarray(homes[name]).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def page_inputs():
+    """
+    returns the engine inputs of the page with its default settings
+    """
+    return {name: val for name, val in engine.DEFAULTS.items()}
+
+
+def page_tables(results):
+    """
+    returns DataFrames of costs and of energy and emissions for one home, as the page builds them
+    """
+    rows = {case: engine.case_rows(results, case) for case in engine.CASE_NAMES}
+    (energy, costs), others = rows[engine.CASE_NAMES[0]], [rows[case] for case in engine.CASE_NAMES[1:]]
+    df_costs = helper.generate_df(costs, [c for _, c in others], ['Costs (£)'])
+    df_energy = helper.generate_df(energy, [e for e, _ in others], ['Energy (kWh)', 'Emissions (kg of CO2)'])
+    return df_costs, df_energy
+
+
+def page_charts(df_costs, df_energy):
+    return [helper.make_stacked_bar_horiz(df_costs, 'Costs (£)', 1).to_dict(),
+            helper.make_stacked_bar_horiz(df_energy, 'Emissions (kg of CO2)').to_dict(),
+            helper.make_stacked_bar_horiz(df_energy, 'Energy (kWh)').to_dict()]
+
+
+def results_frame(results):
+    from columnar import ResultTable
+
+    return ResultTable(engine.result_columns(results)).frame()
+
+
+def rerun_page():
+    """
+    returns callable rerunning the app (results are live), run once already
+    """
+    from streamlit.testing.v1 import AppTest
+
+    #the app opens its images relative to the working directory
+    os.chdir(ROOT)
+    at = AppTest.from_file(os.path.join(ROOT, 'main.py'), default_timeout=120)
+    at.run()
+
+    def rerun():
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception)
+
+    return rerun
+
+
+def run_benchmarks(sizes, groups, log=None):
+    """
+    sizes - corpus names from corpus.SIZES
+    groups - benchmark groups from GROUPS
+    log - optional callable given each result line as it is measured
+    returns dict of benchmark name to measure() result, with 'homes' and 'homes_per_s'
+    for corpus benchmarks and 'corpus' identifying the homes
+    """
+    results = {}
+
+    def record(name, func, homes=None, corpus=None):
+        res = measure(func, min_repeat=1 if homes and homes >= 1000000 else MIN_REPEAT)
+        if homes:
+            res.update(homes=homes, homes_per_s=homes/res['median'], corpus=corpus)
+        results[name] = res
+        if log:
+            rate = f'  {res["homes_per_s"]:12,.0f} homes/s' if homes else ''
+            log(f'{name:20s} {1000*res["median"]:10.2f} ms  x{res["repeat"]:<4d}{rate}')
+
+    page = page_inputs()
+    if 'latency' in groups:
+        record('latency/1', lambda: engine.calculate(page))
+    for size in sizes:
+        n = SIZES[size]
+        homes = synthetic_homes(n)
+        key = corpus_key(homes)
+        if 'engine' in groups:
+            record(f'engine/{size}', lambda: engine.calculate(homes), n, key)
+        if 'batch' in groups:
+            record(f'batch/{size}', lambda: [None for _ in batch.calculate_chunks(chunked(homes, CHUNK_SIZE))],
+                   n, key)
+        if 'dataframe' in groups and n <= DATAFRAME_MAX_HOMES:
+            calculated = engine.calculate(homes)
+            record(f'dataframe/{size}', lambda: results_frame(calculated), n, key)
+            del calculated
+    page_results = engine.calculate(page)
+    if 'dataframe' in groups:
+        record('dataframe/page', lambda: page_tables(page_results))
+    if 'altair' in groups:
+        tables = page_tables(page_results)
+        record('altair/page', lambda: page_charts(*tables))
+    if 'rerun' in groups:
+        record('rerun/page', rerun_page())
+    return results
+
+
+def environment():
+    """
+    returns dict describing where the benchmarks ran
+    """
+    import pandas as pd
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    versions = {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__}
+    for module in ('altair', 'streamlit'):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            pass
+    return {'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'commit': commit, 'machine': platform.machine(), 'platform': platform.platform(),
+            'processor': platform.processor(), 'cpus': os.cpu_count(), 'versions': versions}
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    baseline, current - benchmark files written by run
+    threshold - fractional slow-down of a median counted as a regression
+    returns list of (name, baseline median, current median, change, status) for
+    benchmarks in both, status 'regression', 'improvement', 'ok' or 'corpus changed'
+    """
+    rows = []
+    for name, base in baseline['results'].items():
+        cur = current['results'].get(name)
+        if cur is None:
+            continue
+        change = cur['median']/base['median'] - 1
+        if base.get('corpus') != cur.get('corpus'):
+            status = 'corpus changed'
+        elif change > threshold:
+            status = 'regression'
+        elif change < -threshold:
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append((name, base['median'], cur['median'], change, status))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the benchmark suite or compare two runs of it.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='run the benchmarks and write their timings')
+    run.add_argument('output', help='JSON file for the results')
+    run.add_argument('--sizes', default=','.join(SIZES), help=f'corpora to run, from {", ".join(SIZES)}')
+    run.add_argument('--only', default=','.join(GROUPS), help=f'benchmark groups, from {", ".join(GROUPS)}')
+    cmp = commands.add_parser('compare', help='compare results against a baseline')
+    cmp.add_argument('baseline')
+    cmp.add_argument('current')
+    cmp.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                     help='fractional slow-down flagged as a regression')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        sizes = [s for s in args.sizes.split(',') if s]
+        groups = [g for g in args.only.split(',') if g]
+        unknown = sorted(set(sizes) - set(SIZES)) + sorted(set(groups) - set(GROUPS))
+        if unknown:
+            parser.error(f'unknown sizes or groups: {", ".join(unknown)}')
+        output = os.path.abspath(args.output)
+        results = run_benchmarks(sizes, groups, print)
+        with open(output, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=1)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    rows = compare(baseline, current, args.threshold)
+    print(f'{"benchmark":20s} {"baseline ms":>12s} {"current ms":>12s} {"change":>8s}')
+    for name, base, cur, change, status in rows:
+        flag = '' if status == 'ok' else f'  {status}'
+        print(f'{name:20s} {1000*base:12.2f} {1000*cur:12.2f} {change:+8.1%}{flag}')
+    regressions = [row[0] for row in rows if row[4] == 'regression']
+    if regressions:
+        print(f'{len(regressions)} regression(s) over {args.threshold:.0%}: {", ".join(regressions)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
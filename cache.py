@@ -0,0 +1,322 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Result caching keyed on the calculator inputs.
+#
+# input_key gives the same key for any two sets of inputs that give the same
+# results: missing inputs are filled with the engine defaults and values are
+# converted to the types the engine uses before hashing.  Every key is stamped
+# with CACHE_VERSION and the constants of engine, hourly and tariffs (price cap,
+# carbon factors, efficiency_opts, load shapes, ...), so results cached before
+# any of them changed are never used.  The stamp is worked out once per process:
+# call reset_constants_key after changing a constant at run time.
+#
+# LRUCache holds a bounded number of entries, evicting the least recently used,
+# and counts hits, misses and evictions; TieredCache puts it in front of a
+# DiskStore (sqlite) that keeps results between runs, counting a lookup found in
+# either tier as a hit.
+#
+# cached_calculate memoizes a portfolio's energy stage (engine.calculate_energy)
+# by the inputs it depends on, so a re-run that only changes prices or tariffs
+# (engine.TARIFF_INPUTS) only recomputes the costs.
+
+import collections
+import functools
+import hashlib
+import importlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+
+import numpy as np
+
+import engine
+import metrics
+
+#changes whenever what is cached changes, so older entries are no longer used
+CACHE_VERSION = 1
+#modules whose constants the cached results depend on
+CONSTANT_MODULES = ('engine', 'hourly', 'tariffs')
+
+
+def canonical_inputs(inputs):
+    """
+    inputs - mapping of engine inputs for one household
+    returns dict of every engine input, in DEFAULTS order, as plain python values
+    """
+    return {name: val.item() for name, val in engine.prepare_inputs(inputs).items()}
+
+
+def input_key(inputs):
+    """
+    inputs - mapping of engine inputs for one household
+    returns hex digest identifying the effective inputs
+    """
+    return canonical_key(canonical_inputs(inputs))
+
+
+def canonical_key(canonical, stamp=None):
+    """
+    canonical - output of canonical_inputs
+    stamp - constants_key(), if already known
+    returns hex digest as input_key
+    """
+    text = json.dumps(canonical, separators=(',', ':'))
+    return hashlib.sha256(((stamp or constants_key()) + text).encode()).hexdigest()
+
+
+def json_default(val):
+    """
+    json.dumps default for constants holding arrays (tariffs.LOAD_SHAPES)
+    """
+    return val.tolist() if isinstance(val, np.ndarray) else str(val)
+
+
+def calculator_constants():
+    """
+    returns dict of module name: dict of every constant of the module (prices,
+    carbon factors, DEFAULTS, load shapes, ...) for CONSTANT_MODULES
+    """
+    constants = {}
+    for module_name in CONSTANT_MODULES:
+        #imported here as tariffs imports this module
+        module = importlib.import_module(module_name)
+        constants[module_name] = {name: val for name, val in vars(module).items()
+                                  if not name.startswith('_') and isinstance(val, (bool, int, float, str, list, tuple, dict))}
+    return constants
+
+
+@functools.lru_cache(maxsize=None)
+def constants_key():
+    """
+    returns hex digest of CACHE_VERSION and the value of every constant of
+    CONSTANT_MODULES, worked out on the first call
+    """
+    text = json.dumps([CACHE_VERSION, calculator_constants()], sort_keys=True, separators=(',', ':'), default=json_default)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def reset_constants_key():
+    """
+    works out constants_key again on its next call, after a constant has been changed
+    """
+    constants_key.cache_clear()
+
+
+def array_key(p, names, stage=''):
+    """
+    p - prepared inputs, from engine.prepare_inputs
+    names - inputs to include
+    stage - label of what is cached
+    returns hex digest of the constants, stage and the values of the named inputs
+    """
+    digest = hashlib.sha256((constants_key() + stage).encode())
+    for name in sorted(names):
+        val = np.ascontiguousarray(p[name])
+        digest.update(f'{name}:{val.dtype.str}:{val.shape}'.encode())
+        digest.update(val.tobytes())
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    Mapping of key to value holding at most maxsize entries, evicting the least
+    recently used.  Safe to share between threads (e.g. Streamlit sessions)
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None, count=True):
+        """
+        count - False to leave the lookup out of the hits and misses, for a
+                caller that counts them itself
+        """
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                if count:
+                    self.hits += 1
+                    metrics.count('cache_hits')
+                return self._data[key]
+            if count:
+                self.misses += 1
+                metrics.count('cache_misses')
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, func):
+        """
+        returns the cached value for key, or the result of func(), which is cached
+        """
+        _missing = object()
+        value = self.get(key, _missing)
+        if value is _missing:
+            #computed outside the lock, so other sessions aren't held up
+            value = func()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """
+        returns dict of size, maxsize, hits, misses, evictions and hit rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'hit_rate': self.hits/lookups if lookups else 0.0}
+
+
+class DiskStore:
+    """
+    Persistent mapping of key to picklable value in an sqlite file.  Entries
+    written under other engine constants are deleted when the store is opened
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, stamp TEXT, value BLOB)')
+            self._db.execute('DELETE FROM results WHERE stamp != ?', (constants_key(),))
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._db.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def put(self, key, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?)', (key, constants_key(), blob))
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM results')
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+
+class TieredCache:
+    """
+    LRUCache in front of an optional DiskStore: values found on disk are kept in
+    memory too, and new values are written to both.  Hits and misses are counted
+    here, once both tiers have been tried
+    """
+
+    def __init__(self, maxsize=256, path=None):
+        self.memory = LRUCache(maxsize)
+        self.disk = DiskStore(path) if path else None
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        _missing = object()
+        value = self.memory.get(key, _missing, count=False)
+        on_disk = False
+        if value is _missing and self.disk is not None:
+            value = self.disk.get(key, _missing)
+            if value is not _missing:
+                on_disk = True
+                self.memory.put(key, value)
+        with self._lock:
+            if value is _missing:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.disk_hits += on_disk
+        metrics.count('cache_misses' if value is _missing else 'cache_hits')
+        return default if value is _missing else value
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def get_or_compute(self, key, func):
+        """
+        returns the cached value for key, or the result of func(), which is cached
+        """
+        _missing = object()
+        value = self.get(key, _missing)
+        if value is _missing:
+            value = func()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        """
+        returns LRUCache.stats of memory with the hits and misses of both tiers,
+        and the hits and size of the disk store
+        """
+        stats = self.memory.stats()
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats.update(hits=self.hits, misses=self.misses, hit_rate=self.hits/lookups if lookups else 0.0)
+        if self.disk is not None:
+            stats.update(disk_hits=self.disk_hits, disk_size=len(self.disk))
+        return stats
+
+
+def cached_calculate(inputs, store, block_size=None, hp_tariff=None):
+    """
+    inputs, block_size, hp_tariff - as engine.calculate
+    store - cache for the energy stage, e.g. TieredCache
+    returns the results of engine.calculate, computing only the costs if the
+    energy stage of the same inputs (ignoring engine.TARIFF_INPUTS) is in store
+    """
+    p = engine.prepare_inputs(inputs)
+    key = array_key(p, set(p) - set(engine.TARIFF_INPUTS), 'energy')
+    energy = store.get_or_compute(key, lambda: engine.calculate_energy(p, block_size))
+    return engine.calculate_costs(p, energy, block_size, hp_tariff)
@@ -0,0 +1,124 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Long results tables - one row per home, case and breakdown - held as columns.
+#
+#   table = columnar.ResultTable(engine.result_columns(results))
+#   table.frame()           # DataFrame, Case and Breakdown categorical
+#   table.record_batch()    # pyarrow RecordBatch, Case and Breakdown dictionary encoded
+#
+# The columns are 1d NumPy arrays with Case and Breakdown as small integer codes
+# into the case and breakdown labels, as engine.result_columns returns them.  The
+# DataFrame and the record batch share the memory of the value columns instead of
+# copying them (a DataFrame built from a dict of columns otherwise consolidates
+# them into one 2d block), and the labels are only materialised for the rows a
+# chart is drawn from.  So a table of millions of rows goes to Parquet or to a
+# chart without the copies of building DataFrames per case and concatenating them.
+
+import numpy as np
+
+import engine
+
+#columns holding codes into the case and breakdown labels
+CODE_COLUMNS = ('Case', 'Breakdown')
+
+
+class ResultTable:
+    """
+    Long table of results: columns (dict of equal length 1d arrays) with 'Case'
+    and 'Breakdown' codes into case_names and breakdowns (default engine.CASE_NAMES
+    and engine.BREAKDOWNS), then e.g. 'home' and the value columns
+    """
+
+    def __init__(self, columns, case_names=None, breakdowns=None):
+        self.columns = columns
+        self.case_names = list(engine.CASE_NAMES if case_names is None else case_names)
+        self.breakdowns = list(engine.BREAKDOWNS if breakdowns is None else breakdowns)
+
+    @classmethod
+    def from_cases(cls, values, case_names, breakdowns, value_names):
+        """
+        values - (cases, breakdowns, value names) array, e.g. the results of one home
+        case_names, breakdowns - labels of the first two axes of values
+        value_names - names of the value columns
+        returns table of the values in the layout of helper.generate_df, with zeros
+        left out as NaN
+        """
+        n_case, n_break = len(case_names), len(breakdowns)
+        values = np.asarray(values, dtype=float).reshape(n_case*n_break, len(value_names))
+        values = np.where(values == 0, np.nan, values)
+        code_dtype = np.int8 if max(n_case, n_break) < 128 else np.int32
+        columns = {'Case': np.repeat(np.arange(n_case, dtype=code_dtype), n_break),
+                   'Breakdown': np.tile(np.arange(n_break, dtype=code_dtype), n_case)}
+        for j, name in enumerate(value_names):
+            columns[name] = values[:, j]
+        return cls(columns, case_names, breakdowns)
+
+    def __len__(self):
+        return len(self.columns['Case'])
+
+    def labels(self, name):
+        """
+        name - 'Case' or 'Breakdown'
+        returns object array of the label of each row
+        """
+        names = self.case_names if name == 'Case' else self.breakdowns
+        return np.asarray(names, dtype=object)[self.columns[name]]
+
+    def frame(self):
+        """
+        returns DataFrame of the table, Case and Breakdown categorical (in the order
+        of their labels), sharing the memory of the other columns
+        """
+        import pandas as pd
+
+        columns = dict(self.columns)
+        columns['Case'] = pd.Categorical.from_codes(columns['Case'], self.case_names)
+        columns['Breakdown'] = pd.Categorical.from_codes(columns['Breakdown'], self.breakdowns)
+        return pd.DataFrame(columns, copy=False)
+
+    def record_batch(self):
+        """
+        returns pyarrow RecordBatch of the table, Case and Breakdown dictionary
+        encoded, sharing the memory of numeric columns (NaN is kept, not made null)
+        """
+        import pyarrow as pa
+
+        arrays = {name: pa.array(val) for name, val in self.columns.items() if name not in CODE_COLUMNS}
+        arrays['Case'] = pa.DictionaryArray.from_arrays(self.columns['Case'], self.case_names)
+        arrays['Breakdown'] = pa.DictionaryArray.from_arrays(self.columns['Breakdown'], self.breakdowns)
+        names = list(self.columns)
+        return pa.RecordBatch.from_arrays([arrays[name] for name in names], names=names)
+
+    def records(self):
+        """
+        returns list of dicts, one per row, as altair writes the data of a chart:
+        labels for Case and Breakdown, None for NaN
+        """
+        columns = {}
+        for name, val in self.columns.items():
+            if name in CODE_COLUMNS:
+                columns[name] = self.labels(name).tolist()
+            elif np.asarray(val).dtype.kind == 'f':
+                columns[name] = [None if v != v else v for v in np.asarray(val).tolist()]
+            else:
+                columns[name] = np.asarray(val).tolist()
+        return [dict(zip(columns, row)) for row in zip(*columns.values())]
@@ -0,0 +1,235 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Any number of heat pump configurations compared in one pass.
+#
+#   python configs.py quotes.csv homes.csv results.csv --id-column home_id
+#
+# HeatPumpConfigs holds the configurations as a struct of arrays (names, space
+# heating SCOP, hot water COP and flow temperature, one entry per configuration),
+# e.g. the systems an installer has quoted, each given by its SCOP or by its flow
+# temperature.  calculate evaluates the heat pump case for all of them at once
+# (engine.calculate_configs broadcasts the case over a leading configurations axis),
+# and the long results table and the page's tables and charts are built from the
+# resulting arrays directly, so the cost per configuration stays flat into the
+# hundreds for installer sweeps.
+
+import argparse
+import sys
+
+import numpy as np
+
+import engine
+import hourly
+from columnar import ResultTable
+
+
+class HeatPumpConfigs:
+    """
+    Heat pump configurations: names, heat_scop (space heating SCOP), hw_cop (hot
+    water COP) and flow_temp (degC, NaN if not known), one entry per configuration
+    """
+
+    def __init__(self, names, heat_scop, hw_cop, flow_temp=None):
+        self.names = [str(name) for name in names]
+        if len(set(self.names)) != len(self.names) or engine.CASE_NAMES[0] in self.names:
+            raise ValueError(f'configuration names must be distinct and not {engine.CASE_NAMES[0]!r}')
+        n = len(self.names)
+        self.heat_scop = np.broadcast_to(np.asarray(heat_scop, dtype=float), (n,)).copy()
+        self.hw_cop = np.broadcast_to(np.asarray(hw_cop, dtype=float), (n,)).copy()
+        self.flow_temp = np.broadcast_to(np.asarray(np.nan if flow_temp is None else flow_temp, dtype=float),
+                                         (n,)).copy()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __add__(self, other):
+        return HeatPumpConfigs(self.names + other.names, np.concatenate([self.heat_scop, other.heat_scop]),
+                               np.concatenate([self.hw_cop, other.hw_cop]),
+                               np.concatenate([self.flow_temp, other.flow_temp]))
+
+    @classmethod
+    def standard(cls, inputs=None):
+        """
+        inputs - mapping of engine inputs for one household, default the page defaults
+        returns the page's typical and high-performance installations
+        """
+        p = dict(engine.DEFAULTS, **hourly.HOURLY_DEFAULTS, **(inputs or {}))
+        return cls(engine.CASE_NAMES[1:], [p['hp_heat_scop_typ'], p['hp_heat_scop_hi']],
+                   [p['hp_hw_cop_typ'], p['hp_hw_cop_hi']], [p['hp_flow_temp_typ'], p['hp_flow_temp_hi']])
+
+    @classmethod
+    def from_table(cls, table):
+        """
+        table - DataFrame or mapping of columns: 'name', and 'heat_scop' or 'flow_temp'
+                (or both), optionally 'hw_cop'
+        returns the configurations, with a heat_scop not given (or NaN) estimated from
+        the flow temperature (hourly.seasonal_cop) and an hw_cop not given the
+        typical one
+        """
+        names = list(table['name'])
+        n = len(names)
+        column = lambda name: np.asarray(table[name], dtype=float) if name in table else np.full(n, np.nan)
+        heat_scop, hw_cop, flow_temp = column('heat_scop'), column('hw_cop'), column('flow_temp')
+        missing = np.isnan(heat_scop)
+        if np.isnan(flow_temp[missing]).any():
+            raise ValueError('each configuration needs a heat_scop or a flow_temp')
+        if missing.any():
+            heat_scop[missing] = hourly.seasonal_cop(flow_temp[missing])
+        hw_cop = np.where(np.isnan(hw_cop), engine.hp_hw_cop_typ, hw_cop)
+        return cls(names, heat_scop, hw_cop, flow_temp)
+
+    def case_names(self):
+        """
+        returns list of the current case and then each configuration, as the Case of the tables
+        """
+        return [engine.CASE_NAMES[0]] + self.names
+
+
+def calculate(inputs, configs, block_size=None, hp_tariff=None):
+    """
+    inputs, block_size, hp_tariff - as engine.calculate
+    configs - HeatPumpConfigs to evaluate
+    returns output of engine.calculate_configs: 'Current' and 'configs' case
+    result dicts, the latter with (configs, households) as the last two axes
+    """
+    return engine.calculate_configs(inputs, configs.heat_scop, configs.hw_cop, block_size, hp_tariff)
+
+
+def result_values(results):
+    """
+    results - output of calculate
+    returns (VALUE_NAMES, households, cases, BREAKDOWNS) array: the current case then
+    each configuration, NaN where not applicable
+    """
+    current, configs = results['Current'], results['configs']
+    n_config, n = configs['costs_total'].shape
+    n_energy = len(engine.ENERGY_BREAKDOWNS)
+    values = np.full((len(engine.VALUE_NAMES), n, n_config + 1, len(engine.BREAKDOWNS)), np.nan)
+    for v, key in enumerate(('energy', 'emissions', 'costs')):
+        cols = slice(None, n_energy) if key != 'costs' else slice(n_energy, None)
+        values[v, :, 0, cols] = current[key].T
+        values[v, :, 1:, cols] = configs[key].transpose(2, 1, 0)
+    return values
+
+
+def result_columns(results, configs, home=None):
+    """
+    results - output of calculate
+    configs - the HeatPumpConfigs calculated
+    home - household label for each result column, default 0..n-1
+    returns dict of 1d arrays in the long layout of engine.result_columns, with
+    'Case' codes into configs.case_names()
+    """
+    values = result_values(results)
+    _, n, n_case, n_break = values.shape
+    home = np.arange(n) if home is None else np.asarray(home)
+    case_dtype = np.int8 if n_case < 128 else np.int32
+    columns = {'home': np.repeat(home, n_case*n_break),
+               'Case': np.tile(np.repeat(np.arange(n_case, dtype=case_dtype), n_break), n),
+               'Breakdown': np.tile(np.arange(n_break, dtype=np.int8), n*n_case)}
+    for name, val in zip(engine.VALUE_NAMES, values):
+        columns[name] = val.reshape(-1)
+    return columns
+
+
+def costs_table(current, configs_costs, names, i=0):
+    """
+    current - current case result (or its costs, from engine.current_costs)
+    configs_costs - configurations' case result (or costs, from engine.heat_pump_costs)
+    names - case names, from HeatPumpConfigs.case_names()
+    i - which household
+    returns columnar.ResultTable of costs in the layout of helper.generate_df
+    """
+    values = np.concatenate([current['costs'][None, :, i], configs_costs['costs'][:, :, i].T])
+    return ResultTable.from_cases(values[..., None], names, engine.COST_BREAKDOWNS, ['Costs (£)'])
+
+
+def energy_table(current, configs_energy, names, i=0, energy_breakdowns=None):
+    """
+    current, configs_energy - current and configurations' case results (or their
+                              energy stages, from engine.current_energy and heat_pump_energy)
+    names, i - as costs_table
+    energy_breakdowns - ENERGY_BREAKDOWNS to include, default all
+    returns columnar.ResultTable of energy and emissions in the layout of helper.generate_df
+    """
+    rows = [engine.ENERGY_BREAKDOWNS.index(b) for b in (energy_breakdowns or engine.ENERGY_BREAKDOWNS)]
+    values = np.stack([np.concatenate([current[key][None, rows, i], configs_energy[key][rows, :, i].T])
+                       for key in ('energy', 'emissions')], axis=-1)
+    return ResultTable.from_cases(values, names, [engine.ENERGY_BREAKDOWNS[r] for r in rows],
+                                  ['Energy (kWh)', 'Emissions (kg of CO2)'])
+
+
+def costs_frame(current, configs_costs, names, i=0):
+    """
+    as costs_table, returns DataFrame
+    """
+    return costs_table(current, configs_costs, names, i).frame()
+
+
+def energy_frame(current, configs_energy, names, i=0, energy_breakdowns=None):
+    """
+    as energy_table, returns DataFrame
+    """
+    return energy_table(current, configs_energy, names, i, energy_breakdowns).frame()
+
+
+def case_frames(results, configs, i=0, energy_breakdowns=None):
+    """
+    results - output of calculate
+    configs - the HeatPumpConfigs calculated
+    i - which household
+    energy_breakdowns - ENERGY_BREAKDOWNS to include in the energy table, default all
+    returns DataFrames of costs and of energy and emissions, in the layout of
+    helper.generate_df, as the page charts them
+    """
+    names = configs.case_names()
+    return (costs_frame(results['Current'], results['configs'], names, i),
+            energy_frame(results['Current'], results['configs'], names, i, energy_breakdowns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare any number of heat pump configurations.')
+    parser.add_argument('configs', help="CSV of configurations: 'name', 'heat_scop' and/or 'flow_temp', 'hw_cop'")
+    parser.add_argument('homes', help='CSV or Parquet file, one row per home')
+    parser.add_argument('output', help='CSV file, one row per home, case and breakdown')
+    parser.add_argument('--chunk-size', type=int, help='homes per chunk, default that of batch.py')
+    parser.add_argument('--id-column', help='column identifying each home')
+    args = parser.parse_args()
+
+    #imported here, as the page imports this module but doesn't need batch.py
+    import pandas as pd
+    from batch import DEFAULT_CHUNK_SIZE, engine_inputs, read_chunks
+
+    configs = HeatPumpConfigs.from_table(pd.read_csv(args.configs))
+    names = configs.case_names()
+    start = 0
+    for chunk in read_chunks(args.homes, args.chunk_size or DEFAULT_CHUNK_SIZE, args.id_column):
+        n = max((np.size(val) for val in chunk.values()), default=0)
+        home = chunk[args.id_column] if args.id_column else np.arange(start, start + n)
+        table = ResultTable(result_columns(calculate(engine_inputs(chunk), configs), configs, home), names)
+        table.frame().to_csv(args.output, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+        start += n
+    print(f'{start:,} homes x {len(configs)} configurations', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,705 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Vectorized version of the calculation in main.py.  Every input is a column
+# (one value per household, or a scalar shared by all of them) and every
+# branch of the page's logic is a masked array operation, so a whole portfolio
+# is evaluated in one pass.  For a single household the results are identical
+# to those shown on the page.
+
+import numpy as np
+
+import metrics
+
+#__________ set default values______________
+#efficiencies and performance coefficients - default values
+boiler_heat_eff = 0.88
+boiler_hw_eff = 0.88
+immersion_hw_eff = 1
+#typical heat pump performance:
+hp_heat_scop_typ = 3.4
+hp_hw_cop_typ = 2.8
+#hi heat pump performance
+hp_heat_scop_hi = 4.0
+hp_hw_cop_hi = 2.8
+
+#Raise in temp (degC) from mains water to hot water AS USED
+hw_temp_raise_default = 25
+
+#carbon intensity values taken from SAP 10.2 (dec 2021)
+GAS_kgCO2perkWh = 0.21
+ELEC_RENEW_kgCO2perkWh = 0
+ELEC_AVE_kgCO2perkWh = 0.136
+
+# price cap October 2025 gas and electricity domestic standing and unit charges
+gas_stand = 34.03
+gas_unit = 6.29
+elec_stand = 53.68
+elec_unit = 26.35
+#cosy octopus details
+elec_unit_cosy_standard=elec_unit
+elec_unit_cosy_offpeak = 0.6*elec_unit
+elec_unit_cosy_peak = 1.6*elec_unit
+pc_other_elec_cosy_offpeak = 0.2
+pc_other_elec_cosy_peak = 0.2
+cosy_second_tariff_hours = 6
+cosy_third_tariff_hours = 3
+cosy_offpeak_heat_demand_reduction = 1 #for cosy octopus - less heat demand in the night period due to switch to hot water, compensated by possible boost in day time.
+offpeak_heat_demand_reduction = 2/3 # for economy 7 and octopus go - less heat needed in the night
+
+# efficincy measures to choose from
+efficiency_opts = [('Draft proofing and/or door insulation (3%)', 0.03),
+                    ('Increased loft insulation (5%)', 0.05),
+                    ('Improved window glazing (5%)', 0.05),
+                    ('Cavity wall insulation (10%)', 0.1),
+                    ('Underfloor insulation (10%)', 0.1),
+                    ('Internal or external solid wall insulation (15%)', 0.15),
+                    ('Enter a custom heating demand saving', -1.0)]
+
+#__________ batch inputs and outputs______________
+# second heat source types, in the order of their integer codes
+SECOND_HEATSOURCE_TYPES = ['gas', 'electric', 'other']
+
+# value used for each input column that is not supplied - the page defaults
+DEFAULTS = {
+    'elec_total_kWh': 3000,
+    'gas_total_kWh': 12000,
+    'is_elec_renewable': False,
+    'is_hw_gas': True,
+    'hw_lday': 350,
+    'is_cook_gas': False,
+    'gas_cook_kWhweek': 8,
+    'elec_ev_kWh': 0, #annual, i.e. kWh per charge * charges per week * 52
+    'is_second_heatsource': False,
+    'second_heatsource_type': 0, #index into SECOND_HEATSOURCE_TYPES
+    'is_second_heatsource_remains': True,
+    'second_heatsource_kWh': 0,
+    'is_free_summer_hw': False,
+    'efficiency_boost': 0,
+    'switch_tariff_for_hp': True,
+    'turn_off_hp_in_peak_hours': True,
+    'is_disconnect_gas': True,
+    'n_tariff_states': 1,
+    'gas_stand': gas_stand,
+    'gas_unit': gas_unit,
+    'elec_stand': elec_stand,
+    'elec_unit': elec_unit,
+    'elec_unit2': elec_unit_cosy_offpeak,
+    'elec_unit3': elec_unit_cosy_peak,
+    'second_tariff_hours': cosy_second_tariff_hours,
+    'third_tariff_hours': cosy_third_tariff_hours,
+    'pc_elec_second_tariff': pc_other_elec_cosy_offpeak,
+    'pc_elec_third_tariff': pc_other_elec_cosy_peak, #no effect on results, as on the page
+    #heat pump tariff used if switch_tariff_for_hp
+    'elec_unit_cosy_standard': elec_unit_cosy_standard,
+    'elec_unit_cosy_offpeak': elec_unit_cosy_offpeak,
+    'elec_unit_cosy_peak': elec_unit_cosy_peak,
+    'cosy_second_tariff_hours': cosy_second_tariff_hours,
+    'cosy_third_tariff_hours': cosy_third_tariff_hours,
+    'boiler_heat_eff': boiler_heat_eff,
+    'boiler_hw_eff': boiler_hw_eff,
+    'hp_heat_scop_typ': hp_heat_scop_typ,
+    'hp_hw_cop_typ': hp_hw_cop_typ,
+    'hp_heat_scop_hi': hp_heat_scop_hi,
+    'hp_hw_cop_hi': hp_hw_cop_hi,
+    'hw_temp_raise': hw_temp_raise_default,
+}
+
+FLAG_INPUTS = ['is_elec_renewable', 'is_hw_gas', 'is_cook_gas', 'is_second_heatsource',
+               'is_second_heatsource_remains', 'is_free_summer_hw', 'switch_tariff_for_hp',
+               'turn_off_hp_in_peak_hours', 'is_disconnect_gas']
+
+ENERGY_BREAKDOWNS = ['Heating', 'Hot water', 'Cooking', 'EV', 'Other Elec.']
+COST_BREAKDOWNS = ['Gas standing', 'Gas unit', 'Elec.  standing', 'Elec.  unit']
+CASE_NAMES = ['Current', 'Typical HP Install', 'Hi-performance HP Install']
+# inputs that only change the costs, so a change to any of them leaves the energy
+# stage (calculate_energy) as it was
+TARIFF_INPUTS = ['is_free_summer_hw', 'switch_tariff_for_hp', 'turn_off_hp_in_peak_hours', 'n_tariff_states',
+                 'gas_stand', 'gas_unit', 'elec_stand', 'elec_unit', 'elec_unit2', 'elec_unit3',
+                 'second_tariff_hours', 'third_tariff_hours', 'pc_elec_second_tariff', 'pc_elec_third_tariff',
+                 'elec_unit_cosy_standard', 'elec_unit_cosy_offpeak', 'elec_unit_cosy_peak',
+                 'cosy_second_tariff_hours', 'cosy_third_tariff_hours']
+# rows and value columns of the long results table - as helper.generate_df
+BREAKDOWNS = ENERGY_BREAKDOWNS + COST_BREAKDOWNS
+VALUE_NAMES = ['Energy (kWh)', 'Emissions (kg of CO2)', 'Costs (£)']
+
+# households per block in calculate - keeps temporary arrays cache sized
+BLOCK_SIZE = 16384
+
+
+def second_heatsource_codes(values):
+    """
+    values - second heat source types, either integer codes or the strings
+             used on the page (anything other than 'gas'/'electric' is other)
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'iuf':
+        return values.astype(np.int8)
+    return np.where(values == 'gas', 0, np.where(values == 'electric', 1, 2)).astype(np.int8)
+
+
+def _rows(arrays):
+    """
+    arrays - list of scalars or 1d arrays
+    returns 2d array with one row per entry of arrays, broadcast to a common length
+    """
+    out = np.empty((len(arrays),) + np.broadcast_shapes((1,), *(np.shape(a) for a in arrays)))
+    for i, a in enumerate(arrays):
+        out[i] = a
+    return out
+
+
+def prepare_inputs(inputs):
+    """
+    inputs - mapping of input name to scalar or 1d array (one value per household)
+             missing inputs take the values in DEFAULTS
+    returns dict of arrays: float64 values, bool flags and integer codes for
+    n_tariff_states and second_heatsource_type.  Columns are 1d arrays of equal
+    length, scalars are kept as 0d arrays and broadcast in the calculation
+    """
+    unknown = set(inputs) - set(DEFAULTS)
+    if unknown:
+        raise KeyError('Unknown inputs: ' + ', '.join(sorted(unknown)))
+
+    sizes = set(np.size(val) for val in inputs.values()) - {1}
+    if len(sizes) > 1:
+        raise ValueError('Input columns have different lengths')
+
+    p = {}
+    for name, default in DEFAULTS.items():
+        val = inputs.get(name, default)
+        if name in FLAG_INPUTS:
+            val = np.asarray(val, dtype=bool)
+        elif name == 'second_heatsource_type':
+            val = second_heatsource_codes(val)
+        elif name == 'n_tariff_states':
+            val = np.asarray(val, dtype=np.int8)
+        else:
+            val = np.asarray(val, dtype=np.float64)
+        p[name] = val.reshape(-1) if val.size != 1 else val.reshape(())
+    return p
+
+
+def split_demand(p):
+    """
+    p - prepared inputs (see prepare_inputs)
+    returns dict of the current energy split by end use, as calculated on the page
+    """
+    #calculate hot water kWh/L
+    GAS_HW_kWhperL = 4200 * p['hw_temp_raise']/(3600 * 1000 * p['boiler_hw_eff'])
+    IMMERSION_HW_kWhperL = 4200 * p['hw_temp_raise']/(3600 * 1000 * immersion_hw_eff)
+
+    elec_other_kWh = np.maximum(p['elec_total_kWh'] - p['elec_ev_kWh'], 0)
+    elec_ev_kWh = p['elec_total_kWh'] - elec_other_kWh
+
+    # hot water energy demand
+    is_hw_gas = p['is_hw_gas']
+    gas_hw_kWh = np.where(is_hw_gas, p['hw_lday'] * 365 * GAS_HW_kWhperL, 0)
+    elec_hw_kWh = np.where(is_hw_gas, 0, p['hw_lday'] * 365 * IMMERSION_HW_kWhperL)
+
+    #cooking demand - only done if gas
+    gas_cook_kWh = np.where(p['is_cook_gas'], p['gas_cook_kWhweek'] * 52, 0)
+
+    #gas heating is remainder after hot water and cooking removed
+    gas_heat_kWh = p['gas_total_kWh'] - gas_hw_kWh - gas_cook_kWh
+
+    #electric secondary heating
+    is_elec_second = p['is_second_heatsource'] & (p['second_heatsource_type'] == 1)
+    elec_heat_kWh = np.where(is_elec_second, p['second_heatsource_kWh'], 0)
+
+    #electric other is remainder after heating and hw removed
+    elec_other_split_kWh = elec_other_kWh - elec_heat_kWh - elec_hw_kWh
+
+    #if other electricity is now negative, assume user has overestimated either
+    # their electric hw usage or electric heating - whichever the greater.
+    #reduce to bring other electricity to zero.
+    is_neg = elec_other_split_kWh < 0
+    is_hw_greater = elec_hw_kWh > elec_heat_kWh
+    elec_hw_kWh = np.where(is_neg & is_hw_greater, elec_hw_kWh + elec_other_split_kWh, elec_hw_kWh)
+    elec_heat_kWh = np.where(is_neg & ~is_hw_greater, elec_heat_kWh + elec_other_split_kWh, elec_heat_kWh)
+    elec_other_split_kWh = np.where(is_neg, 0, elec_other_split_kWh)
+
+    #select carbon intensity of electricity
+    elec_kgCO2perkWh = np.where(p['is_elec_renewable'], ELEC_RENEW_kgCO2perkWh, ELEC_AVE_kgCO2perkWh)
+
+    return {'gas_heat_kWh': gas_heat_kWh, 'elec_heat_kWh': elec_heat_kWh,
+            'gas_hw_kWh': gas_hw_kWh, 'elec_hw_kWh': elec_hw_kWh,
+            'gas_cook_kWh': gas_cook_kWh, 'elec_ev_kWh': elec_ev_kWh,
+            'elec_other_tariff_kWh': elec_other_kWh, #other elec. (inc. heating and hw) as costed in the current case
+            'elec_other_kWh': elec_other_split_kWh,
+            'elec_kgCO2perkWh': elec_kgCO2perkWh}
+
+
+def current_tariff(p):
+    """
+    p - prepared inputs
+    returns effective unit rate for other electricity and unit rate for EV charging
+    of the current tariff
+    """
+    is_two_rate = p['n_tariff_states'] == 2
+    #the page only applies the weighted rate for two-rate tariffs - a three-rate
+    #tariff is charged at its standard rate in the current case
+    elec_unit_eff = np.where(is_two_rate,
+                             (p['pc_elec_second_tariff']*p['elec_unit2']) + (1 - p['pc_elec_second_tariff'])*p['elec_unit'],
+                             p['elec_unit'])
+    elec_unit_ev = np.where(is_two_rate, p['elec_unit2'], p['elec_unit'])
+    return elec_unit_eff, elec_unit_ev
+
+
+def heat_pump_tariff(p):
+    """
+    p - prepared inputs
+    returns dict of the tariff used in the heat pump scenarios - either the current
+    tariff or the cosy octopus tariff if switch_tariff_for_hp - as unit rates for
+    each end use
+    """
+    switch = p['switch_tariff_for_hp']
+    elec_unit_eff, elec_unit_ev = current_tariff(p)
+
+    cosy_standard, cosy_offpeak, cosy_peak = \
+        p['elec_unit_cosy_standard'], p['elec_unit_cosy_offpeak'], p['elec_unit_cosy_peak']
+    pc_elec_second_tariff = pc_other_elec_cosy_offpeak
+    pc_elec_third_tariff = pc_other_elec_cosy_peak
+    cosy_unit_eff = (pc_elec_third_tariff*cosy_peak) + (pc_elec_second_tariff*cosy_offpeak) + \
+        (1 - pc_elec_second_tariff - pc_elec_third_tariff)*cosy_standard
+
+    n_tariff_states = np.where(switch, 3, p['n_tariff_states'])
+    elec_unit = np.where(switch, cosy_standard, p['elec_unit'])
+    elec_unit2 = np.where(switch, cosy_offpeak, p['elec_unit2'])
+    elec_unit3 = np.where(switch, cosy_peak, p['elec_unit3'])
+    second_tariff_hours = np.where(switch, p['cosy_second_tariff_hours'], p['second_tariff_hours'])
+    third_tariff_hours = np.where(switch, p['cosy_third_tariff_hours'], p['third_tariff_hours'])
+    reduction = np.where(switch, cosy_offpeak_heat_demand_reduction, offpeak_heat_demand_reduction)
+
+    #two or three rates: this pc of heating in second (and third) tariff, all of hot water
+    #in second tariff, same pc of other elec in second tariff as original scenario, cooking
+    #in third tariff if there is one.  Two rates is the three rate calculation with no
+    #heating in third tariff
+    is_three_rate = n_tariff_states == 3
+    is_peak_off = is_three_rate & p['turn_off_hp_in_peak_hours']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        day_hours = 24 - (1-reduction)*second_tariff_hours
+        pc_heat_second_tariff = reduction*second_tariff_hours/np.where(
+            is_peak_off, 24 - third_tariff_hours - (1-reduction)*second_tariff_hours, day_hours)
+        pc_heat_third_tariff = np.where(is_three_rate & ~is_peak_off, third_tariff_hours/day_hours, 0)
+
+    #a single rate tariff charges every end use at its unit rate
+    is_multi_rate = is_three_rate | (n_tariff_states == 2)
+    single = lambda rate: np.where(is_multi_rate, rate, elec_unit)
+
+    return {'is_multi_rate': is_multi_rate,
+            'is_three_rate': is_three_rate,
+            'is_peak_off': is_peak_off,
+            'elec_unit': elec_unit,
+            'elec_unit2': elec_unit2,
+            'elec_unit3': elec_unit3,
+            'second_tariff_hours': second_tariff_hours,
+            'third_tariff_hours': third_tariff_hours,
+            'elec_unit_heat': single(pc_heat_second_tariff*elec_unit2 + pc_heat_third_tariff*elec_unit3 +
+                                     (1-pc_heat_second_tariff-pc_heat_third_tariff)*elec_unit),
+            'elec_unit_hw': single(elec_unit2),
+            'elec_unit_cook': single(np.where(is_three_rate, elec_unit3, elec_unit)),
+            'elec_unit_ev': single(np.where(switch, cosy_offpeak, elec_unit_ev)),
+            'elec_unit_eff': single(np.where(switch, cosy_unit_eff, elec_unit_eff)),
+            'elec_stand_total': p['elec_stand']*3.65,
+            #don't include gas standing charge if disconnecting from gas
+            'gas_stand_total': np.where(p['is_disconnect_gas'], 0, p['gas_stand']*3.65)}
+
+
+def apply_hp_tariff(t, hp_tariff):
+    """
+    t - output of heat_pump_tariff
+    hp_tariff - dict of values replacing those of t, or None; a value given as a
+                (running through, off at peak) pair is picked for each home by
+                t['is_peak_off'], see tariffs.CompiledTariff.hp_tariff
+    returns t with the values replaced
+    """
+    if hp_tariff is None:
+        return t
+    return dict(t, **{key: np.where(t['is_peak_off'], val[1], val[0]) if isinstance(val, tuple) else val
+                      for key, val in hp_tariff.items()})
+
+
+def current_case(p, d):
+    """
+    p - prepared inputs
+    d - energy split from split_demand
+    returns case result dict: energy, emissions, elec_energy (electricity only; rows
+    ENERGY_BREAKDOWNS), costs (rows COST_BREAKDOWNS), their totals, and total
+    gas/electricity kWh
+    """
+    energy = current_energy(p, d)
+    return dict(energy, **current_costs(p, energy))
+
+
+def current_energy(p, d):
+    """
+    p - prepared inputs
+    d - energy split from split_demand
+    returns the energy stage of current_case: everything but the costs, plus the
+    other electricity as costed ('elec_other_tariff_kWh')
+    """
+    co2 = d['elec_kgCO2perkWh']
+    gas_total_kWh = p['gas_total_kWh']
+    elec_total_kWh = p['elec_total_kWh']
+    gas_heat_kWh, elec_heat_kWh = d['gas_heat_kWh'], d['elec_heat_kWh']
+    gas_hw_kWh, elec_hw_kWh = d['gas_hw_kWh'], d['elec_hw_kWh']
+    gas_cook_kWh, elec_ev_kWh = d['gas_cook_kWh'], d['elec_ev_kWh']
+    elec_other_kWh = d['elec_other_kWh']
+
+    energy = _rows([gas_heat_kWh+elec_heat_kWh, gas_hw_kWh+elec_hw_kWh, gas_cook_kWh,
+                       elec_ev_kWh, elec_other_kWh])
+    emissions = _rows([gas_heat_kWh*GAS_kgCO2perkWh+elec_heat_kWh*co2,
+                          gas_hw_kWh*GAS_kgCO2perkWh + elec_hw_kWh*co2,
+                          gas_cook_kWh*GAS_kgCO2perkWh,
+                          elec_ev_kWh*co2,
+                          elec_other_kWh*co2])
+
+    elec_energy = _rows([elec_heat_kWh, elec_hw_kWh, 0, elec_ev_kWh, elec_other_kWh])
+
+    energy_total = gas_total_kWh + elec_total_kWh
+    emissions_total = gas_heat_kWh*GAS_kgCO2perkWh + gas_hw_kWh*GAS_kgCO2perkWh + gas_cook_kWh*GAS_kgCO2perkWh + \
+        elec_total_kWh*co2
+
+    return {'energy': energy, 'emissions': emissions, 'elec_energy': elec_energy,
+            'energy_total': energy_total, 'emissions_total': emissions_total,
+            'gas_total_kWh': gas_total_kWh, 'elec_total_kWh': elec_total_kWh,
+            'elec_other_tariff_kWh': _rows([d['elec_other_tariff_kWh']])[0]}
+
+
+def current_costs(p, energy):
+    """
+    p - prepared inputs
+    energy - energy stage from current_energy
+    returns dict of the costs (rows COST_BREAKDOWNS) and costs_total of current_case
+    """
+    elec_unit_eff, elec_unit_ev = current_tariff(p)
+    gas_total_kWh = energy['gas_total_kWh']
+    elec_other_kWh, elec_ev_kWh = energy['elec_other_tariff_kWh'], energy['elec_energy'][3]
+
+    costs = _rows([p['gas_stand']*3.65,
+                      gas_total_kWh * p['gas_unit']/100,
+                      p['elec_stand']*3.65,
+                      (elec_other_kWh * elec_unit_eff + elec_ev_kWh * elec_unit_ev)/100])
+    costs_total = (p['gas_stand'] + p['elec_stand'])*3.65 + gas_total_kWh * p['gas_unit']/100 + \
+        elec_other_kWh * elec_unit_eff/100 + elec_ev_kWh * elec_unit_ev/100
+    return {'costs': costs, 'costs_total': costs_total}
+
+
+def heat_pump_demand(p, d):
+    """
+    p - prepared inputs
+    d - energy split from split_demand
+    returns dict of the heat pump scenario demand that doesn't depend on heat pump performance
+    """
+    efficiency_boost = p['efficiency_boost']
+    second_kWh = p['second_heatsource_kWh']
+    gas_heat_kWh, gas_cook_kWh = d['gas_heat_kWh'], d['gas_cook_kWh']
+    co2 = d['elec_kgCO2perkWh']
+
+    #future heating energy - dependent upon second heat source (if any)
+    second_type = np.where(p['is_second_heatsource'], p['second_heatsource_type'], -1)
+    remains = p['is_second_heatsource_remains']
+    is_remain_gas = remains & (second_type == 0)
+    is_removed_other = ~remains & (second_type == 2)
+    #gas heat to replace: less a remaining gas heat source, plus an 'other' one which
+    #isn't included in gas_heat_kWh (assume gas boiler efficiency for it)
+    gas_heat_replaced = np.where(is_remain_gas, gas_heat_kWh - second_kWh,
+                                 np.where(is_removed_other, gas_heat_kWh + second_kWh, gas_heat_kWh))
+    is_remain_other = remains & (second_type == 2)
+
+    #gas cooking energy
+    is_cook_gas, is_disconnect_gas = p['is_cook_gas'], p['is_disconnect_gas']
+    emissions_cook = np.where(is_disconnect_gas, gas_cook_kWh * co2, gas_cook_kWh * GAS_kgCO2perkWh)
+
+    return {'heat_replaced_kWh': (1 - efficiency_boost) * gas_heat_replaced * p['boiler_heat_eff'],
+            #removed electric heat source adds its heat after boiler efficiency
+            'heat_replaced_elec_kWh': (1 - efficiency_boost) * (gas_heat_kWh * p['boiler_heat_eff'] + second_kWh),
+            'is_remain_elec': remains & (second_type == 1),
+            'is_remain_other': is_remain_other,
+            'is_removed_elec': ~remains & (second_type == 1),
+            'gas_heat_kWh': np.select([is_remain_gas, is_remain_other], [second_kWh, gas_heat_kWh], 0),
+            #hot water heat as delivered by the gas boiler (at space heating efficiency) or immersion
+            'hw_heat_kWh': np.where(p['is_hw_gas'], d['gas_hw_kWh'] * p['boiler_heat_eff'],
+                                    d['elec_hw_kWh'] * immersion_hw_eff),
+            'elec_cook_kWh': np.where(is_cook_gas & is_disconnect_gas, gas_cook_kWh, 0),
+            'gas_cook_kWh': np.where(is_cook_gas & ~is_disconnect_gas, gas_cook_kWh, 0),
+            'emissions_cook': np.where(is_cook_gas, emissions_cook, 0)}
+
+
+def heat_pump_case(p, d, hp_heat_scop, hp_hw_cop, t=None, h=None):
+    """
+    p - prepared inputs
+    d - energy split from split_demand
+    hp_heat_scop, hp_hw_cop - heat pump performance, scalar or per household
+    t, h - heat pump tariff and demand from heat_pump_tariff and heat_pump_demand,
+           calculated if not given
+    returns case result dict, as current_case
+    """
+    if t is None:
+        t = heat_pump_tariff(p)
+    energy = heat_pump_energy(p, d, hp_heat_scop, hp_hw_cop, h)
+    return dict(energy, **heat_pump_costs(p, energy, t))
+
+
+def heat_pump_energy(p, d, hp_heat_scop, hp_hw_cop, h=None):
+    """
+    p, d, hp_heat_scop, hp_hw_cop, h - as heat_pump_case
+    returns the energy stage of heat_pump_case: everything but the costs
+    """
+    if h is None:
+        h = heat_pump_demand(p, d)
+    co2 = d['elec_kgCO2perkWh']
+    second_kWh = p['second_heatsource_kWh']
+    elec_ev_kWh, elec_other_kWh = d['elec_ev_kWh'], d['elec_other_kWh']
+    gas_heat_kWh, gas_cook_kWh, elec_cook_kWh = h['gas_heat_kWh'], h['gas_cook_kWh'], h['elec_cook_kWh']
+    emissions_cook = h['emissions_cook']
+
+    elec_heat_replaced = h['heat_replaced_kWh']/hp_heat_scop
+    elec_heat_kWh = np.select(
+        [h['is_remain_elec'], h['is_remain_other'], h['is_removed_elec']],
+        [second_kWh + elec_heat_replaced,
+         d['elec_heat_kWh'], #remaining 'other' heat source leaves heating as it is today
+         h['heat_replaced_elec_kWh']/hp_heat_scop],
+        elec_heat_replaced)
+    elec_hw_kWh = h['hw_heat_kWh']/hp_hw_cop
+
+    #totals
+    elec_total_kWh = elec_other_kWh + elec_heat_kWh + elec_hw_kWh + elec_cook_kWh + elec_ev_kWh
+    gas_total_kWh = gas_heat_kWh + gas_cook_kWh
+
+    energy = _rows([gas_heat_kWh+elec_heat_kWh, elec_hw_kWh, gas_cook_kWh+elec_cook_kWh,
+                    elec_ev_kWh, elec_other_kWh])
+    emissions = _rows([gas_heat_kWh*GAS_kgCO2perkWh+elec_heat_kWh*co2, elec_hw_kWh*co2, emissions_cook,
+                       elec_ev_kWh*co2, elec_other_kWh*co2])
+    energy_total = elec_heat_kWh + elec_hw_kWh + elec_cook_kWh + elec_ev_kWh + elec_other_kWh + gas_heat_kWh + gas_cook_kWh
+    emissions_total = elec_heat_kWh*co2 + gas_heat_kWh*GAS_kgCO2perkWh + elec_hw_kWh*co2 + emissions_cook + \
+        elec_ev_kWh*co2 + elec_other_kWh*co2
+    elec_energy = _rows([elec_heat_kWh, elec_hw_kWh, elec_cook_kWh, elec_ev_kWh, elec_other_kWh])
+
+    return {'energy': energy, 'emissions': emissions, 'elec_energy': elec_energy,
+            'energy_total': energy_total, 'emissions_total': emissions_total,
+            'gas_total_kWh': gas_total_kWh, 'elec_total_kWh': elec_total_kWh}
+
+
+def heat_pump_costs(p, energy, t):
+    """
+    p - prepared inputs
+    energy - energy stage from heat_pump_energy
+    t - heat pump tariff from heat_pump_tariff
+    returns dict of the costs (rows COST_BREAKDOWNS) and costs_total of heat_pump_case
+    """
+    elec_heat_kWh, elec_hw_kWh, elec_cook_kWh, elec_ev_kWh, elec_other_kWh = energy['elec_energy']
+    gas_total_kWh = energy['gas_total_kWh']
+
+    #each end use at its unit rate from the tariff
+    #those with solar panels can get free hot water for 4 months
+    elec_hw_billed = np.where(p['is_free_summer_hw'], elec_hw_kWh*(2/3), elec_hw_kWh)
+    elec_unit_total_cost = (elec_heat_kWh * t['elec_unit_heat'] + elec_hw_billed*t['elec_unit_hw'] +
+                            elec_cook_kWh*t['elec_unit_cook'] + elec_ev_kWh*t['elec_unit_ev'] +
+                            elec_other_kWh*t['elec_unit_eff'])/100
+
+    gas_stand_total, elec_stand_total = t['gas_stand_total'], t['elec_stand_total']
+    costs = _rows([gas_stand_total, gas_total_kWh*p['gas_unit']/100, elec_stand_total, elec_unit_total_cost])
+    costs_total = gas_stand_total + gas_total_kWh*p['gas_unit']/100 + elec_stand_total + elec_unit_total_cost
+    return {'costs': costs, 'costs_total': costs_total}
+
+
+def calculate(inputs, block_size=None, hp_tariff=None):
+    """
+    inputs - mapping of input name to scalar or 1d array, see DEFAULTS
+    block_size - number of households evaluated at a time, default BLOCK_SIZE
+    hp_tariff - dict of heat pump tariff values replacing those of heat_pump_tariff,
+                e.g. tariffs.CompiledTariff.hp_tariff() to cost the heat pump cases
+                against any time-of-use tariff (see apply_hp_tariff)
+    returns dict of case name (CASE_NAMES) to case result dict, each value an
+    array with households along the last axis
+    """
+    return _by_block(prepare_inputs(inputs), lambda p, rows: _calculate_block(p, hp_tariff), block_size)
+
+
+def calculate_energy(inputs, block_size=None):
+    """
+    inputs, block_size - as calculate
+    returns the energy stage of calculate: dict of case name to case result dict
+    without the costs, which only depends on the inputs not in TARIFF_INPUTS
+    """
+    return _by_block(prepare_inputs(inputs), lambda p, rows: _energy_block(p), block_size)
+
+
+def calculate_costs(inputs, energy, block_size=None, hp_tariff=None):
+    """
+    inputs, block_size, hp_tariff - as calculate
+    energy - output of calculate_energy for the same inputs, apart from any in TARIFF_INPUTS
+    returns dict of case name to case result dict, as calculate
+    """
+    def cost_block(p, rows):
+        block_energy = {case: {key: val[..., rows] for key, val in res.items()} for case, res in energy.items()}
+        return _cost_block(p, block_energy, hp_tariff)
+    return _by_block(prepare_inputs(inputs), cost_block, block_size)
+
+
+def calculate_configs(inputs, heat_scop, hw_cop, block_size=None, hp_tariff=None):
+    """
+    inputs, block_size, hp_tariff - as calculate
+    heat_scop, hw_cop - heat pump performance of each configuration, (configs,) or
+                        (configs, households) arrays
+    returns dict of 'Current' and 'configs' case result dicts: the heat pump case of
+    every configuration in one pass, its arrays with (configs, households) as the
+    last two axes
+    """
+    heat_scop, hw_cop = np.broadcast_arrays(np.asarray(heat_scop, dtype=np.float64),
+                                            np.asarray(hw_cop, dtype=np.float64))
+    if heat_scop.ndim == 1:
+        heat_scop, hw_cop = heat_scop[:, None], hw_cop[:, None]
+    per_household = heat_scop.shape[1] > 1
+
+    def config_block(p, rows):
+        if per_household:
+            return _configs_block(p, heat_scop[:, rows], hw_cop[:, rows], hp_tariff)
+        return _configs_block(p, heat_scop, hw_cop, hp_tariff)
+    return _by_block(prepare_inputs(inputs), config_block, block_size)
+
+
+def _by_block(p, func, block_size=None):
+    """
+    p - prepared inputs
+    func - function of a block of prepared inputs and its slice of the households,
+           returning dict of case name to case result dict for the block
+    returns the results of func for all households
+    """
+    n = max((val.size for val in p.values() if val.ndim), default=1)
+    block_size = block_size or BLOCK_SIZE
+
+    #evaluate in blocks small enough for the temporaries to stay in cache
+    results = None
+    for start in range(0, max(n, 1), block_size):
+        rows = slice(start, start + block_size)
+        block = func({name: val[rows] if val.ndim else val for name, val in p.items()}, rows)
+        if results is None:
+            results = {case: {key: np.empty(val.shape[:-1] + (n,) if val.ndim > 1 else (n,))
+                              for key, val in res.items()}
+                       for case, res in block.items()}
+        for case, res in block.items():
+            for key, val in res.items():
+                results[case][key][..., rows] = val
+    return results
+
+
+def _calculate_block(p, hp_tariff=None):
+    with metrics.span('engine.demand'):
+        d = split_demand(p)
+        t = apply_hp_tariff(heat_pump_tariff(p), hp_tariff)
+        h = heat_pump_demand(p, d)
+    with metrics.span('engine.current_case'):
+        results = {'Current': current_case(p, d)}
+    with metrics.span('engine.heat_pump_case'):
+        results['Typical HP Install'] = heat_pump_case(p, d, p['hp_heat_scop_typ'], p['hp_hw_cop_typ'], t, h)
+    with metrics.span('engine.heat_pump_case'):
+        results['Hi-performance HP Install'] = heat_pump_case(p, d, p['hp_heat_scop_hi'], p['hp_hw_cop_hi'], t, h)
+    return results
+
+
+def _energy_block(p):
+    with metrics.span('engine.energy'):
+        d = split_demand(p)
+        h = heat_pump_demand(p, d)
+        return {'Current': current_energy(p, d),
+                'Typical HP Install': heat_pump_energy(p, d, p['hp_heat_scop_typ'], p['hp_hw_cop_typ'], h),
+                'Hi-performance HP Install': heat_pump_energy(p, d, p['hp_heat_scop_hi'], p['hp_hw_cop_hi'], h)}
+
+
+def _cost_block(p, energy, hp_tariff=None):
+    with metrics.span('engine.costs'):
+        t = apply_hp_tariff(heat_pump_tariff(p), hp_tariff)
+        results = {'Current': dict(energy['Current'], **current_costs(p, energy['Current']))}
+        for case in CASE_NAMES[1:]:
+            results[case] = dict(energy[case], **heat_pump_costs(p, energy[case], t))
+        return results
+
+
+def _configs_block(p, heat_scop, hw_cop, hp_tariff=None):
+    with metrics.span('engine.demand'):
+        d = split_demand(p)
+        t = apply_hp_tariff(heat_pump_tariff(p), hp_tariff)
+        h = heat_pump_demand(p, d)
+    with metrics.span('engine.current_case'):
+        current = current_case(p, d)
+    #the configurations are a leading axis the whole heat pump case broadcasts over
+    with metrics.span('engine.heat_pump_case'):
+        configs = heat_pump_case(p, d, heat_scop, hw_cop, t, h)
+        configs['gas_total_kWh'] = np.broadcast_to(configs['gas_total_kWh'], configs['elec_total_kWh'].shape)
+    return {'Current': current, 'configs': configs}
+
+
+def case_rows(results, case_name, i=0):
+    """
+    results - output of calculate
+    case_name - which case, one of CASE_NAMES
+    i - which household
+    returns list of lists of energy usage [case, breakdown, kWh, kgCO2] and of
+    costs [case, breakdown, cost], as used to build the page's tables
+    """
+    res = results[case_name]
+    energy_usage = [[case_name, lab, float(res['energy'][j, i]), float(res['emissions'][j, i])]
+                    for j, lab in enumerate(ENERGY_BREAKDOWNS)]
+    costs_by_type = [[case_name, lab, float(res['costs'][j, i])] for j, lab in enumerate(COST_BREAKDOWNS)]
+    return energy_usage, costs_by_type
+
+
+def result_columns(results, home=None):
+    """
+    results - output of calculate
+    home - household label for each result column, default 0..n-1
+    returns dict of 1d arrays in the long layout of helper.generate_df, one row
+    per household, case and breakdown: 'home', 'Case' and 'Breakdown' (codes into
+    CASE_NAMES and BREAKDOWNS) and VALUE_NAMES (NaN where not applicable)
+    """
+    n = results[CASE_NAMES[0]]['energy'].shape[1]
+    n_case, n_energy, n_break = len(CASE_NAMES), len(ENERGY_BREAKDOWNS), len(BREAKDOWNS)
+    home = np.arange(n) if home is None else np.asarray(home)
+
+    values = np.full((len(VALUE_NAMES), n, n_case, n_break), np.nan)
+    for c, case in enumerate(CASE_NAMES):
+        res = results[case]
+        values[0, :, c, :n_energy] = res['energy'].T
+        values[1, :, c, :n_energy] = res['emissions'].T
+        values[2, :, c, n_energy:] = res['costs'].T
+
+    columns = {'home': np.repeat(home, n_case*n_break),
+               'Case': np.tile(np.repeat(np.arange(n_case, dtype=np.int8), n_break), n),
+               'Breakdown': np.tile(np.arange(n_break, dtype=np.int8), n*n_case)}
+    for name, val in zip(VALUE_NAMES, values):
+        columns[name] = val.reshape(-1)
+    return columns
+
+
+def metric(results, case_name, name):
+    """
+    results - output of calculate
+    case_name - one of CASE_NAMES
+    name - a total ('costs_total', 'emissions_total', 'energy_total', 'gas_total_kWh',
+           'elec_total_kWh') or 'saving', the current cost less the cost of case_name
+    returns 1d array, one value per household
+    """
+    if name == 'saving':
+        return results['Current']['costs_total'] - results[case_name]['costs_total']
+    return results[case_name][name]
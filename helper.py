@@ -19,9 +19,17 @@
 # For enquiries about using this source code, please contact:
 # hello@greenheatcoop.co.uk
 
-import pandas as pd
+# pandas, altair and PIL are imported when a DataFrame, chart or image is first
+# asked for, so importing this module stays cheap for callers that only need the engine
+import io
+
 import numpy as np
-import altair as alt
+
+#height of each case's bar in make_stacked_bar_horiz, in pixels
+CASE_BAR_HEIGHT = 40
+
+#vega-lite specs of make_stacked_bar_horiz without their data, by layout
+_spec_templates = {}
 
 
 def generate_df(data_list, data_list_new, value_names):
@@ -31,30 +39,115 @@ def generate_df(data_list, data_list_new, value_names):
             data_list_new can be list of such list of lists of data
     value_names: column names of data values    
     """
+    import pandas as pd
+
     cols = ["Case", "Breakdown"]
     cols.extend(value_names)
-    
-    df1 = pd.DataFrame(data_list, columns=cols)
-    concat_list = [df1]
-    if type(data_list_new) is list:
-        for data in data_list_new:
-            concat_list.append(pd.DataFrame(data, columns=cols))
-    else:
-        concat_list.append(pd.DataFrame(data_list_new, columns=cols))
 
-    df = pd.concat(concat_list)
-    df.round(0)
-    df[df == 0] = np.NaN
-    
+    #one frame of all the rows, rather than one per case concatenated
+    rows = list(data_list)
+    for data in (data_list_new if type(data_list_new) is list else [data_list_new]):
+        rows.extend(data)
+    df = pd.DataFrame(rows, columns=cols)
+    values = df[value_names]
+    df[value_names] = values.where(values != 0)
+
     return df
 
+
+def generate_case_df(values, case_names, breakdowns, value_names):
+    """
+    values - (cases, breakdowns, value names) array
+    case_names, breakdowns - labels of the first two axes of values
+    value_names - column names of data values
+    returns dataframe in the layout of generate_df, built in one go however many
+    cases there are; Case and Breakdown are categorical, in the order of case_names
+    and breakdowns
+    """
+    from columnar import ResultTable
+
+    return ResultTable.from_cases(values, case_names, breakdowns, value_names).frame()
+
+
+def case_order(source):
+    """
+    source - dataframe with a Case column, or columnar.ResultTable
+    returns list of the cases in the order they are charted: the categories of a
+    categorical Case, otherwise the page's three cases
+    """
+    if hasattr(source, 'case_names'):
+        return list(source.case_names)
+    if hasattr(source['Case'], 'cat'):
+        return list(source['Case'].cat.categories)
+    return ['Current', 'Typical HP Install', 'Hi-performance HP Install']
+
+
+def encode_image(path, max_width):
+    """
+    path - image file
+    max_width - widest the image is ever shown, in pixels
+    returns the encoded image bytes, shrunk to max_width if wider and re-encoded in its own format
+    """
+    from PIL import Image
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    img = Image.open(io.BytesIO(data))
+    if img.width <= max_width:
+        return data
+
+    fmt = img.format
+    img = img.resize((max_width, round(img.height*max_width/img.width)), resample=Image.LANCZOS)
+    buf = io.BytesIO()
+    if fmt == 'PNG':
+        img.save(buf, format='PNG', optimize=True)
+    else:
+        img.save(buf, format='JPEG', quality=90, optimize=True)
+    return buf.getvalue()
+
     
+def stacked_bar_horiz_spec(source, value_name, col_scheme=2):
+    """
+    source, value_name, col_scheme - as make_stacked_bar_horiz
+    returns the vega-lite spec (dict) of make_stacked_bar_horiz(source, value_name, col_scheme):
+    altair builds it once for each value, colour scheme and order of cases, then
+    later charts of that layout only get their data filled in.  A ResultTable source
+    goes straight from its columns to the records, without a DataFrame
+    """
+    import hashlib
+    import json
+
+    key = (value_name, col_scheme, tuple(case_order(source)))
+    template = _spec_templates.get(key)
+    if template is None:
+        spec = make_stacked_bar_horiz(source, value_name, col_scheme).to_dict()
+        template = _spec_templates[key] = {k: v for k, v in spec.items() if k not in ('data', 'datasets')}
+
+    if hasattr(source, 'records'):
+        records = source.records()
+    else:
+        #the records altair writes: strings for the labels, floats or None for missing values
+        columns = {}
+        for name in source.columns:
+            col = source[name]
+            if col.dtype.kind == 'f' or name == value_name:
+                values = col.to_numpy(dtype=float)
+                columns[name] = [None if v != v else v for v in values.tolist()]
+            else:
+                columns[name] = col.astype(str).tolist()
+        records = [dict(zip(columns, row)) for row in zip(*columns.values())]
+    name = 'data-' + hashlib.md5(json.dumps(records, sort_keys=True).encode()).hexdigest()
+    return dict(template, data={'name': name}, datasets={name: records})
+
+
 def make_stacked_bar_narrow(source, value_name, col_scheme=2):
     """
     source - dataframe
     value_name - what to plot
     col_scheme - 1 if costs, otherwise 2
     """
+    import altair as alt
+
     source = source.astype({value_name: 'float'})
 
     if col_scheme == 1:
@@ -87,26 +180,35 @@ def make_stacked_bar_narrow(source, value_name, col_scheme=2):
 
 def make_stacked_bar_horiz(source, value_name, col_scheme=2):
     """
-    source - dataframe
+    source - dataframe or columnar.ResultTable
     value_name - what to plot
     col_scheme - 1 if costs, otherwise 2
     """
-    source = source.astype({value_name: 'float'})
+    import altair as alt
+
+    if hasattr(source, 'frame'):
+        source = source.frame()
+    if source[value_name].dtype != float:
+        source = source.astype({value_name: 'float'})
 
     if col_scheme == 1:
         col_scheme = 'paired'
     else:
         col_scheme = 'category10'
 
+    #taller for more than the page's three cases, so each bar keeps its width
+    order = case_order(source)
+    height = max(300, CASE_BAR_HEIGHT*len(order))
+
     x_str = value_name #'Total Annual ' + 
     bars = alt.Chart(source).mark_bar().encode(
     x=alt.X('sum(' + value_name + '):Q', stack='zero', title=x_str),
-    y=alt.Y('Case:N', sort=['Current', 'Typical HP Install', 'Hi-performance HP Install']),
+    y=alt.Y('Case:N', sort=order),
     color=alt.Color('Breakdown:N', legend=alt.Legend(
         orient='top', #legendX=0, legendY=400,        
         direction='horizontal'),    
         scale=alt.Scale(scheme=col_scheme))
-    ).properties(width='container', height=300 #title=titleStr,
+    ).properties(width='container', height=height #title=titleStr,
     ).configure_axis(titleFontSize=16, labelFontSize=14
     ).configure_legend(titleFontSize=16, labelFontSize=14)#.configure_title(fontSize=18
     #)
@@ -0,0 +1,314 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Hourly version of the heat pump cases.  Instead of one seasonal SCOP and fixed
+# fractions of heating in each tariff window, the annual heat demand is spread over
+# the 8760 hours of a year in proportion to degree-hours, each hour gets a COP from
+# the outdoor and flow temperatures, and each hour is priced at the tariff rate
+# for that time of day.  The hourly arrays are evaluated in tiles of hours x households
+# so memory stays bounded.  The results have the same layout as engine.calculate, so
+# anything that reads those (case_rows, result_columns, batch output) works unchanged.
+
+import numpy as np
+
+import engine
+
+HOURS_PER_YEAR = 8760
+DAYS_PER_YEAR = 365
+
+#inputs only used by the hourly model, on top of engine.DEFAULTS
+HOURLY_DEFAULTS = {
+    'hp_flow_temp_typ': 45.0, #degC, typical installation
+    'hp_flow_temp_hi': 35.0, #degC, low temperature high-performance installation
+    'hw_flow_temp': 55.0, #degC, to heat the hot water cylinder
+}
+
+#outdoor temperature above which no heating is needed, degC
+HEAT_BASE_TEMP = 15.5
+
+#heat pump COP as a fraction of the ideal (Carnot) COP for the temperature lift
+CARNOT_EFFICIENCY = 0.45
+#smallest temperature lift and largest COP allowed, for mild hours
+MIN_TEMP_LIFT = 5.0
+MAX_COP = 8.0
+
+#time of day of the cheap and the expensive windows of a multi-rate tariff: the
+#off-peak window ends at 7am (as economy 7) and the peak window starts at 4pm
+OFFPEAK_END_HOUR = 7
+PEAK_START_HOUR = 16
+#heating demand overnight (11pm to 6am) is reduced by the same factor the fixed
+#fraction calculation assumes for off-peak hours
+NIGHT_START_HOUR = 23
+NIGHT_HOURS = 7
+
+#rows per tile of the hourly calculation: each (tile, 8760) float64 array is about 9 MB
+TILE_SIZE = 128
+
+
+def synthetic_temperature(mean=10.0, seasonal=6.5, diurnal=3.0, coldest_day=20, warmest_hour=15):
+    """
+    mean - annual mean outdoor temperature, degC
+    seasonal, diurnal - amplitudes of the yearly and daily cycles, degC
+    coldest_day - day of the year with the lowest mean temperature
+    warmest_hour - hour of the day with the highest temperature
+    returns 1d array of 8760 hourly outdoor temperatures, a smooth typical UK year
+    """
+    hour = np.arange(HOURS_PER_YEAR)
+    day = hour / 24
+    return mean - seasonal*np.cos(2*np.pi*(day - coldest_day)/DAYS_PER_YEAR) + \
+        diurnal*np.cos(2*np.pi*(hour % 24 - warmest_hour)/24)
+
+
+def window_weights(start, length, slots=24):
+    """
+    start - hour of the day the window starts, scalar or per household
+    length - length of the window in hours, may be fractional
+    slots - number of equal slots the day is divided into
+    returns (n, slots) array of the fraction of each slot of the day inside the window
+    """
+    start, length = np.broadcast_arrays(np.atleast_1d(start)[:, None], np.atleast_1d(length)[:, None])
+    width = 24/slots
+    slot = np.arange(slots)*width
+    weights = np.zeros(start.shape[:1] + (slots,))
+    #the window can wrap past midnight
+    for shift in (-24, 0, 24):
+        weights += np.clip(np.minimum(slot + width, start + length + shift) - np.maximum(slot, start + shift), 0, width)
+    return np.minimum(weights/width, 1)
+
+
+def heating_profile(temperature, base_temp=HEAT_BASE_TEMP):
+    """
+    temperature - (8760,) or (regions, 8760) hourly outdoor temperatures
+    base_temp - outdoor temperature above which no heating is needed
+    returns array of the same shape, the share of the annual heat demand in each hour
+    """
+    night = window_weights(NIGHT_START_HOUR, NIGHT_HOURS)[0]
+    hour_weight = 1 - (1 - engine.offpeak_heat_demand_reduction)*night
+    degree_hours = np.maximum(base_temp - np.asarray(temperature, dtype=float), 0)
+    degree_hours = degree_hours * np.tile(hour_weight, DAYS_PER_YEAR)
+    return degree_hours / degree_hours.sum(axis=-1, keepdims=True)
+
+
+def cop(temperature, flow_temp):
+    """
+    temperature - outdoor temperatures, degC
+    flow_temp - heat pump flow temperatures, degC, broadcast against temperature
+    returns COP of each hour
+    """
+    lift = np.maximum(flow_temp - temperature, MIN_TEMP_LIFT)
+    return np.minimum(CARNOT_EFFICIENCY*(flow_temp + 273.15)/lift, MAX_COP)
+
+
+def seasonal_cop(flow_temp, temperature=None, base_temp=HEAT_BASE_TEMP):
+    """
+    flow_temp - heat pump flow temperatures, degC, scalar or 1d array
+    temperature - (8760,) hourly outdoor temperatures, default synthetic_temperature()
+    base_temp - outdoor temperature above which no heating is needed
+    returns 1d array, the seasonal COP of space heating at each flow temperature
+    """
+    temperature = synthetic_temperature() if temperature is None else np.asarray(temperature, dtype=float)
+    profile = heating_profile(temperature, base_temp)
+    return 1/((1/cop(temperature, np.atleast_1d(flow_temp)[:, None])) @ profile)
+
+
+def hourly_rates(t):
+    """
+    t - heat pump tariff from engine.heat_pump_tariff
+    returns (n, 24) unit rate of each hour of the day and (n, 24) off-peak and peak
+    window weights
+    """
+    n = max(np.size(val) for val in t.values())
+    is_multi_rate = np.broadcast_to(t['is_multi_rate'], (n,))[:, None]
+    offpeak = window_weights(OFFPEAK_END_HOUR - t['second_tariff_hours'], t['second_tariff_hours'])
+    peak = window_weights(PEAK_START_HOUR, t['third_tariff_hours'])
+    peak = np.where(np.broadcast_to(t['is_three_rate'], (n,))[:, None], peak, 0)
+    offpeak = np.where(is_multi_rate, np.minimum(offpeak, 1 - peak), 0)
+    elec_unit, elec_unit2, elec_unit3 = [np.broadcast_to(t[key], (n,))[:, None]
+                                         for key in ('elec_unit', 'elec_unit2', 'elec_unit3')]
+    rates = offpeak*elec_unit2 + peak*elec_unit3 + (1 - offpeak - peak)*elec_unit
+    return np.broadcast_to(rates, (n, 24)), offpeak, peak
+
+
+def _by_hour_of_day(hourly):
+    return hourly.reshape(hourly.shape[:-1] + (DAYS_PER_YEAR, 24)).sum(axis=-2)
+
+
+def _heat_electricity(profile, temperature, flow_temp, peak_off):
+    """
+    profile, temperature - (k, 8760) heat demand shares and outdoor temperatures
+    flow_temp - (k, 1) flow temperatures
+    peak_off - (k, 24) fraction of each hour of the day the heat pump is off
+    returns (k, 24) electricity per kWh of annual heat by hour of the day, and (k,)
+    seasonal COP if no demand were moved
+    """
+    hourly_cop = cop(temperature, flow_temp)
+
+    #heat demand in hours the heat pump is off moves to the other hours of the same day
+    daily = profile.reshape(profile.shape[:-1] + (DAYS_PER_YEAR, 24))
+    kept = daily * (1 - peak_off[:, None, :])
+    kept_total = kept.sum(axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(kept_total > 0, daily.sum(axis=-1, keepdims=True)/kept_total, 1)
+    elec = (kept*scale).reshape(profile.shape) / hourly_cop
+    return _by_hour_of_day(elec), 1/(profile/hourly_cop).sum(axis=-1)
+
+
+def _hw_electricity(temperature, flow_temp, schedule):
+    """
+    temperature - (k, 8760) outdoor temperatures
+    flow_temp - (k, 1) hot water flow temperatures
+    schedule - (k, 24) share of each day's hot water heated in each hour
+    returns (k, 24) electricity per kWh of annual hot water by hour of the day, and
+    (k,) seasonal COP heating evenly through the day
+    """
+    hourly_cop = cop(temperature, flow_temp)
+    elec = np.tile(schedule, DAYS_PER_YEAR) / DAYS_PER_YEAR / hourly_cop
+    return _by_hour_of_day(elec), 1/(1/hourly_cop).mean(axis=-1)
+
+
+def _shape_electricity(shapes, profile, temperature, tile_size):
+    """
+    shapes - (k, 51) distinct rows of region, typical, high-performance and hot water
+             flow temperatures, then hours off and hot water schedule by hour of the day
+    profile, temperature - (regions, 8760) heat demand shares and outdoor temperatures
+    tile_size - rows evaluated at a time
+    returns dict of (k, 24) electricity by hour of the day and (k,) seasonal COPs if no
+    demand were moved, for heating in each case and for hot water
+    """
+    k = len(shapes)
+    out = {name: np.empty((k, 24)) for name in ('heat_typ', 'heat_hi', 'hw')}
+    out.update({name: np.empty(k) for name in ('heat_typ_even', 'heat_hi_even', 'hw_even')})
+    for start in range(0, k, tile_size):
+        rows = slice(start, start + tile_size)
+        tile = shapes[rows]
+        region = tile[:, 0].astype(np.intp)
+        peak_off, hw_schedule = tile[:, 4:28], tile[:, 28:52]
+        tile_profile, tile_temperature = profile[region], temperature[region]
+        out['heat_typ'][rows], out['heat_typ_even'][rows] = \
+            _heat_electricity(tile_profile, tile_temperature, tile[:, 1:2], peak_off)
+        out['heat_hi'][rows], out['heat_hi_even'][rows] = \
+            _heat_electricity(tile_profile, tile_temperature, tile[:, 2:3], peak_off)
+        out['hw'][rows], out['hw_even'][rows] = _hw_electricity(tile_temperature, tile[:, 3:4], hw_schedule)
+    return out
+
+
+def _prepare(inputs, temperature, region):
+    inputs = dict(inputs)
+    hourly_inputs = {name: np.asarray(inputs.pop(name, default), dtype=float)
+                     for name, default in HOURLY_DEFAULTS.items()}
+    p = engine.prepare_inputs(inputs)
+    n = max((val.size for val in list(p.values()) + list(hourly_inputs.values()) if val.ndim), default=1)
+    for name, val in hourly_inputs.items():
+        if val.ndim and val.size != n:
+            raise ValueError(f'{name} has {val.size} values, expected {n}')
+
+    temperature = synthetic_temperature() if temperature is None else np.asarray(temperature, dtype=float)
+    temperature = np.atleast_2d(temperature)
+    if temperature.shape[-1] != HOURS_PER_YEAR:
+        raise ValueError(f'temperature has {temperature.shape[-1]} hours, expected {HOURS_PER_YEAR}')
+    region = np.zeros(n, dtype=np.intp) if region is None else np.broadcast_to(np.asarray(region, dtype=np.intp), (n,))
+    if region.size and (region.min() < 0 or region.max() >= len(temperature)):
+        raise ValueError(f'region codes must be between 0 and {len(temperature) - 1}')
+    return p, hourly_inputs, n, temperature, region
+
+
+def calculate(inputs, temperature=None, region=None, calibrate=True, block_size=None, tile_size=None):
+    """
+    inputs - mapping of input name to scalar or 1d array, see engine.DEFAULTS and HOURLY_DEFAULTS
+    temperature - (8760,) hourly outdoor temperatures, or (regions, 8760) with region
+                  giving each household's row, default synthetic_temperature()
+    region - integer region code per household
+    calibrate - scale each household's COP curve so the rated SCOPs are met before load
+                shifting, so only the timing of demand changes the results; otherwise the
+                COPs come from the temperatures alone
+    block_size - number of households evaluated at a time, default engine.BLOCK_SIZE
+    tile_size - number of distinct hourly shapes evaluated at a time, default TILE_SIZE
+    returns dict of case name to case result dict, as engine.calculate.  The heat
+    pump cases also have the achieved 'heat_scop' and 'hw_cop'
+    """
+    p, hourly_inputs, n, temperature, region = _prepare(inputs, temperature, region)
+    profile = heating_profile(temperature)
+    block_size = block_size or engine.BLOCK_SIZE
+    tile_size = tile_size or TILE_SIZE
+
+    results = None
+    for start in range(0, max(n, 1), block_size):
+        rows = slice(start, start + block_size)
+        block = _calculate_block({name: val[rows] if val.ndim else val for name, val in p.items()},
+                                 {name: val[rows] if val.ndim else val for name, val in hourly_inputs.items()},
+                                 profile, temperature, region[rows], calibrate, tile_size)
+        if results is None:
+            results = {case: {key: np.empty(val.shape[:-1] + (n,) if val.ndim > 1 else (n,))
+                              for key, val in res.items()}
+                       for case, res in block.items()}
+        for case, res in block.items():
+            for key, val in res.items():
+                results[case][key][..., rows] = val
+    return results
+
+
+def _calculate_block(p, hourly_inputs, profile, temperature, region, calibrate, tile_size):
+    d = engine.split_demand(p)
+    t = engine.heat_pump_tariff(p)
+    h = engine.heat_pump_demand(p, d)
+    n = len(region)
+
+    rates, offpeak, peak = hourly_rates(t)
+    rates = np.broadcast_to(rates, (n, 24))
+    peak_off = np.where(np.broadcast_to(t['is_peak_off'], (n,))[:, None], peak, 0)
+    #multi-rate homes heat their hot water in the off-peak window, others through the day
+    offpeak_hours = offpeak.sum(axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hw_schedule = np.where(offpeak_hours > 0, offpeak/offpeak_hours, 1/24)
+
+    #the hourly calculation only depends on the weather, flow temperatures and the daily
+    #pattern of hours off and hot water heating, which most households share, so it is
+    #done once per distinct pattern and households just weight it by their rates
+    keys = np.column_stack([region] + [np.broadcast_to(hourly_inputs[name], (n,)) for name in
+                                       ('hp_flow_temp_typ', 'hp_flow_temp_hi', 'hw_flow_temp')] +
+                           [np.broadcast_to(peak_off, (n, 24)), np.broadcast_to(hw_schedule, (n, 24))])
+    shapes, shape_of = np.unique(keys, axis=0, return_inverse=True)
+    elec = _shape_electricity(shapes, profile, temperature, tile_size)
+    shape_of = shape_of.reshape(-1)
+
+    def seasonal(name):
+        by_hour = elec[name][shape_of]
+        total = by_hour.sum(axis=-1)
+        return 1/total, elec[name + '_even'][shape_of], (by_hour*rates).sum(axis=-1)/total
+
+    #the heat pump runs from the same hot water cylinder in both cases
+    hw_cop, hw_cop_even, elec_unit_hw = seasonal('hw')
+
+    results = {'Current': engine.current_case(p, d)}
+    for case, scop_name, cop_name, shape_name in (
+            ('Typical HP Install', 'hp_heat_scop_typ', 'hp_hw_cop_typ', 'heat_typ'),
+            ('Hi-performance HP Install', 'hp_heat_scop_hi', 'hp_hw_cop_hi', 'heat_hi')):
+        heat_scop, heat_scop_even, elec_unit_heat = seasonal(shape_name)
+        case_hw_cop = hw_cop
+        if calibrate:
+            #scale the COP curves so the seasonal COPs before any load shifting are the rated ones
+            heat_scop = p[scop_name] * heat_scop/heat_scop_even
+            case_hw_cop = p[cop_name] * hw_cop/hw_cop_even
+        case_tariff = dict(t, elec_unit_heat=elec_unit_heat, elec_unit_hw=elec_unit_hw)
+        results[case] = engine.heat_pump_case(p, d, heat_scop, case_hw_cop, case_tariff, h)
+        results[case]['heat_scop'] = heat_scop
+        results[case]['hw_cop'] = case_hw_cop
+    return results
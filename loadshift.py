@@ -0,0 +1,225 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Cheapest heat pump schedule on a time-of-use tariff.  Instead of fixed fractions
+# of heating in each tariff window (pc_heat_second_tariff in engine.heat_pump_tariff)
+# the heat pump is scheduled hour by hour for every day of the year: the building
+# can be pre-heated into its comfort band (a thermal store of limited size which
+# slowly loses the extra heat) and the hot water cylinder reheated ahead of use (a
+# store of the cylinder's size).  Each home-day is a small dynamic programme over
+# the stored heat, solved for all home-days at once, and the cost and electricity
+# it finds give the heating and hot water unit rates and seasonal COPs of the heat
+# pump cases.  The results have the same layout as engine.calculate.
+
+import numpy as np
+
+import engine
+import hourly
+import tariffs
+
+#inputs only used by the optimiser, on top of engine.DEFAULTS and hourly.HOURLY_DEFAULTS
+LOADSHIFT_DEFAULTS = {
+    'thermal_mass': 10.0, #kWh of heat the building can be pre-heated by within its comfort band
+    'thermal_loss': 0.05, #share of the pre-heat lost each hour
+    'hp_oversize': 1.5, #heat pump output as a multiple of the coldest hour's heat demand
+    'tank_days': 1.0, #hot water cylinder capacity in days of hot water
+    'tank_loss': 0.005, #share of the stored hot water heat lost each hour
+    'tank_reheat': 3.0, #kW of heat into the cylinder
+}
+
+#levels the stored heat is divided into: more is closer to the exact optimum but slower
+LEVELS = 16
+#households scheduled at a time, each a row per day of the year: small blocks keep
+#the work arrays in cache
+BLOCK_SIZE = 16
+
+
+def schedule(unit_cost, elec_per_heat, demand, capacity, max_output, loss, levels=LEVELS):
+    """
+    unit_cost - (r, slots) cost of a kWh of heat from the heat pump in each slot
+    elec_per_heat - (r, slots) electricity per kWh of heat in each slot, 1/COP
+    demand - (r, slots) heat drawn from the store in each slot, kWh
+    capacity - (r,) most heat the store can hold above its lowest comfortable level, kWh
+    max_output - (r,) most heat the heat pump can deliver in a slot, kWh
+    loss - (r,) share of the stored heat lost each slot
+    levels - number of levels the cheapest cost is kept for, linearly interpolated
+             between them
+    returns (r,) cost and (r,) electricity of the cheapest schedule meeting the
+    demand of each row (a day), inf if there is none.  Heat carried in from the day
+    before or left for the day after is valued at the day's cheapest heat
+    """
+    r, slots = demand.shape
+    capacity, max_output, keep = [np.broadcast_to(val, (r,))[:, None] for val in (capacity, max_output, 1 - loss)]
+    step = np.maximum(capacity, 1e-6)/(levels - 1)
+    stored = step*np.arange(levels)
+    row = np.arange(r)
+    cheapest = np.argmin(unit_cost, axis=1)
+    carry_cost, carry_elec = unit_cost[row, cheapest][:, None], elec_per_heat[row, cheapest][:, None]
+    cost, elec = carry_cost*stored, carry_elec*stored
+
+    #the highest level that can be reached, above which there is no cost
+    top = np.full((r, 1), levels - 1)
+    row_start = levels*row[:, None]
+    for slot in range(slots):
+        c, e, d = unit_cost[:, slot, None], elec_per_heat[:, slot, None], demand[:, slot, None]
+        #the cheapest cost is convex in the heat stored, and so is the cost of arriving
+        #at each level less the slot's cost of the heat kept: the best previous level is
+        #the overall best one moved into the range the heat pump can reach each level
+        #from, delivering stored + d - keep*previous.  Costs between levels are linear
+        needed = stored + d
+        prev_cost = cost - c*keep*stored
+        best = np.argmin(prev_cost, axis=1)[:, None]
+        first = (needed - max_output)/(keep*step)
+        last = np.minimum(needed/(keep*step), top)
+        prev = np.clip(best, np.maximum(first, 0), last)
+        below = np.minimum(prev.astype(np.intp), np.maximum(top - 1, 0))
+        frac = prev - below
+        below += row_start
+        above = np.minimum(below + 1, row_start + top)
+        cost_below, elec_below = prev_cost.reshape(-1)[below], elec.reshape(-1)[below]
+        with np.errstate(invalid='ignore'):
+            cost = c*needed + cost_below + frac*(prev_cost.reshape(-1)[above] - cost_below)
+        #unreachable levels, including those interpolated between two unreachable ones
+        cost[(first > last + 1e-9) | np.isnan(cost)] = np.inf
+        elec = elec_below + frac*(elec.reshape(-1)[above] - elec_below) + e*(needed - keep*step*prev)
+        top = np.clip(np.floor((keep*step*top + max_output - d)/step + 1e-9), 0, levels - 1).astype(np.intp)
+
+    total = cost - carry_cost*stored
+    end = np.argmin(total, axis=1)
+    cost = total[row, end]
+    return cost, np.where(np.isinf(cost), np.inf, elec[row, end] - carry_elec[:, 0]*stored[row, end])
+
+
+def _prepare(inputs, temperature, region):
+    inputs = dict(inputs)
+    shift_inputs = {name: np.asarray(inputs.pop(name, default), dtype=float)
+                    for name, default in LOADSHIFT_DEFAULTS.items()}
+    p, hourly_inputs, n, temperature, region = hourly._prepare(inputs, temperature, region)
+    for name, val in shift_inputs.items():
+        if val.ndim and val.size != n:
+            raise ValueError(f'{name} has {val.size} values, expected {n}')
+    return p, dict(hourly_inputs, **shift_inputs), n, temperature, region
+
+
+def calculate(inputs, tariff=None, temperature=None, region=None, calibrate=True, block_size=None,
+              levels=LEVELS):
+    """
+    inputs - mapping of input name to scalar or 1d array, see engine.DEFAULTS,
+             hourly.HOURLY_DEFAULTS and LOADSHIFT_DEFAULTS
+    tariff - tariffs.Tariff the heat pump cases are on, default each household's own
+             heat pump tariff as in engine.heat_pump_tariff
+    temperature, region, calibrate - as hourly.calculate
+    block_size - number of households scheduled at a time, default BLOCK_SIZE
+    levels - as schedule
+    returns dict of case name to case result dict, as engine.calculate.  The heat
+    pump cases also have the achieved 'heat_scop' and 'hw_cop', which include the
+    heat lost from pre-heating and from the cylinder
+    """
+    p, shift_inputs, n, temperature, region = _prepare(inputs, temperature, region)
+    profile = hourly.heating_profile(temperature)
+    compiled = None if tariff is None else tariff.compile(hourly.HOURS_PER_YEAR)
+    block_size = block_size or BLOCK_SIZE
+
+    results = None
+    for start in range(0, max(n, 1), block_size):
+        rows = slice(start, start + block_size)
+        block = _calculate_block({name: val[rows] if val.ndim else val for name, val in p.items()},
+                                 {name: val[rows] if val.ndim else val for name, val in shift_inputs.items()},
+                                 profile, temperature, region[rows], compiled, calibrate, levels)
+        if results is None:
+            results = {case: {key: np.empty(val.shape[:-1] + (n,) if val.ndim > 1 else (n,))
+                              for key, val in res.items()}
+                       for case, res in block.items()}
+        for case, res in block.items():
+            for key, val in res.items():
+                results[case][key][..., rows] = val
+    return results
+
+
+def _daily(hourly_values):
+    return hourly_values.reshape(-1, 24)
+
+
+def _calculate_block(p, shift_inputs, profile, temperature, region, compiled, calibrate, levels):
+    d = engine.split_demand(p)
+    t = engine.heat_pump_tariff(p)
+    h = engine.heat_pump_demand(p, d)
+    n = len(region)
+    days = hourly.DAYS_PER_YEAR
+    if compiled is None:
+        rates = np.repeat(np.broadcast_to(hourly.hourly_rates(t)[0], (n, 24)), days, axis=0)
+    else:
+        t = engine.apply_hp_tariff(t, compiled.hp_tariff())
+        rates = np.tile(_daily(100*compiled.rates), (n, 1))
+    shift = {name: np.broadcast_to(val, (n,)) for name, val in shift_inputs.items()}
+    home_profile, home_temperature = profile[region], temperature[region]
+
+    def scheduled(shape, draw, flow_temp, capacity, max_output, loss):
+        """
+        returns (n,) cost (p) and electricity of the heat drawn over the year, and the
+        seasonal COP if the heat were delivered to the given shape as it is needed
+        """
+        hourly_cop = hourly.cop(home_temperature, flow_temp[:, None])
+        even_cop = 1/(shape/hourly_cop).sum(axis=-1)
+        elec_per_heat, draw = _daily(1/hourly_cop), _daily(draw)
+        #days without demand cost nothing
+        day = np.flatnonzero(draw.any(axis=1))
+        home = day // days
+        cost, elec = np.zeros(n*days), np.zeros(n*days)
+        cost[day], elec[day] = schedule(rates[day]*elec_per_heat[day], elec_per_heat[day], draw[day],
+                                        capacity[home], max_output[home], loss[home], levels)
+        return cost.reshape(n, days).sum(axis=1), elec.reshape(n, days).sum(axis=1), even_cop
+
+    #hot water is drawn to the same daily pattern all year
+    hw_heat = h['hw_heat_kWh']*np.ones(n)
+    hw_draw = np.maximum(hw_heat, 0)[:, None]/days*np.tile(tariffs.LOAD_SHAPES['Hot water'], days)
+    tank = shift['tank_days']*np.maximum(hw_heat, 0)/days
+    #the seasonal COP without storage is that of heating the cylinder evenly through the day, as hourly
+    hw_cost, hw_elec, hw_cop_even = scheduled(1/hourly.HOURS_PER_YEAR, hw_draw, shift['hw_flow_temp'], tank,
+                                              np.maximum(shift['tank_reheat'], hw_draw.max(axis=1)), shift['tank_loss'])
+
+    #the heat pump supplies the heat replaced, or all the heat if an electric heat
+    #source is removed; a remaining 'other' heat source keeps heating as it is today
+    hp_heat = np.where(h['is_removed_elec'], h['heat_replaced_elec_kWh'], h['heat_replaced_kWh'])*np.ones(n)
+    hp_heat = np.where(h['is_remain_other'], 0, hp_heat)
+    heat_draw = np.maximum(hp_heat, 0)[:, None]*home_profile
+    max_output = shift['hp_oversize']*heat_draw.max(axis=1)
+
+    results = {'Current': engine.current_case(p, d)}
+    for case, scop_name, cop_name, flow_name in (
+            ('Typical HP Install', 'hp_heat_scop_typ', 'hp_hw_cop_typ', 'hp_flow_temp_typ'),
+            ('Hi-performance HP Install', 'hp_heat_scop_hi', 'hp_hw_cop_hi', 'hp_flow_temp_hi')):
+        heat_cost, heat_elec, heat_scop_even = scheduled(home_profile, heat_draw, shift[flow_name],
+                                                         shift['thermal_mass'], max_output, shift['thermal_loss'])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            heat_scop = np.where(heat_elec > 0, hp_heat/heat_elec, heat_scop_even)
+            case_hw_cop = np.where(hw_elec > 0, hw_heat/hw_elec, hw_cop_even)
+            if calibrate:
+                #scale the COP curves so the seasonal COPs without any storage are the rated ones
+                heat_scop = p[scop_name] * heat_scop/heat_scop_even
+                case_hw_cop = p[cop_name] * case_hw_cop/hw_cop_even
+            elec_unit_heat = np.where(heat_elec > 0, heat_cost/heat_elec, t['elec_unit_heat'])
+            elec_unit_hw = np.where(hw_elec > 0, hw_cost/hw_elec, t['elec_unit_hw'])
+        case_tariff = dict(t, elec_unit_heat=elec_unit_heat, elec_unit_hw=elec_unit_hw)
+        results[case] = engine.heat_pump_case(p, d, heat_scop, case_hw_cop, case_tariff, h)
+        results[case]['heat_scop'] = heat_scop
+        results[case]['hw_cop'] = case_hw_cop
+    return results
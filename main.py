@@ -19,56 +19,34 @@
 # For enquiries about using this source code, please contact:
 # hello@greenheatcoop.co.uk
 
+import os
+import threading
+import time
+
 import streamlit as st
 import pandas as pd
-from helper import generate_df, make_stacked_bar_horiz
-from PIL import Image
-
-#new comment
-#__________ set default values______________
-#efficiencies and performance coefficients - default values
-boiler_heat_eff = 0.88
-boiler_hw_eff = 0.88
-immersion_hw_eff = 1
-#typical heat pump performance:
-hp_heat_scop_typ = 3.4
-hp_hw_cop_typ = 2.8
-#hi heat pump performance
-hp_heat_scop_hi = 4.0
-hp_hw_cop_hi = 2.8
-
-#Raise in temp (degC) from mains water to hot water AS USED
-hw_temp_raise_default = 25
-
-#carbon intensity values taken from SAP 10.2 (dec 2021)
-GAS_kgCO2perkWh = 0.21
-ELEC_RENEW_kgCO2perkWh = 0
-ELEC_AVE_kgCO2perkWh = 0.136
-
-# price cap October 2025 gas and electricity domestic standing and unit charges
-gas_stand = 34.03
-gas_unit = 6.29
-elec_stand = 53.68
-elec_unit = 26.35
-#cosy octopus details
-elec_unit_cosy_standard=elec_unit
-elec_unit_cosy_offpeak = 0.6*elec_unit
-elec_unit_cosy_peak = 1.6*elec_unit
-pc_other_elec_cosy_offpeak = 0.2
-pc_other_elec_cosy_peak = 0.2
-cosy_second_tariff_hours = 6
-cosy_third_tariff_hours = 3
-cosy_offpeak_heat_demand_reduction = 1 #for cosy octopus - less heat demand in the night period due to switch to hot water, compensated by possible boost in day time.
-offpeak_heat_demand_reduction = 2/3 # for economy 7 and octopus go - less heat needed in the night
-
-# efficincy measures to choose from
-efficiency_opts = [('Draft proofing and/or door insulation (3%)', 0.03),
-                    ('Increased loft insulation (5%)', 0.05),
-                    ('Improved window glazing (5%)', 0.05),
-                    ('Cavity wall insulation (10%)', 0.1),
-                    ('Underfloor insulation (10%)', 0.1),
-                    ('Internal or external solid wall insulation (15%)', 0.15),
-                    ('Enter a custom heating demand saving', -1.0)]
+from helper import encode_image
+
+#default values, carbon intensities, prices and efficiency measures are shared with the batch engine
+from engine import (boiler_heat_eff, boiler_hw_eff, hp_heat_scop_typ, hp_hw_cop_typ,
+                    hp_heat_scop_hi, hp_hw_cop_hi, hw_temp_raise_default,
+                    GAS_kgCO2perkWh, ELEC_RENEW_kgCO2perkWh, ELEC_AVE_kgCO2perkWh,
+                    gas_stand, gas_unit, elec_stand, elec_unit, elec_unit_cosy_offpeak,
+                    pc_other_elec_cosy_offpeak, pc_other_elec_cosy_peak,
+                    cosy_second_tariff_hours, cosy_third_tariff_hours, cosy_offpeak_heat_demand_reduction,
+                    efficiency_opts, CASE_NAMES)
+from configs import HeatPumpConfigs
+from pipeline import page_pipeline, prepare
+import metrics
+
+rerun_start = time.perf_counter()
+
+#results kept by each stage of the page's pipeline, shared by all sessions
+RESULT_CACHE_SIZE = 512
+
+#images are never shown wider than twice the centred page width (for high-dpi screens)
+IMAGE_MAX_WIDTH = 2*730
+
 #____________ Page info________________________________________
 
 about_markdown = 'This app has been developed by Chris Warwick, August-October 2022, for Green Heat Coop Ltd. ' + \
@@ -78,39 +56,101 @@ about_markdown = 'This app has been developed by Chris Warwick, August-October 2
 
 st.set_page_config(layout="centered", menu_items={'Get Help': None, 'Report a Bug': None, 'About': about_markdown})
 
-#__________write some reference info to the sidebar____________
+@st.cache_resource
+def get_page_pipeline():
+    return page_pipeline(RESULT_CACHE_SIZE)
+
+page = get_page_pipeline()
+
+#operators can scrape Prometheus metrics of every session from a local port by
+#setting HEATPUMP_METRICS_PORT, and profile a rerun by adding ?profile to the page address
+@st.cache_resource
+def start_metrics_server(port):
+    return metrics.start_server(port)
+
+if os.environ.get('HEATPUMP_METRICS_PORT'):
+    start_metrics_server(int(os.environ['HEATPUMP_METRICS_PORT']))
+metrics.count('requests')
+
+profiler = metrics.Profiler(thread_ids={threading.get_ident()}).start() if 'profile' in st.query_params else None
+
+def finish_rerun():
+    metrics.observe('page.rerun', time.perf_counter() - rerun_start)
+    if profiler is not None:
+        profiler.stop()
+        st.sidebar.subheader(f'Profile ({profiler.samples} samples)')
+        st.sidebar.dataframe(pd.DataFrame(profiler.top(), columns=['Function', 'Samples', 'Own samples']),
+                             hide_index=True)
+
+#__________static images and tables, built once per server process and shared by all sessions____________
+
+@st.cache_resource
+def load_image(path):
+    return encode_image(path, IMAGE_MAX_WIDTH)
+
+@st.cache_resource
+def load_reference_tables():
+    df_tot = pd.DataFrame([['1', 2100, 7000], ['2', 2750, 9500], 
+                            ['3', 3000, 12000], ['4', 3500, 15000],
+                            ['5', 4300, 17000]],
+                            columns=['House size', 'Electricity (kWh)', 'Gas (kWh)'])
+    df_tot.set_index('House size', inplace=True)                        
+
+    df_hw = pd.DataFrame([['Washing up', 15], ['5 min water-saving shower', 30], ['10 min power shower', 150], ['Bath', 100]],
+    columns=['Use', 'Hot water used (L)'])
+    df_hw.set_index('Use', inplace=True)
+
+    df_cook = pd.DataFrame([['Gas hob', 0.8], ['Gas grill', 1], ['Gas oven', 1.5]],
+    columns=['Use', 'Gas consumption per use (kWh)'])
+    df_cook.set_index('Use', inplace=True)
 
-df_tot = pd.DataFrame([['1', 2100, 7000], ['2', 2750, 9500], 
-                        ['3', 3000, 12000], ['4', 3500, 15000],
-                        ['5', 4300, 17000]],
-                        columns=['House size', 'Electricity (kWh)', 'Gas (kWh)'])
-df_tot.set_index('House size', inplace=True)                        
+    costs_table = pd.DataFrame([['Mains Gas', GAS_kgCO2perkWh], ['Electricity (grid average)', ELEC_AVE_kgCO2perkWh],
+    ['Electricity (renewable only)', ELEC_RENEW_kgCO2perkWh]], columns=['Energy Source', 'CO2 Equivalent Emissions (kgCO2/kWh)'])
+    costs_table.set_index('Energy Source', inplace=True)
+
+    pc_2_without = cosy_offpeak_heat_demand_reduction*cosy_second_tariff_hours/(24 - cosy_third_tariff_hours - (1-cosy_offpeak_heat_demand_reduction)*cosy_second_tariff_hours)
+    pc_2_with = cosy_offpeak_heat_demand_reduction*cosy_second_tariff_hours/(24 - (1-cosy_offpeak_heat_demand_reduction)*cosy_second_tariff_hours)
+    pc_3_with = cosy_third_tariff_hours/(24 - (1-cosy_offpeak_heat_demand_reduction)*cosy_second_tariff_hours)
+             
+    energysplit_table = pd.DataFrame([['Room heating (with peak-time heating)', int(100*pc_2_with), int(100*(1-pc_2_with-pc_3_with)), int(100*pc_3_with)], 
+                                      ['Room heating (without peak-time heating)', int(100*pc_2_without), int(100*(1-pc_2_without)), 0],
+                                      ['Hot water heating', 100, 0, 0],
+                                      ['Cooking', 0, 0, 100],
+                                      ['EV', 100, 0, 0], 
+                                      ['All other electricity', 100*pc_other_elec_cosy_offpeak, 100*(1-pc_other_elec_cosy_offpeak-pc_other_elec_cosy_peak), 100*pc_other_elec_cosy_peak]], 
+                                      columns=['Energy Source', 'Demand in off-peak hours - 6 hours/day (%)', 'Demand in standard day rate hours - 15 hours/day (%)', 
+                                               'Demand in peak hours - 3 hours/day (%)'])
+    energysplit_table.set_index('Energy Source', inplace=True)
 
-df_hw = pd.DataFrame([['Washing up', 15], ['5 min water-saving shower', 30], ['10 min power shower', 150], ['Bath', 100]],
-columns=['Use', 'Hot water used (L)'])
-df_hw.set_index('Use', inplace=True)
+    return {'df_tot': df_tot, 'df_hw': df_hw, 'df_cook': df_cook,
+            'costs_table': costs_table, 'energysplit_table': energysplit_table}
 
-df_cook = pd.DataFrame([['Gas hob', 0.8], ['Gas grill', 1], ['Gas oven', 1.5]],
-columns=['Use', 'Gas consumption per use (kWh)'])
-df_cook.set_index('Use', inplace=True)
+tables = load_reference_tables()
+
+#__________write some reference info to the sidebar____________
 
 st.sidebar.header('Reference information')
 st.sidebar.subheader('Typical total annual household energy consumption by number of bedrooms (with no EV)')
-st.sidebar.table(df_tot.style.format("{:,d}"))
+st.sidebar.table(tables['df_tot'].style.format("{:,d}"))
 st.sidebar.subheader('Typical amounts of water for different uses')
-st.sidebar.table(df_hw)
+st.sidebar.table(tables['df_hw'])
 st.sidebar.subheader('Typical amounts of energy used for cooking with gas appliances')
-st.sidebar.table(df_cook.style.format(precision=1))
+st.sidebar.table(tables['df_cook'].style.format(precision=1))
+
+#operators can see the memo counters of each stage by adding ?cache_stats to the page address
+if 'cache_stats' in st.query_params:
+    st.sidebar.subheader('Result cache')
+    st.sidebar.json(page.stats())
 
 #___________Main page__________________________________________
 
 st.title('Heat Pump Running Costs and Emissions Estimator')    
 
-img = Image.open('heat pump close up edit.JPG')
-st.image(img)
+st.image(load_image('heat pump close up edit.JPG'))
 
 st.write('Use this tool to compare how a heat pump could change your annual energy bills and CO$_2$ emissions.  '
-+ 'Enter some information below, and once you are ready, press the *Update Results* button at the bottom to see the comparison.  ' +
++ 'Enter some information below and the comparison at the bottom updates as you go.  '
++ 'If you turn off *Live results* at the bottom, press the *Update results* button there to see the comparison instead.  ' +
 'This tool is currently only suited to those who use a gas boiler as the main source of heat for their house.')
 st.markdown('To calculate an estimate of the cost of installing a heat pump, see the Nesta demo tool ' +
 '<a href="http://asf-hp-cost-demo-l-b-1046547218.eu-west-1.elb.amazonaws.com/">here</a>.', unsafe_allow_html=True)
@@ -338,6 +378,18 @@ with tab2:
         hp_heat_scop_hi = st.number_input('When space heating:', min_value=0.1, max_value=10.0, value=hp_heat_scop_hi, step=0.1, key='hi1')
         hp_hw_cop_hi = st.number_input('When hot water heating:', min_value=0.1, max_value=10.0, value=hp_hw_cop_hi, step=0.1, key='hi2')
 
+    st.write('*Quoted systems*')
+    st.write('Add any systems you have been quoted to compare them with the typical and high-performance installations.  '
+    + 'If you don\'t know a system\'s SCOP, give its design flow temperature and the SCOP is estimated from it.')
+    quotes = st.data_editor(pd.DataFrame({'name': pd.Series(dtype=str), 'heat_scop': pd.Series(dtype=float),
+                                          'hw_cop': pd.Series(dtype=float), 'flow_temp': pd.Series(dtype=float)},
+                                         index=pd.RangeIndex(0)),
+                            num_rows='dynamic', hide_index=True, width='stretch', key='quotes',
+                            column_config={'name': st.column_config.TextColumn('Name'),
+                                           'heat_scop': st.column_config.NumberColumn('SCOP (space heating)', min_value=0.1, max_value=10.0),
+                                           'hw_cop': st.column_config.NumberColumn('COP (hot water)', min_value=0.1, max_value=10.0),
+                                           'flow_temp': st.column_config.NumberColumn('Flow temperature (degC)', min_value=25, max_value=80)})
+
     st.subheader('3.  Hot Water Temperature')
     st.write('Typical mains cold water may be at 15$^{\circ}$C, while a comfortable shower temperature is 37-41$^{\circ}$C.  The gas boiler '
     + 'will supply hot water hotter than this, which is then mixed with cold water, but the total energy used per litre is similar to providing '
@@ -351,10 +403,7 @@ with tab3:
     st.write("We use standard values for carbon intensity of different energy sources as set in the Standard Assessment Procedure (SAP) 10.2, "
     +"released December 2021.  These values only consider the CO$_2$ equivalent emissions associated per unit of energy, not the embedded emissions of the "
     + "energy generation and transmission infrastructure.  These values are: ")
-    costs_table = pd.DataFrame([['Mains Gas', GAS_kgCO2perkWh], ['Electricity (grid average)', ELEC_AVE_kgCO2perkWh],
-    ['Electricity (renewable only)', ELEC_RENEW_kgCO2perkWh]], columns=['Energy Source', 'CO2 Equivalent Emissions (kgCO2/kWh)'])
-    costs_table.set_index('Energy Source', inplace=True)
-    st.table(costs_table)
+    st.table(tables['costs_table'])
 
     st.subheader('3.  Heat pump tariff')
     st.markdown(
@@ -364,20 +413,7 @@ with tab3:
     The following table describes our assumptions of when energy is used in the day:
     """, unsafe_allow_html=True
     )
-    pc_2_without = cosy_offpeak_heat_demand_reduction*cosy_second_tariff_hours/(24 - cosy_third_tariff_hours - (1-cosy_offpeak_heat_demand_reduction)*cosy_second_tariff_hours)
-    pc_2_with = cosy_offpeak_heat_demand_reduction*cosy_second_tariff_hours/(24 - (1-cosy_offpeak_heat_demand_reduction)*cosy_second_tariff_hours)
-    pc_3_with = cosy_third_tariff_hours/(24 - (1-cosy_offpeak_heat_demand_reduction)*cosy_second_tariff_hours)
-             
-    energysplit_table = pd.DataFrame([['Room heating (with peak-time heating)', int(100*pc_2_with), int(100*(1-pc_2_with-pc_3_with)), int(100*pc_3_with)], 
-                                      ['Room heating (without peak-time heating)', int(100*pc_2_without), int(100*(1-pc_2_without)), 0],
-                                      ['Hot water heating', 100, 0, 0],
-                                      ['Cooking', 0, 0, 100],
-                                      ['EV', 100, 0, 0], 
-                                      ['All other electricity', 100*pc_other_elec_cosy_offpeak, 100*(1-pc_other_elec_cosy_offpeak-pc_other_elec_cosy_peak), 100*pc_other_elec_cosy_peak]], 
-                                      columns=['Energy Source', 'Demand in off-peak hours - 6 hours/day (%)', 'Demand in standard day rate hours - 15 hours/day (%)', 
-                                               'Demand in peak hours - 3 hours/day (%)'])
-    energysplit_table.set_index('Energy Source', inplace=True)
-    st.table(energysplit_table.style.format(precision=0))
+    st.table(tables['energysplit_table'].style.format(precision=0))
 
     st.subheader('3.  Other approximations and considerations')
     st.markdown(
@@ -392,7 +428,9 @@ with tab3:
     """
     )
 
-is_submit1 = st.button(label='Update results')
+is_live = st.toggle('Live results', value=True, key='live',
+                    help='Update the results whenever a setting changes. Turn off to update them only when Update results is pressed.')
+is_submit1 = is_live or st.button(label='Update results')
 st.divider()
 result_container = st.container()
 
@@ -405,266 +443,64 @@ st.write('')
 st.write('')
 
 st.markdown("This tool is a project of <a href='https://www.greenheatcoop.co.uk'>Green Heat Coop Ltd</a>.", unsafe_allow_html=True)
-img = Image.open('web_banner.png')
-st.image(img)
+st.image(load_image('web_banner.png'))
 
 st.markdown("<a href='#linkto_top'>^ Back to top ^</a>", unsafe_allow_html=True)
 
 
-#don't proceed until Update results has been pressed
+#don't proceed until Update results has been pressed, unless the results are live
 if not is_submit1:
+    finish_rerun()
     st.stop()
 
 #_______________Results calculation______________________
-#prepare some variables
-
-#calculate hot water kWh/L
-GAS_HW_kWhperL = 4200 * hw_temp_raise/(3600 * 1000 * boiler_hw_eff)
-IMMERSION_HW_kWhperL = 4200 * hw_temp_raise/(3600 * 1000 * immersion_hw_eff)
-
-#_____________first do the current case____________________
+#collect the inputs - those not shown for the selected options keep the engine defaults
+inputs = {'elec_total_kWh': elec_total_kWh, 'gas_total_kWh': gas_total_kWh,
+          'is_elec_renewable': is_elec_renewable, 'is_hw_gas': is_hw_gas, 'hw_lday': hw_lday,
+          'is_cook_gas': is_cook_gas, 'elec_ev_kWh': elec_ev_kWh,
+          'is_second_heatsource': is_second_heatsource, 'is_free_summer_hw': is_free_summer_hw,
+          'efficiency_boost': efficiency_boost, 'switch_tariff_for_hp': switch_tariff_for_hp,
+          'turn_off_hp_in_peak_hours': turn_off_hp_in_peak_hours, 'is_disconnect_gas': is_disconnect_gas,
+          'n_tariff_states': n_tariff_states, 'gas_stand': gas_stand, 'gas_unit': gas_unit,
+          'elec_stand': elec_stand, 'elec_unit': elec_unit,
+          'boiler_heat_eff': boiler_heat_eff, 'boiler_hw_eff': boiler_hw_eff,
+          'hp_heat_scop_typ': hp_heat_scop_typ, 'hp_hw_cop_typ': hp_hw_cop_typ,
+          'hp_heat_scop_hi': hp_heat_scop_hi, 'hp_hw_cop_hi': hp_hw_cop_hi,
+          'hw_temp_raise': hw_temp_raise}
+if is_cook_gas:
+    inputs['gas_cook_kWhweek'] = gas_cook_kWhweek
+if is_second_heatsource:
+    inputs.update(second_heatsource_type=second_heatsource_type, second_heatsource_kWh=second_heatsource_kWh,
+                  is_second_heatsource_remains=is_second_heatsource_remains)
+if n_tariff_states >= 2:
+    inputs.update(elec_unit2=elec_unit2, second_tariff_hours=second_tariff_hours,
+                  pc_elec_second_tariff=pc_elec_second_tariff)
 if n_tariff_states == 3:
-    elec_unit_eff = (pc_elec_third_tariff*elec_unit3) + (pc_elec_second_tariff*elec_unit2) + (1 - pc_elec_second_tariff - pc_elec_third_tariff)*elec_unit
-    elec_unit_ev = elec_unit2
-if n_tariff_states == 2:
-    elec_unit_eff = (pc_elec_second_tariff*elec_unit2) + (1 - pc_elec_second_tariff)*elec_unit
-    elec_unit_ev = elec_unit2
-else:
-    elec_unit_eff = elec_unit
-    elec_unit_ev = elec_unit
-
-elec_other_kWh = max(elec_total_kWh - elec_ev_kWh, 0)
-elec_ev_kWh = elec_total_kWh - elec_other_kWh
-
-costs_by_type = [['Current', 'Gas standing', gas_stand*3.65],
-                ['Current', 'Gas unit',  gas_total_kWh * gas_unit/100],
-                ['Current', 'Elec.  standing', elec_stand*3.65],
-                ['Current', 'Elec.  unit', (elec_other_kWh * elec_unit_eff + elec_ev_kWh * elec_unit_ev)/100]] 
-            
-costs_total = (gas_stand + elec_stand)*3.65 + gas_total_kWh * gas_unit/100 + elec_other_kWh * elec_unit_eff/100 + elec_ev_kWh * elec_unit_ev/100
+    inputs.update(elec_unit3=elec_unit3, third_tariff_hours=third_tariff_hours,
+                  pc_elec_third_tariff=pc_elec_third_tariff)
+metrics.observe('page.widgets', time.perf_counter() - rerun_start)
 
-# hot water energy demand
-if is_hw_gas:
-    gas_hw_kWh = hw_lday * 365 * GAS_HW_kWhperL
-    elec_hw_kWh = 0
-else:
-    gas_hw_kWh = 0
-    elec_hw_kWh = hw_lday * 365 * IMMERSION_HW_kWhperL
 
-#cooking demand - only done if gas
-if is_cook_gas:
-    gas_cook_kWh = gas_cook_kWhweek * 52
-else:
-    gas_cook_kWh = 0
+#the typical and high-performance installations, then any quoted systems with a name and a SCOP or flow temperature
+quotes = quotes[quotes['name'].fillna('').str.strip().ne('') & ~quotes['name'].isin(CASE_NAMES) &
+                (quotes['heat_scop'].notna() | quotes['flow_temp'].notna())].drop_duplicates('name')
+configs = HeatPumpConfigs.standard(inputs) + HeatPumpConfigs.from_table(quotes)
 
-#gas heating is remainder after hot water and cooking removed
-gas_heat_kWh = gas_total_kWh - gas_hw_kWh - gas_cook_kWh
 
-#see if there's any electric heating in addition:
-if is_second_heatsource:
-    if second_heatsource_type=='electric':
-        elec_heat_kWh = second_heatsource_kWh
-    else:
-        elec_heat_kWh = 0    
-    # elif second_heatsource_type=='other':
-    #     other_total_kWh = second_heatsource_kWh
-else:
-    elec_heat_kWh = 0
-
-#electric other is remainder after heating and hw removed
-elec_other_kWh = elec_other_kWh-elec_heat_kWh-elec_hw_kWh
-
-#if other electricity is now negative, assume user has overestimated either 
-# their electric hw usage or electric heating - whichever the greater.
-#reduce to bring other electricity to zero.
-if elec_other_kWh < 0:
-    if elec_hw_kWh > elec_heat_kWh:
-        elec_hw_kWh += elec_other_kWh
-    else: 
-        elec_heat_kWh += elec_other_kWh
-
-    elec_other_kWh = 0
-
-#select carbon intensity of electricity
-if is_elec_renewable:
-    elec_kgCO2perkWh = ELEC_RENEW_kgCO2perkWh
-else:
-    elec_kgCO2perkWh = ELEC_AVE_kgCO2perkWh
-
-#current energy usage table
-energy_usage = [['Current', 'Heating', gas_heat_kWh+elec_heat_kWh, gas_heat_kWh*GAS_kgCO2perkWh+elec_heat_kWh*elec_kgCO2perkWh],
-            ['Current', 'Hot water', gas_hw_kWh+elec_hw_kWh, gas_hw_kWh*GAS_kgCO2perkWh + elec_hw_kWh*elec_kgCO2perkWh],
-            ['Current', 'Cooking', gas_cook_kWh, gas_cook_kWh*GAS_kgCO2perkWh],
-            ['Current', 'EV', elec_ev_kWh, elec_ev_kWh*elec_kgCO2perkWh],
-            ['Current', 'Other Elec.', elec_other_kWh, elec_other_kWh*elec_kgCO2perkWh]]                
-
-energy_total = gas_total_kWh + elec_total_kWh
-emissions_total = sum([gas_heat_kWh*GAS_kgCO2perkWh, gas_hw_kWh*GAS_kgCO2perkWh, gas_cook_kWh*GAS_kgCO2perkWh, elec_total_kWh*elec_kgCO2perkWh])
-
-#___________now do the future/heat pump case_____________
-
-
-def do_heat_pump_case(install_type, gas_heat_kWh, elec_heat_kWh, gas_hw_kWh, elec_hw_kWh, gas_cook_kWh):
-    """
-    install type either 'Typical' or 'Hi-performance'
-    """
+#only the stages downstream of whatever changed since an earlier run (of any session) are recomputed
+with metrics.span('page.results'):
+    page_results = page.run(prepare(inputs, configs))
+if page.recomputed:
+    metrics.count('homes')
+charts = {name: page_results[name + '_chart'] for name in ('costs', 'emissions', 'energy')}
 
-    #set heat pump performance coefficients to hi or typical:
-    if install_type == 'Hi-performance':
-        hp_heat_scop = hp_heat_scop_hi
-        hp_hw_cop = hp_hw_cop_hi
-    else:
-        hp_heat_scop = hp_heat_scop_typ
-        hp_hw_cop = hp_hw_cop_typ
-
-    #calculate future heating energy - dependent upon second heat source (if any)
-    if not is_second_heatsource:
-        elec_heat_kWh = (1 - efficiency_boost) * gas_heat_kWh * boiler_heat_eff/hp_heat_scop
-        gas_heat_kWh = 0
-    else:
-        if is_second_heatsource_remains:
-            if second_heatsource_type=='gas':
-                elec_heat_kWh = (1 - efficiency_boost) * (gas_heat_kWh - second_heatsource_kWh) * boiler_heat_eff/hp_heat_scop
-                gas_heat_kWh = second_heatsource_kWh
-            elif second_heatsource_type=='electric':
-                elec_heat_kWh = second_heatsource_kWh + (1 - efficiency_boost) * gas_heat_kWh * boiler_heat_eff/hp_heat_scop
-                gas_heat_kWh = 0
-        else:
-            if second_heatsource_type=='electric':
-                elec_heat_kWh = (1 - efficiency_boost) * (gas_heat_kWh * boiler_heat_eff + second_heatsource_kWh)/hp_heat_scop
-                gas_heat_kWh = 0
-            elif second_heatsource_type=='gas': #same as the no second heatsource case, as we assume same efficiency as boiler
-                elec_heat_kWh = (1 - efficiency_boost) * gas_heat_kWh * boiler_heat_eff/hp_heat_scop
-                gas_heat_kWh = 0
-            else:#other second heatsource, assume gas boiler efficiency, but not included in gas_heat_kWh
-                elec_heat_kWh = (1 - efficiency_boost) * (gas_heat_kWh + second_heatsource_kWh) * boiler_heat_eff/hp_heat_scop
-                gas_heat_kWh = 0
-
-    #hot water
-    if is_hw_gas:
-        elec_hw_kWh = gas_hw_kWh * boiler_heat_eff/hp_hw_cop
-    else:
-        elec_hw_kWh = elec_hw_kWh * immersion_hw_eff/hp_hw_cop
-
-    #gas cooking energy
-    if is_cook_gas:
-        if is_disconnect_gas:
-            emissions_cook = gas_cook_kWh * elec_kgCO2perkWh
-            elec_cook_kWh = gas_cook_kWh
-            gas_cook_kWh = 0   
-        else:
-            emissions_cook = gas_cook_kWh * GAS_kgCO2perkWh
-            elec_cook_kWh = 0
-    else:
-        emissions_cook = 0   
-        gas_cook_kWh = 0 #redundant, for clarity
-        elec_cook_kWh = 0 
-
-    #totals
-    elec_total_kWh = elec_other_kWh + elec_heat_kWh + elec_hw_kWh + elec_cook_kWh + elec_ev_kWh
-    gas_total_kWh = gas_heat_kWh + gas_cook_kWh
-
-    #new energy consumption and emissions table
-    case_name = install_type + ' HP Install'
-    energy_usage = [[case_name, 'Heating', gas_heat_kWh+elec_heat_kWh, gas_heat_kWh*GAS_kgCO2perkWh+elec_heat_kWh*elec_kgCO2perkWh],
-                [case_name, 'Hot water', elec_hw_kWh, elec_hw_kWh*elec_kgCO2perkWh],
-                [case_name, 'Cooking', gas_cook_kWh+elec_cook_kWh, emissions_cook],
-                [case_name, 'EV', elec_ev_kWh, elec_ev_kWh*elec_kgCO2perkWh],
-                [case_name, 'Other Elec.', elec_other_kWh, elec_other_kWh*elec_kgCO2perkWh]]   
-
-    energy_total = elec_heat_kWh + elec_hw_kWh + elec_cook_kWh + elec_ev_kWh + elec_other_kWh + gas_heat_kWh + gas_cook_kWh
-    emissions_total = sum([elec_heat_kWh*elec_kgCO2perkWh, gas_heat_kWh*GAS_kgCO2perkWh, elec_hw_kWh*elec_kgCO2perkWh, emissions_cook, elec_ev_kWh*elec_kgCO2perkWh, elec_other_kWh*elec_kgCO2perkWh])
-
-    #update costs
-
-    #don't include gas standing charge if disconnecting from gas
-    if is_disconnect_gas:
-        gas_stand_total = 0
-    else:
-        gas_stand_total = gas_stand*3.65
-
-    if n_tariff_states == 2:
-        #this pc of heating in second tariff 
-        pc_heat_second_tariff = offpeak_heat_demand_reduction*second_tariff_hours/(24 - (1-offpeak_heat_demand_reduction)*second_tariff_hours)
-        #all of hot water in second tariff (or free in summer solar)
-        #none of cooking in second tariff
-        #same pc of other elec in second tariff as original scenario
-
-        if is_free_summer_hw: #those with solar panels can get free hot water for 4 months
-            elec_unit_total_cost = elec_heat_kWh * (pc_heat_second_tariff*elec_unit2 + (1-pc_heat_second_tariff)*elec_unit) + \
-                elec_hw_kWh*(2/3)*elec_unit2 + elec_cook_kWh*elec_unit + elec_ev_kWh*elec_unit_ev + elec_other_kWh*elec_unit_eff
-        else:
-            elec_unit_total_cost = elec_heat_kWh * (pc_heat_second_tariff*elec_unit2 + (1-pc_heat_second_tariff)*elec_unit) + \
-                elec_hw_kWh*elec_unit2 + elec_cook_kWh*elec_unit + elec_ev_kWh*elec_unit_ev + elec_other_kWh*elec_unit_eff
-        elec_unit_total_cost /= 100
-
-    elif n_tariff_states == 3:
-        #this pc of heating in second tariff 
-        if turn_off_hp_in_peak_hours:
-            pc_heat_second_tariff = offpeak_heat_demand_reduction*second_tariff_hours/(24 - third_tariff_hours - (1-offpeak_heat_demand_reduction)*second_tariff_hours)
-            pc_heat_third_tariff = 0
-        else:
-            pc_heat_second_tariff = offpeak_heat_demand_reduction*second_tariff_hours/(24 - (1-offpeak_heat_demand_reduction)*second_tariff_hours)
-            pc_heat_third_tariff = third_tariff_hours/(24 - (1-offpeak_heat_demand_reduction)*second_tariff_hours)
-
-        #all of hot water in second tariff (or free in summer solar)
-        #all of cooking in third tariff
-        #same pc of other elec in second tariff as original scenario
-
-        if is_free_summer_hw: #those with solar panels can get free hot water for 4 months
-            elec_unit_total_cost = elec_heat_kWh * (pc_heat_second_tariff*elec_unit2 + pc_heat_third_tariff*elec_unit3 + (1-pc_heat_second_tariff-pc_heat_third_tariff)*elec_unit) + \
-                elec_hw_kWh*(2/3)*elec_unit2 + elec_cook_kWh*elec_unit3 + elec_ev_kWh*elec_unit_ev + elec_other_kWh*elec_unit_eff
-        else:
-            elec_unit_total_cost = elec_heat_kWh * (pc_heat_second_tariff*elec_unit2 + pc_heat_third_tariff*elec_unit3 + (1-pc_heat_second_tariff-pc_heat_third_tariff)*elec_unit) + \
-                elec_hw_kWh*elec_unit2 + elec_cook_kWh*elec_unit3 + elec_ev_kWh*elec_unit_ev + elec_other_kWh*elec_unit_eff
-        elec_unit_total_cost /= 100
-
-    else:
-        if is_free_summer_hw: #those with solar panels can get free hot water for 4 months
-            elec_unit_total_cost = (elec_total_kWh - elec_hw_kWh/3)*elec_unit/100
-        else:
-            elec_unit_total_cost = elec_total_kWh*elec_unit/100
-
-
-    costs_by_type = [[case_name, 'Gas standing', gas_stand_total],
-                    [case_name, 'Gas unit',  gas_total_kWh*gas_unit/100],
-                    [case_name, 'Elec.  standing', elec_stand*3.65],
-                    [case_name, 'Elec.  unit', elec_unit_total_cost]] 
-    
-    costs_total = sum([gas_stand_total, gas_total_kWh*gas_unit/100, elec_stand*3.65, elec_unit_total_cost])
-
-    return energy_usage, costs_by_type, energy_total, emissions_total, costs_total
-
-if switch_tariff_for_hp:
-    n_tariff_states = 3
-    elec_unit = elec_unit_cosy_standard
-    elec_unit2 = elec_unit_cosy_offpeak
-    elec_unit3 = elec_unit_cosy_peak
-    pc_elec_second_tariff = pc_other_elec_cosy_offpeak
-    pc_elec_third_tariff = pc_other_elec_cosy_peak
-    second_tariff_hours = cosy_second_tariff_hours
-    third_tariff_hours = cosy_third_tariff_hours
-    elec_unit_eff = (pc_elec_third_tariff*elec_unit3) + (pc_elec_second_tariff*elec_unit2) + (1 - pc_elec_second_tariff - pc_elec_third_tariff)*elec_unit
-    elec_unit_ev = elec_unit2
-    offpeak_heat_demand_reduction = cosy_offpeak_heat_demand_reduction
-
-energy_usage_typ, costs_by_type_typ, energy_total_typ, emissions_total_typ, costs_total_typ = \
-do_heat_pump_case('Typical', gas_heat_kWh, elec_heat_kWh, gas_hw_kWh, elec_hw_kWh, gas_cook_kWh)
-
-energy_usage_hi, costs_by_type_hi, energy_total_hi, emissions_total_hi, costs_total_hi = \
-do_heat_pump_case('Hi-performance', gas_heat_kWh, elec_heat_kWh, gas_hw_kWh, elec_hw_kWh, gas_cook_kWh)
-
-#if no EV, just delete EV data entries (index 3):
-if elec_ev_kWh == 0:
-    energy_usage.pop(3)
-    energy_usage_hi.pop(3)
-    energy_usage_typ.pop(3)
-
-#if no gas heating, just delete cooking data entries (index 2):
-if not is_cook_gas:
-    energy_usage.pop(2)
-    energy_usage_hi.pop(2)
-    energy_usage_typ.pop(2)
+totals = page_results['totals']
+energy_total, emissions_total, costs_total = \
+    [totals['Current'][key] for key in ('energy_total', 'emissions_total', 'costs_total')]
+energy_total_typ, emissions_total_typ, costs_total_typ = \
+    [totals['Typical HP Install'][key] for key in ('energy_total', 'emissions_total', 'costs_total')]
+energy_total_hi, emissions_total_hi, costs_total_hi = \
+    [totals['Hi-performance HP Install'][key] for key in ('energy_total', 'emissions_total', 'costs_total')]
 
 #_______________Present results_________________________
 
@@ -687,10 +523,6 @@ with result_container:
             """
             )
 
-    #calculate key values to show...
-    df_costs = generate_df(costs_by_type, [costs_by_type_typ, costs_by_type_hi], ['Costs (£)'])
-    df_energy = generate_df(energy_usage, [energy_usage_typ, energy_usage_hi], ['Energy (kWh)', 'Emissions (kg of CO2)'])
-
     #present costs, energy consumed and emissions side-by-side
     change_str2 = lambda v : '+' if v > 0 else '-'
 
@@ -714,8 +546,7 @@ with result_container:
         st.metric('Hi-performance HP Install', f"£{costs_total_hi:,.0f}", 
         delta=f"{change_str2(dcost)} £{abs(costs_total - costs_total_hi):,.0f} ({change_str2(dcost)} {abs(dcost):.0f}%)", delta_color='inverse')
 
-    bars = make_stacked_bar_horiz(df_costs, 'Costs (£)', 1)
-    st.altair_chart(bars, use_container_width=True)
+    st.vega_lite_chart(charts['costs'], width='stretch')
 
     st.subheader('2. Annual Emissions')
     c1, c2, c3 = st.columns(3)
@@ -730,8 +561,7 @@ with result_container:
         st.metric('Hi-performance HP Install', f"{emissions_total_hi:,.0f} kg CO2", 
         delta=f"{change_str2(dcost)} {abs(emissions_total_hi - emissions_total):,.0f} kg CO2 ({change_str2(dcost)} {abs(dcost):.0f}%)", delta_color='inverse')
 
-    bars = make_stacked_bar_horiz(df_energy, 'Emissions (kg of CO2)')
-    st.altair_chart(bars, use_container_width=True)
+    st.vega_lite_chart(charts['emissions'], width='stretch')
 
     st.subheader('3. Annual Energy Usage')
     c1, c2, c3 = st.columns(3)
@@ -746,7 +576,21 @@ with result_container:
         st.metric('Hi-performance HP Install', f"{energy_total_hi:,.0f} kWh", 
         delta=f"{change_str2(dcost)} {abs(energy_total_hi - energy_total):,.0f} kWh ({change_str2(dcost)} {abs(dcost):.0f}%)", delta_color='inverse')
 
-    bars = make_stacked_bar_horiz(df_energy, 'Energy (kWh)')
-    st.altair_chart(bars, use_container_width=True)
+    st.vega_lite_chart(charts['energy'], width='stretch')
+
+    if len(configs) > 2:
+        st.subheader('4. Quoted systems')
+        current_totals = totals['Current']
+        st.dataframe(pd.DataFrame(
+            {'SCOP': configs.heat_scop, 'Hot water COP': configs.hw_cop,
+             'Annual cost (£)': [totals[name]['costs_total'] for name in configs.names],
+             'Saving (£)': [current_totals['costs_total'] - totals[name]['costs_total'] for name in configs.names],
+             'Emissions (kg CO2)': [totals[name]['emissions_total'] for name in configs.names],
+             'Energy (kWh)': [totals[name]['energy_total'] for name in configs.names]},
+            index=pd.Index(configs.names, name='System')).style.format(precision=1, subset=['SCOP', 'Hot water COP'])
+            .format(precision=0, thousands=',', subset=['Annual cost (£)', 'Saving (£)', 'Emissions (kg CO2)', 'Energy (kWh)']),
+            width='stretch')
 
     st.write('If you found this tool helpful - please share!')
+
+finish_rerun()
@@ -0,0 +1,279 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Optional timing spans, counters and a sampling profiler, standard library only.
+#
+#   with metrics.span('engine.current_case'):
+#       ...
+#   metrics.count('homes', n)
+#
+# Nothing is recorded until enable() is called (or HEATPUMP_METRICS=1 is set):
+# while disabled span() returns a shared do-nothing context manager and count()
+# returns straight away, so the hot paths can stay instrumented.  Each stage has
+# a histogram of its durations; prometheus_text() renders them and the counters
+# in the Prometheus text format, and start_server() serves that at /metrics
+# from a background thread.
+#
+# Profiler samples the stacks of running threads every few milliseconds, giving
+# the functions time is spent in without tracing every call, so it can be
+# switched on for a single request.
+
+import bisect
+import collections
+import contextlib
+import os
+import sys
+import threading
+import time
+
+PREFIX = 'heatpump'
+#upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+           10.0, 30.0, 60.0)
+COUNTERS = {'requests': 'Page reruns, API requests and batch chunks handled',
+            'cache_hits': 'Result cache lookups that found an entry',
+            'cache_misses': 'Result cache lookups that found nothing',
+            'homes': 'Households calculated'}
+PROFILE_INTERVAL = 0.002
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_enabled = os.environ.get('HEATPUMP_METRICS', '') not in ('', '0')
+_lock = threading.Lock()
+_histograms = {}
+_counters = collections.Counter()
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def enable(on=True):
+    """
+    on - whether spans and counters are recorded from now on
+    """
+    global _enabled
+    _enabled = bool(on)
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """
+    forgets everything recorded so far
+    """
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+class Histogram:
+    """
+    Count of observations at or below each of BUCKETS, with their number and sum
+    """
+
+    def __init__(self):
+        self.buckets = [0]*(len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+def observe(stage, seconds):
+    """
+    stage - name of what was timed, e.g. 'engine.current_case'
+    seconds - how long it took
+    """
+    if not _enabled:
+        return
+    with _lock:
+        hist = _histograms.get(stage)
+        if hist is None:
+            hist = _histograms[stage] = Histogram()
+        hist.observe(seconds)
+
+
+def count(name, n=1):
+    """
+    name - counter, see COUNTERS
+    n - amount to add
+    """
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] += n
+
+
+class _Span:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.start)
+
+
+def span(stage):
+    """
+    stage - name of what is timed
+    returns context manager recording how long its body takes in the stage's histogram
+    """
+    return _Span(stage) if _enabled else _NULL_SPAN
+
+
+def snapshot():
+    """
+    returns dict of 'stages' (stage: count, sum and mean seconds) and 'counters'
+    """
+    with _lock:
+        stages = {stage: {'count': hist.count, 'sum': hist.sum, 'mean': hist.sum/hist.count}
+                  for stage, hist in sorted(_histograms.items())}
+        return {'stages': stages, 'counters': dict(sorted(_counters.items()))}
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text():
+    """
+    returns the stage histograms and counters in the Prometheus text exposition format
+    """
+    with _lock:
+        lines = [f'# HELP {PREFIX}_stage_seconds Time spent in each stage of the calculation',
+                 f'# TYPE {PREFIX}_stage_seconds histogram']
+        for stage, hist in sorted(_histograms.items()):
+            stage = _label(stage)
+            total = 0
+            for bound, n in zip(BUCKETS + (float('inf'),), hist.buckets):
+                total += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {total}')
+            lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {hist.sum!r}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {hist.count}')
+        for name in sorted(set(COUNTERS) | set(_counters)):
+            lines += [f'# HELP {PREFIX}_{name}_total {COUNTERS.get(name, name)}',
+                      f'# TYPE {PREFIX}_{name}_total counter',
+                      f'{PREFIX}_{name}_total {_counters[name]}']
+    return '\n'.join(lines) + '\n'
+
+
+def start_server(port, host='127.0.0.1'):
+    """
+    port, host - where to serve /metrics
+    returns the server, running on a daemon thread; recording is enabled too
+    """
+    #imported here, so importing this module (and the engine) stays cheap
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    enable()
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
+
+
+class Profiler:
+    """
+    Sampling profiler: while running, a background thread records the stack of
+    every other thread (or of thread_ids only) each interval seconds
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL, thread_ids=None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.samples = 0
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name='profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """
+        returns the stacks sampled in the collapsed format of flame graph tools, one
+        'outer;...;inner count' line per distinct stack
+        """
+        return ''.join(f'{stack} {n}\n' for stack, n in self.stacks.most_common())
+
+    def top(self, n=20):
+        """
+        returns list of (function, samples in it or what it calls, samples in it alone),
+        the n functions with most samples in them first
+        """
+        total, own = collections.Counter(), collections.Counter()
+        for stack, samples in self.stacks.items():
+            frames = stack.split(';')
+            for func in set(frames):
+                total[func] += samples
+            own[frames[-1]] += samples
+        return [(func, samples, own[func]) for func, samples in total.most_common(n)]
@@ -0,0 +1,133 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Portfolio view of a run of the result store (resultstore.py), a page of the app
+# run by `streamlit run main.py`.  The store is HEATPUMP_STORE (default 'store').
+#
+# Each run is aggregated once per server process into tiles (portfolio.py), so a
+# filter change only adds up tiles and draws charts of at most portfolio.BINS rows,
+# whatever the number of homes.
+
+import os
+import time
+
+import pandas as pd
+import streamlit as st
+
+import metrics
+import portfolio
+import resultstore
+
+rerun_start = time.perf_counter()
+
+STORE = os.environ.get('HEATPUMP_STORE', 'store')
+#runs kept aggregated in memory
+TILES_CACHE_SIZE = 8
+DIMENSION_LABELS = {'n_tariff_states': 'Tariff rates', 'is_cook_gas': 'Cooks with gas',
+                    'is_hw_gas': 'Gas hot water', 'is_second_heatsource': 'Second heat source',
+                    'switch_tariff_for_hp': 'Switches tariff for the heat pump'}
+
+
+def label(name):
+    return 'Nothing' if name is None else DIMENSION_LABELS.get(name, name.replace('_', ' ').capitalize())
+
+
+def value_label(value):
+    return ('Yes' if value else 'No') if isinstance(value, bool) else str(value)
+
+
+st.set_page_config(layout='wide', page_title='Portfolio')
+metrics.count('requests')
+
+@st.cache_resource
+def get_store(root):
+    return resultstore.ResultStore(root)
+
+@st.cache_resource(max_entries=TILES_CACHE_SIZE)
+def get_tiles(root, run_id):
+    return portfolio.load_tiles(get_store(root), run_id)
+
+st.title('Portfolio')
+root = st.sidebar.text_input('Result store', STORE)
+runs = get_store(root).runs() if os.path.isdir(root) else []
+if not runs:
+    st.info(f'No runs in {root!r} yet. Calculate a file of homes into it with\n\n'
+            f'`python resultstore.py write {root} homes.parquet --partition region`')
+    st.stop()
+
+run = st.sidebar.selectbox('Run', runs[::-1], format_func=lambda run: f'{run["run"]} ({run["homes"]:,} homes)')
+with st.spinner('Aggregating the run...'):
+    tiles = get_tiles(root, run['run'])
+
+case = st.sidebar.selectbox('Heat pump case', tiles.cases)
+metric = st.sidebar.radio('Show', list(portfolio.METRICS), format_func=portfolio.METRICS.get)
+st.sidebar.subheader('Homes')
+filters = {}
+for name in tiles.dimensions:
+    values = tiles.values[name].tolist()
+    chosen = st.sidebar.multiselect(label(name), values, default=values, format_func=value_label)
+    if len(chosen) < len(values):
+        filters[name] = chosen
+by = st.sidebar.selectbox('Group by', [None] + tiles.dimensions, format_func=label)
+
+with metrics.span('portfolio.select'):
+    view = tiles.select(metric, case, filters, by)
+summary = view['summary']
+if not summary['homes']:
+    st.warning('No homes match these filters.')
+    st.stop()
+
+title = portfolio.METRICS[metric]
+unit = title[title.index('(') + 1:title.index('/')]
+cols = st.columns(5)
+cols[0].metric('Homes', f'{summary["homes"]:,}')
+cols[1].metric(f'Mean ({unit})', f'{summary["mean"]:,.0f}')
+cols[2].metric(f'Median ({unit})', f'{summary["quantiles"][0.5]:,.0f}')
+cols[3].metric(f'10% to 90% ({unit})', f'{summary["quantiles"][0.1]:,.0f} to {summary["quantiles"][0.9]:,.0f}')
+cols[4].metric('Above zero', f'{summary["share_above_zero"]:.0%}')
+if summary['not_finite']:
+    st.caption(f'{summary["not_finite"]:,} homes with no finite result are left out.')
+
+with metrics.span('portfolio.charts'):
+    import altair as alt
+
+    hist = pd.DataFrame(view['histogram'])
+    st.subheader(f'{title}, {case}')
+    st.altair_chart(alt.Chart(hist).mark_bar().encode(
+        x=alt.X('start:Q', bin='binned', title=title), x2='end:Q', y=alt.Y('homes:Q', title='Homes'),
+        tooltip=[alt.Tooltip('start:Q', format=',.0f'), alt.Tooltip('end:Q', format=',.0f'), 'homes:Q']
+    ).properties(height=350), width='stretch')
+
+    if by is not None:
+        groups = view['groups']
+        df = pd.DataFrame({label(by): [value_label(v) for v in groups['value'].tolist()], 'Homes': groups['homes'],
+                           'Mean': groups['mean'], '10%': groups['quantiles'][:, 0],
+                           'Median': groups['quantiles'][:, 1], '90%': groups['quantiles'][:, 2]})
+        df = df[df['Homes'] > 0]
+        y = alt.Y(f'{label(by)}:N', sort=None, title=label(by))
+        base = alt.Chart(df)
+        st.subheader(f'By {label(by).lower()}: median, 10% to 90%')
+        st.altair_chart((base.mark_rule().encode(x=alt.X('10%:Q', title=title), x2='90%:Q', y=y) +
+                         base.mark_point(filled=True, size=80).encode(
+                             x='Median:Q', y=y, tooltip=list(df.columns))
+                         ).properties(height=max(150, 30*len(df))), width='stretch')
+
+metrics.observe('portfolio.rerun', time.perf_counter() - rerun_start)
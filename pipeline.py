@@ -0,0 +1,204 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# The page's calculation as a small graph of memoized stages.
+#
+#   page = pipeline.page_pipeline()
+#   out = page.run(inputs, configs)       # out['charts'], out['totals']
+#   page.recomputed                      # stages that ran, e.g. ['current_costs', 'costs_table', ...]
+#
+# Each Stage is a function of the inputs it reads and the results of the stages it
+# depends on.  The inputs a stage reads are recorded as it runs (the engine only
+# indexes its inputs, it doesn't branch on them), and its result is memoized on
+# their values and the keys of its dependencies' results.  So a widget change
+# re-runs only the stages downstream of it: changing elec_stand re-runs the cost
+# stages, the costs table and chart and the totals, leaving energy, emissions and
+# their charts as they were.  The memos are shared by every session of the page.
+
+import threading
+
+import numpy as np
+
+import engine
+import helper
+from cache import LRUCache
+from configs import costs_table, energy_table
+
+#results kept per stage
+MEMO_SIZE = 64
+ENERGY_KEYS = ('energy_total', 'emissions_total')
+
+
+class _Recorder(dict):
+    """
+    Inputs mapping that records the names read from it
+    """
+
+    def __init__(self, inputs):
+        super().__init__(inputs)
+        self.read = set()
+
+    def __getitem__(self, name):
+        self.read.add(name)
+        return super().__getitem__(name)
+
+
+def _value_key(val):
+    val = np.asarray(val)
+    if val.dtype == object:
+        return (tuple(map(str, val.reshape(-1))), val.shape)
+    return (val.dtype.str, val.shape, val.tobytes())
+
+
+class Stage:
+    """
+    name - what the stage computes
+    func - function of the inputs and then the results of after, in order
+    after - names of the stages it depends on
+    """
+
+    def __init__(self, name, func, after=()):
+        self.name = name
+        self.func = func
+        self.after = list(after)
+        #inputs read by any run so far
+        self.reads = frozenset()
+
+
+class Pipeline:
+    """
+    Stages run in dependency order, each memoized on the inputs it reads and the
+    keys of the stages it depends on; safe to share between threads
+    """
+
+    def __init__(self, stages, memo_size=MEMO_SIZE):
+        self.stages = list(stages)
+        names = [stage.name for stage in self.stages]
+        for i, stage in enumerate(self.stages):
+            if any(dep not in names[:i] for dep in stage.after):
+                raise ValueError(f'stage {stage.name!r} must come after {", ".join(stage.after)}')
+        self._memos = {stage.name: LRUCache(memo_size) for stage in self.stages}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def recomputed(self):
+        """
+        list of the stages that ran (rather than came from their memo) in this thread's last run
+        """
+        return getattr(self._local, 'recomputed', [])
+
+    def run(self, p):
+        """
+        p - mapping of inputs (e.g. prepared engine inputs)
+        returns dict of stage name to result
+        """
+        results, keys, recomputed = {}, {}, []
+        for stage in self.stages:
+            deps = tuple(keys[dep] for dep in stage.after)
+            key = self._key(stage, p, deps)
+            memo = self._memos[stage.name]
+            entry = memo.get(key)
+            if entry is None:
+                recorder = _Recorder(p)
+                result = stage.func(recorder, *(results[dep] for dep in stage.after))
+                recomputed.append(stage.name)
+                with self._lock:
+                    stage.reads = stage.reads | recorder.read
+                #the first run of a stage only learns what it reads as it goes
+                key = self._key(stage, p, deps)
+                entry = (key, result)
+                memo.put(key, entry)
+            keys[stage.name], results[stage.name] = entry
+        self._local.recomputed = recomputed
+        return results
+
+    def stats(self):
+        """
+        returns dict of stage name to the counters of its memo (see cache.LRUCache.stats)
+        """
+        return {name: memo.stats() for name, memo in self._memos.items()}
+
+    @staticmethod
+    def _key(stage, p, deps):
+        return (stage.name, tuple((name, _value_key(p[name])) for name in sorted(stage.reads)), deps)
+
+
+def prepare(inputs, configs):
+    """
+    inputs - engine inputs of one household
+    configs - configs.HeatPumpConfigs of the heat pump cases
+    returns dict of the prepared engine inputs with the configurations' 'case_names',
+    'heat_scop' and 'hw_cop' (as (configs, 1) columns)
+    """
+    p = engine.prepare_inputs(inputs)
+    p.update(case_names=np.array(configs.case_names(), dtype=object), heat_scop=configs.heat_scop[:, None],
+             hw_cop=configs.hw_cop[:, None])
+    return p
+
+
+def _configs_energy(p, d, h):
+    energy = engine.heat_pump_energy(p, d, p['heat_scop'], p['hw_cop'], h)
+    energy['gas_total_kWh'] = np.broadcast_to(energy['gas_total_kWh'], energy['elec_total_kWh'].shape)
+    return energy
+
+
+def _energy_table(p, current, configs_energy):
+    #leave EV out if there is none, and cooking if not cooking with gas
+    shown = [True, True, bool(p['is_cook_gas']), current['energy'][3, 0] != 0, True]
+    breakdowns = [lab for lab, show in zip(engine.ENERGY_BREAKDOWNS, shown) if show]
+    return energy_table(current, configs_energy, list(p['case_names']), energy_breakdowns=breakdowns)
+
+
+def _totals(p, current_energy, current_costs, configs_energy, configs_costs):
+    names = list(p['case_names'])
+    totals = {names[0]: {key: float(np.ravel(current_energy[key])[0]) for key in ENERGY_KEYS}}
+    totals[names[0]]['costs_total'] = float(np.ravel(current_costs['costs_total'])[0])
+    for c, name in enumerate(names[1:]):
+        totals[name] = {key: float(configs_energy[key][c, 0]) for key in ENERGY_KEYS}
+        totals[name]['costs_total'] = float(configs_costs['costs_total'][c, 0])
+    return totals
+
+
+def page_pipeline(memo_size=MEMO_SIZE):
+    """
+    returns Pipeline of the page's results, from the energy split to the charts
+    """
+    return Pipeline([
+        #hot water and cooking split off the gas, heating the remainder
+        Stage('demand', engine.split_demand),
+        Stage('heat_pump_demand', engine.heat_pump_demand, ['demand']),
+        Stage('current_energy', engine.current_energy, ['demand']),
+        Stage('configs_energy', _configs_energy, ['demand', 'heat_pump_demand']),
+        Stage('heat_pump_tariff', engine.heat_pump_tariff),
+        Stage('current_costs', engine.current_costs, ['current_energy']),
+        Stage('configs_costs', engine.heat_pump_costs, ['configs_energy', 'heat_pump_tariff']),
+        Stage('costs_table', lambda p, current, configs_costs: costs_table(current, configs_costs,
+                                                                            list(p['case_names'])),
+              ['current_costs', 'configs_costs']),
+        Stage('energy_table', _energy_table, ['current_energy', 'configs_energy']),
+        Stage('costs_chart', lambda p, table: helper.stacked_bar_horiz_spec(table, 'Costs (£)', 1), ['costs_table']),
+        Stage('emissions_chart', lambda p, table: helper.stacked_bar_horiz_spec(table, 'Emissions (kg of CO2)'),
+              ['energy_table']),
+        Stage('energy_chart', lambda p, table: helper.stacked_bar_horiz_spec(table, 'Energy (kWh)'),
+              ['energy_table']),
+        Stage('totals', _totals, ['current_energy', 'current_costs', 'configs_energy', 'configs_costs']),
+    ], memo_size)
@@ -0,0 +1,271 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Distributions over the homes of a stored run, aggregated server-side for the
+# portfolio page.
+#
+#   tiles = portfolio.load_tiles(resultstore.ResultStore('store/'), '2024-10-cap')
+#   view = tiles.select('saving', 'Typical HP Install', {'n_tariff_states': [3], 'is_cook_gas': [True]}, by='region')
+#   view['summary'], view['histogram'], view['groups']
+#
+# A run of millions of homes can't be charted row by row, so the run is scanned
+# once into tiles: a histogram of each metric of each heat pump case for every
+# combination of the values of DIMENSIONS (and the run's partition column), with
+# the sum of the metric alongside.  Filtering and grouping then only add up tiles
+# (np.bincount fills them, a few thousand combinations of BINS counts), so a filter
+# change costs milliseconds however many homes the run has, and the charts get
+# kilobytes of bins.  Means are exact; quantiles are interpolated within bins.
+# Homes with a metric that isn't finite (NaN or infinite results) are left out of
+# its bins and counted separately.
+# Tiles are kept in the store's _tiles directory, as runs never change.
+
+import json
+import os
+import warnings
+
+import numpy as np
+
+import engine
+
+#metric: label, see metric_columns
+METRICS = {'saving': 'Bill saving (£/year)',
+           'emissions_reduction': 'Emissions reduction (kg CO2/year)',
+           'energy_change': 'Energy change (kWh/year)'}
+#inputs the page can filter and group by, besides the partition column
+DIMENSIONS = ['n_tariff_states', 'is_cook_gas', 'is_hw_gas', 'is_second_heatsource', 'switch_tariff_for_hp']
+BINS = 200
+#bins span these quantiles of a sample of the run, the homes outside are counted in the end bins
+RANGE_QUANTILES = (0.001, 0.999)
+SAMPLE_SIZE = 200000
+BATCH_SIZE = 1 << 20
+#changes whenever the layout of the saved tiles does
+TILES_VERSION = 2
+
+
+def metric_columns(case):
+    """
+    case - heat pump case, one of engine.CASE_NAMES[1:]
+    returns dict of metric: list of (store column, sign) adding up to it
+    """
+    current = engine.CASE_NAMES[0]
+    return {'saving': [(f'{case}: saving', 1)],
+            'emissions_reduction': [(f'{current}: emissions_total', 1), (f'{case}: emissions_total', -1)],
+            'energy_change': [(f'{case}: energy_total', 1), (f'{current}: energy_total', -1)]}
+
+
+def _metrics(batch, cases):
+    #(metrics, cases, rows) values of a record batch
+    columns = {name: batch.column(name).to_numpy(zero_copy_only=False) for name in batch.schema.names}
+    return np.stack([[sum(sign*columns[name] for name, sign in metric_columns(case)[metric])
+                      for case in cases] for metric in METRICS])
+
+
+def quantiles(counts, edges, qs):
+    """
+    counts - (..., bins) histogram counts
+    edges - (bins + 1,) bin edges
+    qs - quantiles wanted, in [0, 1]
+    returns (..., len(qs)) quantiles, interpolated linearly within bins (NaN if no homes)
+    """
+    cum = np.cumsum(counts, axis=-1)
+    total = cum[..., -1:]
+    out = np.full(counts.shape[:-1] + (len(qs),), np.nan)
+    for j, q in enumerate(qs):
+        target = q*total
+        b = np.minimum((cum < target).sum(axis=-1, keepdims=True), counts.shape[-1] - 1)
+        below = np.take_along_axis(cum, b, axis=-1) - np.take_along_axis(counts, b, axis=-1)
+        within = np.take_along_axis(counts, b, axis=-1)
+        frac = np.where(within > 0, (target - below)/np.where(within > 0, within, 1), 0)
+        value = edges[b] + np.clip(frac, 0, 1)*(edges[b + 1] - edges[b])
+        out[..., j] = np.where(total > 0, value, np.nan)[..., 0]
+    return out
+
+
+def share_below(counts, edges, x):
+    """
+    counts, edges - as quantiles
+    returns (...) share of the homes with values below x, interpolated within its bin
+    """
+    total = counts.sum(axis=-1)
+    b = int(np.clip(np.searchsorted(edges, x, side='right') - 1, 0, len(edges) - 2))
+    frac = np.clip((x - edges[b])/(edges[b + 1] - edges[b]), 0, 1)
+    below = counts[..., :b].sum(axis=-1) + frac*counts[..., b]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return below/total
+
+
+class Tiles:
+    """
+    Histograms of each metric (METRICS) of each heat pump case over the homes of a run:
+    counts - (metrics, cases, *dimension sizes, bins) homes in each bin
+    sums - (metrics, cases, *dimension sizes) sum of the metric
+    invalid - (metrics, cases, *dimension sizes) homes left out as the metric isn't finite
+    edges - (metrics, cases, bins + 1) bin edges
+    dimensions - names of the dimension axes, values - dict of each one's values
+    """
+
+    def __init__(self, counts, sums, invalid, edges, dimensions, values, cases, run):
+        self.counts = counts
+        self.sums = sums
+        self.invalid = invalid
+        self.edges = edges
+        self.dimensions = list(dimensions)
+        self.values = values
+        self.cases = list(cases)
+        self.run = run
+
+    @classmethod
+    def build(cls, store, run_id, bins=BINS):
+        """
+        store - resultstore.ResultStore
+        run_id - run to aggregate
+        returns Tiles of the run, from two scans of its files: a sample sets the bin
+        edges and the unique values of the dimensions, then every home is binned
+        """
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        run = next(run for run in store.runs() if run['run'] == run_id)
+        cases = run['cases'][1:]
+        dimensions = DIMENSIONS + ([run['partition']] if run['partition'] else [])
+        needed = sorted({name for case in cases for cols in metric_columns(case).values() for name, _ in cols})
+        dataset = store.dataset()
+        scan = dict(columns=dimensions + needed, filter=ds.field('run') == run_id, batch_size=BATCH_SIZE)
+
+        every = max(run['homes'] // SAMPLE_SIZE, 1)
+        sample, uniques = [], {name: set() for name in dimensions}
+        for batch in dataset.to_batches(**scan):
+            for name in dimensions:
+                uniques[name].update(pc.unique(batch.column(name)).to_pylist())
+            sample.append(_metrics(batch, cases)[..., ::every])
+        values = {name: np.array(sorted(uniques[name])) for name in dimensions}
+        sample = np.concatenate(sample, axis=-1)
+        with warnings.catch_warnings():
+            #a metric with no finite value in the sample gets the range 0 to 1
+            warnings.simplefilter('ignore', RuntimeWarning)
+            lo, hi = np.nanquantile(np.where(np.isfinite(sample), sample, np.nan), RANGE_QUANTILES, axis=-1)
+        lo = np.where(np.isfinite(lo), lo, 0)
+        hi = np.where(hi > lo, hi, lo + 1)
+        edges = lo[..., None] + (hi - lo)[..., None]*np.linspace(0, 1, bins + 1)
+
+        shape = tuple(len(values[name]) for name in dimensions)
+        n_groups = int(np.prod(shape))
+        counts = np.zeros((len(METRICS), len(cases), n_groups*bins), dtype=np.int64)
+        sums = np.zeros((len(METRICS), len(cases), n_groups))
+        invalid = np.zeros((len(METRICS), len(cases), n_groups), dtype=np.int64)
+        for batch in dataset.to_batches(**scan):
+            codes = [np.searchsorted(values[name], batch.column(name).to_numpy(zero_copy_only=False))
+                     for name in dimensions]
+            group = np.ravel_multi_index(codes, shape) if codes else np.zeros(batch.num_rows, dtype=np.intp)
+            vals = _metrics(batch, cases)
+            for m in range(len(METRICS)):
+                for c in range(len(cases)):
+                    finite = np.isfinite(vals[m, c])
+                    val, home_group = vals[m, c][finite], group[finite]
+                    width = (hi[m, c] - lo[m, c])/bins
+                    b = np.clip(((val - lo[m, c])/width).astype(np.intp), 0, bins - 1)
+                    counts[m, c] += np.bincount(home_group*bins + b, minlength=n_groups*bins)
+                    sums[m, c] += np.bincount(home_group, weights=val, minlength=n_groups)
+                    invalid[m, c] += np.bincount(group[~finite], minlength=n_groups)
+        counts = counts.reshape((len(METRICS), len(cases)) + shape + (bins,))
+        grouped = (len(METRICS), len(cases)) + shape
+        return cls(counts, sums.reshape(grouped), invalid.reshape(grouped), edges, dimensions, values, cases, run_id)
+
+    def save(self, path):
+        """
+        path - .npz file to keep the tiles in
+        """
+        header = {'dimensions': self.dimensions, 'cases': self.cases, 'run': self.run,
+                  'values': {name: val.tolist() for name, val in self.values.items()}}
+        with open(path, 'wb') as f:
+            np.savez(f, counts=self.counts, sums=self.sums, invalid=self.invalid, edges=self.edges,
+                     header=json.dumps(header))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            header = json.loads(str(data['header']))
+            return cls(data['counts'], data['sums'], data['invalid'], data['edges'], header['dimensions'],
+                       {name: np.array(val) for name, val in header['values'].items()}, header['cases'],
+                       header['run'])
+
+    def select(self, metric, case, filters=None, by=None, qs=(0.1, 0.5, 0.9)):
+        """
+        metric - one of METRICS
+        case - heat pump case, one of self.cases
+        filters - dict of dimension: values to keep, the rest are left out (default all homes)
+        by - dimension to group by, or None
+        qs - quantiles of the summary and groups
+        returns dict of 'summary' (homes, mean, quantiles, share of homes above 0 and
+        homes left out as the metric isn't finite),
+        'histogram' (dict of 'start', 'end', 'homes' arrays, one entry per bin) and,
+        with by, 'groups' (dict of 'value', 'homes', 'mean' and (groups, quantiles) 'quantiles')
+        """
+        m, c = list(METRICS).index(metric), self.cases.index(case)
+        counts, sums, invalid, edges = self.counts[m, c], self.sums[m, c], self.invalid[m, c], self.edges[m, c]
+        for axis, name in enumerate(self.dimensions):
+            if filters and name in filters:
+                keep = np.isin(self.values[name], list(filters[name]))
+                counts, sums, invalid = [np.compress(keep, a, axis=axis) for a in (counts, sums, invalid)]
+        #every dimension but by, added up
+        axes = tuple(axis for axis, name in enumerate(self.dimensions) if name != by)
+        hist, total = counts.sum(axis=axes), sums.sum(axis=axes)
+        overall = hist if by is None else hist.sum(axis=0)
+        homes = int(overall.sum())
+        summary = {'homes': homes, 'mean': float(total.sum())/homes if homes else np.nan,
+                   'quantiles': dict(zip(qs, quantiles(overall, edges, qs).tolist())),
+                   'share_above_zero': 1 - float(share_below(overall, edges, 0)) if homes else np.nan,
+                   'not_finite': int(invalid.sum())}
+        view = {'summary': summary, 'histogram': {'start': edges[:-1], 'end': edges[1:], 'homes': overall}}
+        if by is not None:
+            values = self.values[by]
+            if filters and by in filters:
+                values = values[np.isin(values, list(filters[by]))]
+            group_homes = hist.sum(axis=-1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = total/group_homes
+            view['groups'] = {'value': values, 'homes': group_homes, 'mean': mean,
+                              'quantiles': quantiles(hist, edges, qs)}
+        return view
+
+
+def tiles_path(store, run_id, bins=BINS):
+    """
+    returns where the tiles of run_id are kept in store
+    """
+    return os.path.join(store.root, '_tiles', f'{run_id}-v{TILES_VERSION}-{bins}.npz')
+
+
+def load_tiles(store, run_id, bins=BINS):
+    """
+    store - resultstore.ResultStore
+    run_id - run to aggregate
+    returns Tiles of the run, built and kept in the store the first time
+    """
+    path = tiles_path(store, run_id, bins)
+    if os.path.exists(path):
+        return Tiles.load(path)
+    tiles = Tiles.build(store, run_id, bins)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    tiles.save(tmp)
+    os.replace(tmp, path)
+    return tiles
@@ -0,0 +1,224 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Lifetime costs and emissions under price and grid carbon trajectories.
+#
+#   python projection.py homes.csv projection.csv --years 20 --scenarios constant,decarbonising
+#
+# A scenario gives, for each year of the lifetime, the gas and electricity unit
+# rates and standing charges and the grid carbon intensity (see SCENARIOS).  Each
+# home's own tariff is taken as the first year and moves in proportion to the
+# scenario's prices, so homes on other tariffs follow the same trajectory.
+#
+# A case's yearly bill is the sum of its four cost rows (engine.COST_BREAKDOWNS)
+# each times that year's price multiplier, and its emissions are its gas kWh at
+# the gas carbon intensity plus its electricity kWh at the year's grid intensity.
+# Heat pump electricity is affine in 1/SCOP, so a heat pump whose SCOP and COP fall
+# by a fraction each year is interpolated from two engine evaluations per home,
+# as in retrofit.optimise.  Every (scenario, year) coefficient times every home's
+# components is then a single (scenarios, years, components) x (components, homes)
+# product: the annual model is never re-run per year or per scenario.
+
+import argparse
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+import engine
+from batch import DEFAULT_CHUNK_SIZE, engine_inputs, read_chunks
+from retrofit import DISCOUNT_RATE, HEAT_PUMP_COST, LIFETIME_YEARS
+
+#fraction of heat pump SCOP and hot water COP lost each year
+SCOP_DEGRADATION = 0.01
+#prices and grid carbon intensity of the first year, the values in engine
+BASE = {'gas_unit': engine.gas_unit, 'gas_stand': engine.gas_stand, 'elec_unit': engine.elec_unit,
+        'elec_stand': engine.elec_stand, 'elec_kgCO2perkWh': engine.ELEC_AVE_kgCO2perkWh}
+#illustrative grid carbon intensity, falling to 0.02 kgCO2/kWh by 2040 (15 years on)
+GRID_DECARBONISING = list(np.linspace(engine.ELEC_AVE_kgCO2perkWh, 0.02, 16))
+#each entry of a scenario is either a list of the value in each year (in the units
+# of BASE, the last repeated if the lifetime is longer) or the fractional change
+# a year from BASE; entries not given stay at BASE.  'scop_degradation' and
+# 'discount_rate' can be given too, overriding those passed to project
+SCENARIOS = {
+    'constant': {},
+    'decarbonising': {'elec_kgCO2perkWh': GRID_DECARBONISING},
+    'high gas': {'elec_kgCO2perkWh': GRID_DECARBONISING, 'gas_unit': 0.03, 'gas_stand': 0.03},
+    'rebalanced levies': {'elec_kgCO2perkWh': GRID_DECARBONISING, 'elec_unit': -0.02, 'gas_unit': 0.02},
+}
+#per home components of a case's yearly bill and emissions, see _components
+COST_COMPONENTS = ['gas_stand', 'gas_unit', 'elec_stand', 'elec_unit', 'elec_unit_degradation']
+EMISSION_COMPONENTS = ['gas_kWh', 'elec_kWh', 'elec_kWh_degradation']
+
+
+def trajectories(scenarios, years=LIFETIME_YEARS, scop_degradation=SCOP_DEGRADATION, rate=DISCOUNT_RATE):
+    """
+    scenarios - list of scenario dicts, see SCENARIOS
+    years - lifetime in years
+    scop_degradation, rate - defaults for scenarios not giving their own
+    returns dict of (scenarios, years) arrays: price multipliers of each key of BASE
+    but elec_kgCO2perkWh (kg/kWh), 'efficiency' (SCOP now over SCOP in the first
+    year) and 'discount' (present value of £1 spent in the year)
+    """
+    t = {}
+    year = np.arange(years)
+    for key, base in BASE.items():
+        rows = []
+        for scenario in scenarios:
+            val = scenario.get(key, 0.0)
+            if np.ndim(val):
+                val = np.asarray(val, dtype=float)[np.minimum(year, len(val) - 1)]
+            else:
+                val = base*(1 + val)**year
+            rows.append(val if key == 'elec_kgCO2perkWh' else val/base)
+        t[key] = np.array(rows)
+    degradation = np.array([[s.get('scop_degradation', scop_degradation)] for s in scenarios])
+    rates = np.array([[s.get('discount_rate', rate)] for s in scenarios])
+    t['efficiency'] = (1 - degradation)**year
+    t['discount'] = (1 + rates)**-(year + 1.0)
+    return t
+
+
+def _components(p, block_size=None):
+    """
+    p - prepared inputs
+    returns dict of case name to (COST_COMPONENTS, n) and (EMISSION_COMPONENTS, n)
+    arrays: the first year's cost rows and gas and electricity kWh, plus how much
+    the electricity unit cost and kWh rise per unit rise of 1/SCOP (relative to
+    the first year) and the emissions marked renewable left out
+    """
+    n = max((val.size for val in p.values() if val.ndim), default=1)
+    #evaluate each home as installed and with every heat pump SCOP and COP halved,
+    #in one engine call; heat pump electricity is affine in 1/SCOP so that gives
+    #the slope for any degradation
+    both = {name: np.tile(val, 2) if val.ndim else val for name, val in p.items()}
+    for name in ('hp_heat_scop_typ', 'hp_hw_cop_typ', 'hp_heat_scop_hi', 'hp_hw_cop_hi'):
+        both[name] = np.concatenate([np.broadcast_to(p[name], n), np.broadcast_to(p[name], n)/2])
+    results = engine.calculate(both, block_size)
+    fossil = ~np.broadcast_to(p['is_elec_renewable'], n)
+    components = {}
+    for case, res in results.items():
+        costs, elec_kWh = res['costs'][:, :n], res['elec_total_kWh'][:n]
+        components[case] = (np.vstack([costs, res['costs'][3, n:] - costs[3]]),
+                            np.vstack([res['gas_total_kWh'][:n], elec_kWh*fossil,
+                                       (res['elec_total_kWh'][n:] - elec_kWh)*fossil]))
+    return components
+
+
+def project(inputs, scenarios=None, years=LIFETIME_YEARS, scop_degradation=SCOP_DEGRADATION, rate=DISCOUNT_RATE,
+            heat_pump_cost=HEAT_PUMP_COST, yearly=False, block_size=None):
+    """
+    inputs - mapping of engine inputs, scalars or one value per household; their
+             tariff and performance are those of the first year
+    scenarios - dict of name to scenario (see SCENARIOS), default SCENARIOS
+    years - lifetime in years
+    scop_degradation - fraction of heat pump SCOP and COP lost each year
+    rate - discount rate
+    heat_pump_cost - cost of installing the heat pump (£), for its NPV
+    yearly - whether to return the costs and emissions of each year too
+    returns dict of 'scenarios' (names) and, for each case name, a dict of
+    (scenarios, n) arrays: 'cost' (total over the lifetime, £), 'pv_cost'
+    (discounted, £), 'tCO2' (tonnes over the lifetime) and for the heat pump cases
+    'npv' (discounted saving on the current case less heat_pump_cost, £); with
+    yearly, 'annual_cost' and 'annual_tCO2' (scenarios, years, n) as well
+    """
+    scenarios = SCENARIOS if scenarios is None else scenarios
+    t = trajectories(list(scenarios.values()), years, scop_degradation, rate)
+    components = _components(engine.prepare_inputs(inputs), block_size)
+
+    #(scenarios, years, components) coefficients of each home's components
+    cost_coef = np.stack([t['gas_stand'], t['gas_unit'], t['elec_stand'], t['elec_unit'],
+                          t['elec_unit']*(1/t['efficiency'] - 1)], axis=-1)
+    carbon = t['elec_kgCO2perkWh']
+    emission_coef = np.stack([np.full_like(carbon, engine.GAS_kgCO2perkWh), carbon,
+                              carbon*(1/t['efficiency'] - 1)], axis=-1)/1000
+    #lifetime totals contract over the years first, so (scenarios, years, n) is only built if asked for
+    out = {'scenarios': list(scenarios)}
+    for case in engine.CASE_NAMES:
+        costs, emissions = components[case]
+        res = {'cost': cost_coef.sum(axis=1) @ costs,
+               'pv_cost': np.einsum('sy,syk->sk', t['discount'], cost_coef) @ costs,
+               'tCO2': emission_coef.sum(axis=1) @ emissions}
+        if case != engine.CASE_NAMES[0]:
+            res['npv'] = out[engine.CASE_NAMES[0]]['pv_cost'] - res['pv_cost'] - heat_pump_cost
+        if yearly:
+            res['annual_cost'] = cost_coef @ costs
+            res['annual_tCO2'] = emission_coef @ emissions
+        out[case] = res
+    return out
+
+
+def projection_columns(result, home):
+    """
+    result - output of project
+    home - household label per column of result
+    returns dict of 1d arrays, one row per household, scenario and case
+    """
+    names = result['scenarios']
+    n = len(home)
+    columns = {'home': np.tile(np.repeat(home, len(names)), len(engine.CASE_NAMES)),
+               'scenario': np.tile(np.tile(names, n), len(engine.CASE_NAMES)),
+               'Case': np.repeat(engine.CASE_NAMES, n*len(names))}
+    for name in ('cost', 'pv_cost', 'tCO2', 'npv'):
+        columns[name] = np.concatenate([result[case][name].T.reshape(-1) if name in result[case] else
+                                        np.full(n*len(names), np.nan) for case in engine.CASE_NAMES])
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Project lifetime costs and emissions under price and grid trajectories.')
+    parser.add_argument('homes', help='CSV or Parquet file, one row per home')
+    parser.add_argument('output', help='CSV file, one row per home, scenario and case')
+    parser.add_argument('--years', type=int, default=LIFETIME_YEARS)
+    parser.add_argument('--scenarios', help=f'comma separated, default all of {", ".join(SCENARIOS)} and the file\'s')
+    parser.add_argument('--scenario-file', help='JSON file of more scenarios, name to scenario as SCENARIOS')
+    parser.add_argument('--scop-degradation', type=float, default=SCOP_DEGRADATION)
+    parser.add_argument('--rate', type=float, default=DISCOUNT_RATE, help='discount rate')
+    parser.add_argument('--heat-pump-cost', type=float, default=HEAT_PUMP_COST)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--id-column', help='column identifying each home')
+    args = parser.parse_args()
+
+    available = dict(SCENARIOS)
+    if args.scenario_file:
+        with open(args.scenario_file) as f:
+            available.update(json.load(f))
+    names = [s for s in args.scenarios.split(',') if s] if args.scenarios else list(available)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(unknown)}')
+    scenarios = {name: available[name] for name in names}
+
+    start = 0
+    for chunk in read_chunks(args.homes, args.chunk_size, args.id_column):
+        n = max((np.size(val) for val in chunk.values()), default=0)
+        home = chunk[args.id_column] if args.id_column else np.arange(start, start + n)
+        result = project(engine_inputs(chunk), scenarios, args.years, args.scop_degradation, args.rate,
+                         args.heat_pump_cost)
+        pd.DataFrame(projection_columns(result, home)).to_csv(
+            args.output, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+        start += n
+    print(f'{start:,} homes x {len(scenarios)} scenarios x {args.years} years', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Best post-install tariffs for each household from a tariff library.
+#
+#   python recommend.py homes.csv tariffs.csv recommendations.csv --top-k 3
+#
+# Every tariff of the library is compiled once into a column of end use rates,
+# with and without the heat pump switched off at peak times, giving a tariff
+# matrix that is saved next to the library and reused while the library is
+# unchanged.  A household's bill on every tariff and option is then its
+# electricity by end use times the matrix, so a block of households is scored
+# against the whole library with one matrix multiply and the top k are picked
+# with a partial sort.
+#
+# The tariff library CSV has a 'name' and a 'standing' (p/day) column followed
+# by the unit rates (p/kWh) over 24 or 48 slots of a day, or 8760 or 17520 of a
+# year; homes are read as by batch.py.
+
+import argparse
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import engine
+import tariffs
+from batch import DEFAULT_CHUNK_SIZE, engine_inputs, read_chunks
+
+DEFAULT_TOP_K = 3
+#households scored at a time, each needing a row of bills per tariff and option
+BLOCK_SIZE = 4096
+CASES = {'typ': 'Typical HP Install', 'hi': 'Hi-performance HP Install'}
+#changes whenever the way the matrix is built changes, so saved matrices are rebuilt
+MATRIX_VERSION = 1
+
+
+class TariffMatrix:
+    """
+    End use rates of a tariff library: rates[:, 2*i + peak_off] is
+    CompiledTariff.component_rates for tariff i with the heat pump running through
+    (peak_off 0) or off at peak times (1)
+    """
+
+    def __init__(self, names, rates, key):
+        self.names = np.asarray(names)
+        self.rates = rates
+        self.key = key
+
+    @classmethod
+    def build(cls, library, shapes=None):
+        """
+        library - list of tariffs.Tariff
+        shapes - dict of end use to load shape replacing tariffs.LOAD_SHAPES
+        """
+        shape_slots = max([len(np.asarray(s)) for s in (shapes or {}).values()], default=0)
+        columns = []
+        for tariff in library:
+            compiled = tariff.compile(max(len(tariff.rates), shape_slots))
+            peak_off = compiled.component_rates(shapes, peak_off=True)
+            if not compiled.peak_slots().any():
+                #nothing to avoid, so switching off at peak is the same option again: an
+                #infinite standing charge keeps it out of the results
+                peak_off = np.append(peak_off[:-1], np.inf)
+            columns += [compiled.component_rates(shapes), peak_off]
+        return cls([tariff.name for tariff in library], np.column_stack(columns), library_key(library, shapes))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['names'], data['rates'], str(data['key']))
+
+    def save(self, path):
+        np.savez(path, names=self.names, rates=self.rates, key=self.key)
+
+    @classmethod
+    def cached(cls, library, path, shapes=None):
+        """
+        returns the matrix saved at path if it was built from the same library and
+        shapes, otherwise builds it and saves it there
+        """
+        key = library_key(library, shapes)
+        if os.path.exists(path):
+            matrix = cls.load(path)
+            if matrix.key == key:
+                return matrix
+        matrix = cls.build(library, shapes)
+        matrix.save(path)
+        return matrix
+
+
+def library_key(library, shapes=None):
+    """
+    returns hex digest identifying the tariffs (in order) and load shapes
+    """
+    digest = hashlib.sha256(f'{MATRIX_VERSION}'.encode())
+    for tariff in library:
+        digest.update(tariff.key.encode() + tariff.name.encode())
+    for name, shape in sorted((shapes or {}).items()):
+        digest.update(name.encode() + np.asarray(shape, dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+def read_library(path):
+    """
+    path - tariff library CSV
+    returns list of tariffs.Tariff
+    """
+    df = pd.read_csv(path)
+    rates = df.drop(columns=['name', 'standing']).to_numpy(dtype=float)
+    return [tariffs.Tariff(row, standing, name)
+            for name, standing, row in zip(df['name'].astype(str), df['standing'], rates)]
+
+
+def recommend(inputs, matrix, top_k=DEFAULT_TOP_K, case='Typical HP Install', block_size=None):
+    """
+    inputs - mapping of engine inputs, scalars or one value per household
+    matrix - TariffMatrix of the library to search
+    top_k - number of tariffs returned per household
+    case - heat pump case whose electricity use is costed
+    block_size - households scored at a time, default BLOCK_SIZE
+    returns dict of (n, top_k) arrays, cheapest first: 'tariff' (index into
+    matrix.names), 'peak_off', 'bill' (annual gas and electricity, £) and 'saving'
+    against the bill of the case on the tariff given in the inputs; when the library
+    has fewer than top_k real options the slots left over have tariff -1 and NaN
+    bill and saving
+    """
+    p = engine.prepare_inputs(inputs)
+    res = engine.calculate(inputs)[case]
+    elec_energy = res['elec_energy'].copy()
+    #those with solar panels get free hot water for 4 months, as in engine.heat_pump_case
+    elec_energy[1] *= np.where(p['is_free_summer_hw'], 2/3, 1)
+    gas_cost = res['costs'][0] + res['costs'][1]
+    demand = np.vstack([elec_energy, np.ones_like(gas_cost)]).T
+
+    n, n_options = len(demand), matrix.rates.shape[1]
+    top_k = min(top_k, n_options)
+    block_size = block_size or BLOCK_SIZE
+    best = np.empty((n, top_k), dtype=np.intp)
+    bill = np.empty((n, top_k))
+    for start in range(0, n, block_size):
+        rows = slice(start, start + block_size)
+        bills = demand[rows] @ matrix.rates
+        idx = np.argpartition(bills, top_k - 1, axis=1)[:, :top_k] if top_k < n_options else \
+            np.broadcast_to(np.arange(n_options), bills.shape)
+        block_bill = np.take_along_axis(bills, idx, axis=1)
+        order = np.argsort(block_bill, axis=1, kind='stable')
+        best[rows] = np.take_along_axis(idx, order, axis=1)
+        bill[rows] = np.take_along_axis(block_bill, order, axis=1)
+
+    #options kept out by an infinite standing charge only fill slots once the real ones run out
+    missing = ~np.isfinite(bill)
+    bill[missing] = np.nan
+    bill += gas_cost[:, None]
+    return {'tariff': np.where(missing, -1, best // 2), 'peak_off': (best % 2).astype(bool) & ~missing,
+            'bill': bill, 'saving': res['costs_total'][:, None] - bill}
+
+
+def recommendation_columns(rec, names, home):
+    """
+    rec - output of recommend
+    names - tariff names, TariffMatrix.names
+    home - household label per row of rec
+    returns dict of 1d arrays, one row per household and rank, leaving out the
+    slots with no tariff
+    """
+    n, k = rec['tariff'].shape
+    tariff = rec['tariff'].reshape(-1)
+    keep = tariff >= 0
+    return {'home': np.repeat(home, k)[keep], 'rank': np.tile(np.arange(1, k + 1), n)[keep],
+            'tariff': names[tariff[keep]], 'peak_off': rec['peak_off'].reshape(-1)[keep],
+            'bill': rec['bill'].reshape(-1)[keep], 'saving': rec['saving'].reshape(-1)[keep]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recommend post-install tariffs for a file of households.')
+    parser.add_argument('homes', help='CSV or Parquet file, one row per home')
+    parser.add_argument('library', help='tariff library CSV')
+    parser.add_argument('output', help='CSV file of recommendations')
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K)
+    parser.add_argument('--case', choices=CASES, default='typ', help='heat pump installation to cost')
+    parser.add_argument('--matrix', help='where the tariff matrix is kept, default next to the library')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--id-column', help='column identifying each home')
+    args = parser.parse_args()
+
+    library = read_library(args.library)
+    matrix = TariffMatrix.cached(library, args.matrix or os.path.splitext(args.library)[0] + '.matrix.npz')
+    start = 0
+    for chunk in read_chunks(args.homes, args.chunk_size, args.id_column):
+        inputs = engine_inputs(chunk)
+        n = max((np.size(val) for val in chunk.values()), default=0)
+        home = chunk[args.id_column] if args.id_column else np.arange(start, start + n)
+        rec = recommend(inputs, matrix, args.top_k, CASES[args.case])
+        pd.DataFrame(recommendation_columns(rec, matrix.names, home)).to_csv(
+            args.output, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+        start += n
+    print(f'{start:,} homes x {len(matrix.names):,} tariffs', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,386 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Append-only store of portfolio results, for dashboards to query.
+#
+#   python resultstore.py write store/ homes.parquet --run-id 2024-10-cap --partition region
+#   python resultstore.py runs store/
+#   python resultstore.py query store/ "Typical HP Install: saving" --where "is_cook_gas == true" \
+#       --where "n_tariff_states == 3" --by run
+#
+# A store is a directory of runs, each a directory of Parquet files partitioned by
+# a column of the homes such as region or archetype:
+#
+#   store/run=2024-10-cap/region=3/part-00000.parquet
+#
+# The partition column is only in the directory names, as usual for hive-style
+# partitioning.  Each file has one row per home: its label (a string), every engine
+# input (as prepared by the engine - flags bool, second_heatsource_type a code) and
+# for each case its totals, bill saving and the energy, emissions and cost of each
+# breakdown (see result_names).  The rows of a file are sorted by SORT_COLUMNS and
+# row groups start where their values change (unless that would leave row groups
+# under MIN_ROW_GROUP_SIZE), and have min/max statistics.  So filters on the run or
+# partition column skip whole files, and filters on the sort columns (or anything
+# clustered with them) whole row groups, without reading them.
+#
+# A run is written into a hidden directory and renamed into place when complete,
+# and is never changed afterwards: a run under an old price cap stays as it was, to
+# compare with later ones.  Its _run.json records the constants (prices, carbon
+# factors, defaults, load shapes) it was calculated with.
+#
+# ResultStore opens the files memory-mapped through pyarrow.dataset, so a query
+# reads only the columns and row groups it needs.  pyarrow is needed throughout.
+
+import argparse
+import datetime
+import json
+import os
+import re
+import shutil
+import sys
+import urllib.parse
+
+import numpy as np
+
+import cache
+import engine
+from batch import DEFAULT_CHUNK_SIZE, engine_inputs, read_chunks
+
+#the rows of each file are sorted by these inputs and row groups start where they
+#change, so row group statistics cover few of their values
+SORT_COLUMNS = ['n_tariff_states', 'is_cook_gas', 'is_hw_gas']
+#fewest and most rows in a row group (fewer in the last of a file)
+MIN_ROW_GROUP_SIZE = 4096
+ROW_GROUP_SIZE = 16384
+RUN_FILE = '_run.json'
+RUN_ID = re.compile(r'[A-Za-z0-9][A-Za-z0-9._-]*')
+#statistics of aggregate, as named by pandas
+STATS = ['count', 'mean', 'median']
+OPS = ['==', '!=', '<', '<=', '>', '>=']
+
+
+def result_names(case_names=None):
+    """
+    case_names - cases of the results, default engine.CASE_NAMES
+    returns list of the result columns of each home: '<case>: costs_total',
+    'emissions_total', 'energy_total', 'saving' (not for the current case), then
+    '<case>: <breakdown> kWh' and 'kgCO2' for each energy breakdown and
+    '<case>: <breakdown> £' for each cost breakdown
+    """
+    case_names = engine.CASE_NAMES if case_names is None else case_names
+    names = []
+    for c, case in enumerate(case_names):
+        totals = ['costs_total', 'emissions_total', 'energy_total'] + (['saving'] if c else [])
+        names += [f'{case}: {name}' for name in totals]
+        names += [f'{case}: {b} {unit}' for b in engine.ENERGY_BREAKDOWNS for unit in ('kWh', 'kgCO2')]
+        names += [f'{case}: {b} £' for b in engine.COST_BREAKDOWNS]
+    return names
+
+
+def household_columns(results, p):
+    """
+    results - output of engine.calculate
+    p - the prepared inputs calculated, from engine.prepare_inputs
+    returns dict of 1d arrays, one row per home: every input of p, then result_names()
+    """
+    n = results[engine.CASE_NAMES[0]]['costs_total'].shape[0]
+    columns = {name: np.broadcast_to(val, (n,)) for name, val in p.items()}
+    current = results[engine.CASE_NAMES[0]]['costs_total']
+    values = []
+    for c, case in enumerate(engine.CASE_NAMES):
+        res = results[case]
+        values += [res['costs_total'], res['emissions_total'], res['energy_total']]
+        values += [current - res['costs_total']] if c else []
+        values += [row for j in range(len(engine.ENERGY_BREAKDOWNS)) for row in (res['energy'][j], res['emissions'][j])]
+        values += list(res['costs'])
+    columns.update(zip(result_names(), values))
+    return columns
+
+
+def _partition_dir(partition, value):
+    return f'{partition}={urllib.parse.quote(str(value), safe="")}'
+
+
+class RunWriter:
+    """
+    Writes a run into store root, partitioned by the column partition (or not at
+    all, if None); the run appears in the store once closed without an error
+    """
+
+    def __init__(self, root, run_id, partition=None, metadata=None):
+        if not RUN_ID.fullmatch(run_id):
+            raise ValueError(f'run id {run_id!r} must be letters, digits, ".", "_" and "-"')
+        self.root = root
+        self.run_id = run_id
+        self.partition = partition
+        self.path = os.path.join(root, f'run={run_id}')
+        if os.path.exists(self.path):
+            raise FileExistsError(f'run {run_id!r} is already in {root}, runs are never overwritten')
+        self._staging = os.path.join(root, f'_tmp-{run_id}')
+        shutil.rmtree(self._staging, ignore_errors=True)
+        os.makedirs(self._staging)
+        self.metadata = dict(metadata or {}, run=run_id, partition=partition, homes=0, sort_columns=SORT_COLUMNS,
+                             cases=engine.CASE_NAMES, constants_key=cache.constants_key(),
+                             constants=cache.calculator_constants())
+        self._chunks = 0
+
+    def write(self, home, p, results, partition_values=None):
+        """
+        home - label of each home
+        p, results - prepared inputs and output of engine.calculate
+        partition_values - value of the partition column for each home
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        #as strings, so runs labelled by row number and by an id column read together
+        columns = {'home': np.asarray(home).astype(str)}
+        n = len(columns['home'])
+        columns.update(household_columns(results, p))
+
+        #one file per partition value in the chunk, each sorted by SORT_COLUMNS
+        if self.partition is None:
+            values, inverse = np.array([None]), np.zeros(n, dtype=np.intp)
+        else:
+            values, inverse = np.unique(np.asarray(partition_values), return_inverse=True)
+            self.metadata['partition_type'] = str(pa.array(values[:1]).type)
+        keys = [inverse] + [columns[name] for name in SORT_COLUMNS]
+        order = np.lexsort(keys[::-1])
+        table = pa.table({name: np.asarray(val)[order] for name, val in columns.items()})
+        #row groups start where any key changes, files where the partition value does
+        changed = np.zeros(n, dtype=bool)
+        for key in keys:
+            key = np.asarray(key)[order]
+            changed[1:] |= key[1:] != key[:-1]
+        starts = np.flatnonzero(changed).tolist() + [n]
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(inverse, minlength=len(values)))])
+        for k, value in enumerate(values):
+            folder = self._staging if self.partition is None else os.path.join(
+                self._staging, _partition_dir(self.partition, value))
+            os.makedirs(folder, exist_ok=True)
+            group_starts = [bounds[k]]
+            for i in starts:
+                if bounds[k] + MIN_ROW_GROUP_SIZE <= i < bounds[k + 1] and i - group_starts[-1] >= MIN_ROW_GROUP_SIZE:
+                    group_starts.append(i)
+            group_starts.append(bounds[k + 1])
+            with pq.ParquetWriter(os.path.join(folder, f'part-{self._chunks:05d}.parquet'), table.schema) as f:
+                for start, stop in zip(group_starts[:-1], group_starts[1:]):
+                    f.write_table(table.slice(start, stop - start), row_group_size=ROW_GROUP_SIZE)
+        self._chunks += 1
+        self.metadata['homes'] += n
+
+    def close(self):
+        self.metadata['created'] = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+        with open(os.path.join(self._staging, RUN_FILE), 'w') as f:
+            json.dump(self.metadata, f, indent=1, default=cache.json_default)
+        os.rename(self._staging, self.path)
+
+    def abort(self):
+        shutil.rmtree(self._staging, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_run(root, input_path, run_id=None, partition=None, chunk_size=DEFAULT_CHUNK_SIZE, id_column=None):
+    """
+    root - store directory, created if needed
+    input_path - CSV or Parquet file of homes, as for batch.py
+    run_id - name of the run, default the time now (UTC)
+    partition - column of the input file to partition the run by, e.g. 'region'
+    chunk_size, id_column - as batch.run
+    returns the run's metadata
+    """
+    run_id = run_id or datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%S')
+    os.makedirs(root, exist_ok=True)
+    start = 0
+    extra = [partition] if partition else []
+    with RunWriter(root, run_id, partition, {'input': os.path.abspath(input_path)}) as writer:
+        for chunk in read_chunks(input_path, chunk_size, id_column, extra):
+            if partition and partition not in chunk:
+                raise KeyError(f'{input_path} has no column {partition!r} to partition by')
+            n = max((np.size(val) for val in chunk.values()), default=0)
+            home = chunk[id_column] if id_column else np.arange(start, start + n)
+            p = engine.prepare_inputs(engine_inputs(chunk))
+            writer.write(home, p, engine.calculate(p), chunk.get(partition))
+            start += n
+    return writer.metadata
+
+
+def _where_expression(where):
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    if where is None or isinstance(where, ds.Expression):
+        return where
+    return pq.filters_to_expression(list(where))
+
+
+class ResultStore:
+    """
+    Runs of a store directory, read memory-mapped
+    """
+
+    def __init__(self, root):
+        if not os.path.isdir(root):
+            raise FileNotFoundError(f'no result store at {root}')
+        self.root = root
+        #(run ids, dataset of them), until a run is added
+        self._dataset = ((), None)
+
+    def run_ids(self):
+        """
+        returns sorted list of the ids of the runs in the store
+        """
+        return sorted(name[len('run='):] for name in os.listdir(self.root)
+                      if name.startswith('run=') and os.path.exists(os.path.join(self.root, name, RUN_FILE)))
+
+    def runs(self):
+        """
+        returns list of the metadata of each run, oldest first
+        """
+        runs = []
+        for run_id in self.run_ids():
+            with open(os.path.join(self.root, f'run={run_id}', RUN_FILE)) as f:
+                runs.append(json.load(f))
+        return sorted(runs, key=lambda run: run['created'])
+
+    def dataset(self):
+        """
+        returns pyarrow Dataset of every run, with 'run' and partition columns; columns
+        missing from older runs (or partition columns of other runs) read as null
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.fs as fs
+        import pyarrow.parquet as pq
+
+        run_ids = tuple(self.run_ids())
+        if self._dataset[0] == run_ids:
+            return self._dataset[1]
+        filesystem = fs.LocalFileSystem(use_mmap=True)
+        schemas = []
+        for run_id in run_ids:
+            for folder, _, files in os.walk(os.path.join(self.root, f'run={run_id}')):
+                part = next((name for name in sorted(files) if name.endswith('.parquet')), None)
+                if part is not None:
+                    schemas.append(pq.read_schema(os.path.join(folder, part), memory_map=True))
+                    break
+        fields = {'run': pa.string()}
+        for run in self.runs():
+            if run['partition'] is not None and 'partition_type' in run:
+                fields.setdefault(run['partition'], pa.type_for_alias(run['partition_type']))
+        partitioning = ds.partitioning(pa.schema(list(fields.items())), flavor='hive')
+        schema = pa.unify_schemas(schemas + [partitioning.schema]) if schemas else None
+        dataset = ds.dataset(self.root, schema=schema, format='parquet', partitioning=partitioning,
+                             filesystem=filesystem)
+        self._dataset = (run_ids, dataset)
+        return dataset
+
+    def table(self, columns, where=None, runs=None):
+        """
+        columns - names of the columns to read
+        where - pyarrow expression, or list of (column, op, value) as pyarrow.parquet
+                filters, e.g. [('is_cook_gas', '==', True), ('n_tariff_states', '==', 3)]
+        runs - run ids to read, default all
+        returns pyarrow Table of the columns of the homes matching where
+        """
+        import pyarrow.dataset as ds
+
+        expression = _where_expression(where)
+        if runs is not None:
+            in_runs = ds.field('run').isin(list(runs))
+            expression = in_runs if expression is None else expression & in_runs
+        return self.dataset().to_table(columns=list(columns), filter=expression)
+
+    def aggregate(self, value, by=(), where=None, runs=None, stats=STATS):
+        """
+        value - column to summarise, e.g. 'Typical HP Install: saving'
+        by - columns to group by, e.g. ['run', 'region']
+        where, runs - as table
+        stats - statistics to take, as named by pandas ('count', 'mean', 'median', ...)
+        returns DataFrame of the statistics of value, one row per group
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        df = self.table(by + [value], where, runs).to_pandas()
+        if not by:
+            return df[value].agg(list(stats)).to_frame().T.reset_index(drop=True)
+        return df.groupby(by, observed=True, sort=True)[value].agg(list(stats)).reset_index()
+
+
+def parse_where(text):
+    """
+    text - condition such as 'n_tariff_states == 3' or 'is_cook_gas == true'
+    returns (column, op, value) filter
+    """
+    for op in sorted(OPS, key=len, reverse=True):
+        column, found, value = text.partition(f' {op} ')
+        if found:
+            try:
+                value = json.loads(value.strip())
+            except ValueError:
+                value = value.strip()
+            return column.strip(), op, value
+    raise ValueError(f'condition {text!r} is not "column op value" with op one of {" ".join(OPS)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Append-only store of portfolio results.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    write = commands.add_parser('write', help='calculate a file of homes into a new run of the store')
+    write.add_argument('store', help='store directory')
+    write.add_argument('homes', help='CSV or Parquet file, one row per home')
+    write.add_argument('--run-id', help='name of the run (default: the time now)')
+    write.add_argument('--partition', help='column of the homes to partition by, e.g. region or archetype')
+    write.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    write.add_argument('--id-column', help='column identifying each home')
+    runs = commands.add_parser('runs', help='list the runs of a store')
+    runs.add_argument('store')
+    query = commands.add_parser('query', help='statistics of a column of the homes matching conditions')
+    query.add_argument('store')
+    query.add_argument('value', help="column to summarise, e.g. 'Typical HP Install: saving'")
+    query.add_argument('--where', action='append', default=[], help="condition, e.g. 'n_tariff_states == 3'")
+    query.add_argument('--by', action='append', default=[], help='column to group by, e.g. run')
+    query.add_argument('--run', action='append', help='run to include (default: all)')
+    query.add_argument('--stats', default=','.join(STATS), help='comma separated statistics')
+    args = parser.parse_args()
+
+    if args.command == 'write':
+        run = write_run(args.store, args.homes, args.run_id, args.partition, args.chunk_size, args.id_column)
+        print(f'run {run["run"]}: {run["homes"]:,} homes', file=sys.stderr)
+    elif args.command == 'runs':
+        for run in ResultStore(args.store).runs():
+            print(f'{run["run"]}\t{run["created"]}\t{run["homes"]} homes\tpartition {run["partition"]}\t'
+                  f'constants {run["constants_key"][:12]}')
+    else:
+        store = ResultStore(args.store)
+        where = [parse_where(text) for text in args.where] or None
+        print(store.aggregate(args.value, args.by, where, args.run, args.stats.split(',')).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Best package of efficiency measures to install with the heat pump.
+#
+#   python retrofit.py homes.csv packages.csv --rank npv --top-k 3
+#
+# A package is a subset of MEASURES, held as a bitmask (bit i set if measure i is
+# in it).  Savings combine with diminishing returns: each measure saves its
+# fraction of the heat demand left by the others, so a package leaves
+# prod(1 - saving) of the demand.  Install costs add up.
+#
+# Any package that costs at least as much as another and leaves at least as much
+# demand can't be better for any home, on bills, emissions, payback or NPV, and
+# adding the same measures to both keeps it that way.  So the candidates are
+# built a measure at a time, dropping dominated packages after each one, which
+# keeps the count near the size of the cost/demand Pareto front rather than
+# 2^n.  The bills and emissions of every candidate for every home are then
+# interpolated from two engine evaluations per home (see optimise).
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+import engine
+from batch import DEFAULT_CHUNK_SIZE, engine_inputs, read_chunks
+
+#typical installed cost of each measure of engine.efficiency_opts (£)
+INSTALL_COSTS = {'Draft proofing and/or door insulation (3%)': 300,
+                 'Increased loft insulation (5%)': 800,
+                 'Improved window glazing (5%)': 6000,
+                 'Cavity wall insulation (10%)': 2500,
+                 'Underfloor insulation (10%)': 2000,
+                 'Internal or external solid wall insulation (15%)': 10000}
+#(label, fraction of heat demand saved, install cost £), the custom option left out
+MEASURES = [(lab, boost, INSTALL_COSTS[lab]) for lab, boost in engine.efficiency_opts if boost >= 0]
+#heat pump installed cost, less the Boiler Upgrade Scheme grant (£)
+HEAT_PUMP_COST = 12000 - 7500
+DISCOUNT_RATE = 0.035
+LIFETIME_YEARS = 20
+RANKS = ['npv', 'payback']
+
+
+class Packages:
+    """
+    Packages of measures: masks (bitmask per package), factor (fraction of heat
+    demand left) and cost (£), in order of increasing cost
+    """
+
+    def __init__(self, masks, factor, cost, measures):
+        order = np.lexsort((factor, cost))
+        self.masks = masks[order]
+        self.factor = factor[order]
+        self.cost = cost[order]
+        self.measures = measures
+
+    def __len__(self):
+        return len(self.masks)
+
+    @classmethod
+    def all(cls, measures=None):
+        """
+        returns every subset of measures (default MEASURES)
+        """
+        measures = MEASURES if measures is None else measures
+        masks = np.arange(1 << len(measures), dtype=np.int64)
+        bits = (masks[:, None] >> np.arange(len(measures))) & 1
+        saving = np.array([m[1] for m in measures], dtype=float)
+        cost = np.array([m[2] for m in measures], dtype=float)
+        return cls(masks, np.exp(bits @ np.log1p(-saving)), bits @ cost, measures)
+
+    @classmethod
+    def front(cls, measures=None):
+        """
+        returns the subsets of measures (default MEASURES) that no other subset
+        beats on both cost and heat demand left, pruning as each measure is added
+        """
+        measures = MEASURES if measures is None else measures
+        masks, factor, cost = np.zeros(1, dtype=np.int64), np.ones(1), np.zeros(1)
+        for i, (_, saving, measure_cost) in enumerate(measures):
+            masks = np.concatenate([masks, masks | (1 << i)])
+            factor = np.concatenate([factor, factor*(1 - saving)])
+            cost = np.concatenate([cost, cost + measure_cost])
+            keep = non_dominated(cost, factor)
+            masks, factor, cost = masks[keep], factor[keep], cost[keep]
+        return cls(masks, factor, cost, measures)
+
+    def names(self, mask):
+        """
+        returns list of the labels of the measures in the package with bitmask mask
+        """
+        return [lab for i, (lab, _, _) in enumerate(self.measures) if mask >> i & 1]
+
+
+def non_dominated(cost, value):
+    """
+    cost, value - 1d arrays, lower is better for both
+    returns bool array, True where no other entry is at least as good on both and
+    better on one (the first of equal entries is kept)
+    """
+    order = np.lexsort((value, cost))
+    best_before = np.minimum.accumulate(np.concatenate([[np.inf], value[order][:-1]]))
+    keep = np.zeros(len(cost), dtype=bool)
+    keep[order] = value[order] < best_before
+    return keep
+
+
+def annuity_factor(rate=DISCOUNT_RATE, years=LIFETIME_YEARS):
+    """
+    returns present value of £1 a year for years years at discount rate rate
+    """
+    return years if rate == 0 else (1 - (1 + rate)**-years)/rate
+
+
+def optimise(inputs, packages=None, case='Typical HP Install', rank='npv', heat_pump_cost=HEAT_PUMP_COST,
+             rate=DISCOUNT_RATE, years=LIFETIME_YEARS):
+    """
+    inputs - mapping of engine inputs, scalars or one value per household; an
+             efficiency_boost given is applied on top of each package
+    packages - Packages to evaluate, default Packages.front()
+    case - heat pump case installed with the package
+    rank - 'npv' (highest first) or 'payback' (shortest first)
+    heat_pump_cost - cost of the heat pump, added to each package (£)
+    rate, years - discount rate and lifetime of the NPV
+    returns dict of the packages and (n, packages) arrays: 'bill' and 'emissions'
+    (annual, after installing), 'saving' (on the current bill, £/year), 'payback'
+    (years, inf if never), 'npv' (£), 'pareto' (True where no cheaper package
+    has lower emissions for the home) and 'best' (n,) index of the top package
+    """
+    if rank not in RANKS:
+        raise ValueError(f'rank must be one of {", ".join(RANKS)}')
+    packages = Packages.front() if packages is None else packages
+    p = engine.prepare_inputs(inputs)
+    n = max((val.size for val in p.values() if val.ndim), default=1)
+
+    #efficiency_boost only scales the heat demand the heat pump meets, so the case's
+    #bill and emissions are linear in the demand left: evaluate each home with none
+    #and all of its demand left, in one engine call, and interpolate every package
+    base = np.broadcast_to(p['efficiency_boost'], n)
+    both = {name: np.tile(val, 2) if val.ndim else val for name, val in p.items()}
+    both['efficiency_boost'] = np.concatenate([np.ones(n), base])
+    results = engine.calculate(both)
+    current = results['Current']['costs_total'][n:]
+    res = results[case]
+    bill_none, bill_all = res['costs_total'][:n, None], res['costs_total'][n:, None]
+    emissions_none, emissions_all = res['emissions_total'][:n, None], res['emissions_total'][n:, None]
+    bill = bill_none + (bill_all - bill_none)*packages.factor
+    emissions = emissions_none + (emissions_all - emissions_none)*packages.factor
+
+    capital = heat_pump_cost + packages.cost
+    saving = current[:, None] - bill
+    with np.errstate(divide='ignore'):
+        payback = np.where(saving > 0, capital/np.where(saving > 0, saving, 1), np.inf)
+    npv = saving*annuity_factor(rate, years) - capital
+    #packages are in order of cost, so a package is on the home's front if it has
+    #lower emissions than every cheaper one
+    best_before = np.minimum.accumulate(np.concatenate([np.full((n, 1), np.inf), emissions[:, :-1]], axis=1), axis=1)
+    return {'packages': packages, 'bill': bill, 'emissions': emissions, 'saving': saving, 'payback': payback,
+            'npv': npv, 'pareto': emissions < best_before,
+            'best': np.argmax(npv, axis=1) if rank == 'npv' else np.argmin(payback, axis=1)}
+
+
+def top_packages(result, top_k=3, rank='npv'):
+    """
+    result - output of optimise
+    returns (n, top_k) index of the best packages for each home, best first
+    """
+    score = -result['npv'] if rank == 'npv' else result['payback']
+    top_k = min(top_k, score.shape[1])
+    idx = np.argpartition(score, top_k - 1, axis=1)[:, :top_k]
+    order = np.argsort(np.take_along_axis(score, idx, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(idx, order, axis=1)
+
+
+def package_columns(result, idx, home):
+    """
+    result - output of optimise
+    idx - (n, k) index of the packages to list for each home, e.g. top_packages
+    home - household label per row of result
+    returns dict of 1d arrays, one row per household and rank
+    """
+    packages = result['packages']
+    n, k = idx.shape
+    flat = idx.reshape(-1)
+    rows = np.repeat(np.arange(n), k)
+    return {'home': np.repeat(home, k), 'rank': np.tile(np.arange(1, k + 1), n),
+            'package': [' + '.join(packages.names(mask)) or 'Heat pump only' for mask in packages.masks[flat]],
+            'install_cost': packages.cost[flat],
+            **{name: result[name][rows, flat] for name in ('bill', 'saving', 'emissions', 'payback', 'npv', 'pareto')}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find the best efficiency measures to install with a heat pump.')
+    parser.add_argument('homes', help='CSV or Parquet file, one row per home')
+    parser.add_argument('output', help='CSV file of the best packages')
+    parser.add_argument('--rank', choices=RANKS, default='npv')
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--all', action='store_true', help='evaluate every package, not only the cost/demand front')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--id-column', help='column identifying each home')
+    args = parser.parse_args()
+
+    packages = Packages.all() if args.all else Packages.front()
+    start = 0
+    for chunk in read_chunks(args.homes, args.chunk_size, args.id_column):
+        n = max((np.size(val) for val in chunk.values()), default=0)
+        home = chunk[args.id_column] if args.id_column else np.arange(start, start + n)
+        result = optimise(engine_inputs(chunk), packages, rank=args.rank)
+        pd.DataFrame(package_columns(result, top_packages(result, args.top_k, args.rank), home)).to_csv(
+            args.output, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+        start += n
+    print(f'{start:,} homes x {len(packages):,} packages of {len(MEASURES)} measures', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
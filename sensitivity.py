@@ -0,0 +1,117 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Parameter sweeps, break-even points and tornado sensitivities for one household.
+#
+# A sweep evaluates every combination of a grid of input values and returns an
+# N-dimensional cube per output, one axis per swept input.  The cube is filled
+# a tile at a time, so the temporary arrays stay within a fixed size however
+# large the grid is.
+#
+#   cube = sweep({'gas_total_kWh': 15000},
+#                {'hp_heat_scop_typ': np.linspace(2, 5, 31), 'gas_unit': np.linspace(4, 12, 81)})
+#   cube[('Typical HP Install', 'saving')]  # shape (31, 81)
+
+import numpy as np
+
+import engine
+
+# outputs of a sweep, as (case, metric) - see engine.metric
+OUTPUTS = [('Typical HP Install', 'saving'), ('Hi-performance HP Install', 'saving')]
+# grid points evaluated at a time
+TILE_SIZE = 1 << 18
+
+
+def _check_household(household):
+    for name, val in household.items():
+        if np.size(val) != 1:
+            raise ValueError(f'{name}: sensitivities are for one household, give a single value')
+
+
+def sweep(household, grid, outputs=OUTPUTS, tile_size=TILE_SIZE):
+    """
+    household - mapping of engine inputs for one household (scalars)
+    grid - dict of engine input name: 1d array of values to evaluate, replacing
+           any value in household
+    outputs - list of (case, metric) to return
+    tile_size - grid points per engine call, which bounds the temporary memory used
+    returns dict of (case, metric): array with one axis per grid entry, in order
+    """
+    _check_household(household)
+    names = list(grid)
+    values = [np.asarray(grid[name]).reshape(-1) for name in names]
+    shape = tuple(len(val) for val in values)
+    cubes = {out: np.empty(shape) for out in outputs}
+    flat = {out: cube.reshape(-1) for out, cube in cubes.items()}
+
+    n = int(np.prod(shape))
+    for start in range(0, n, tile_size):
+        stop = min(start + tile_size, n)
+        coords = np.unravel_index(np.arange(start, stop), shape)
+        inputs = {name: val for name, val in household.items() if name not in grid}
+        inputs.update({name: val[idx] for name, val, idx in zip(names, values, coords)})
+        results = engine.calculate(inputs)
+        for case, name in outputs:
+            flat[(case, name)][start:stop] = engine.metric(results, case, name)
+    return cubes
+
+
+def break_even(household, name, low, high, case='Typical HP Install', n_points=1001):
+    """
+    household - mapping of engine inputs for one household
+    name - input to vary between low and high
+    case - heat pump case to compare with the current case
+    n_points - resolution of the search
+    returns values of name at which the bill saving of case is zero, in increasing
+    order: grid points where it is exactly zero, and crossings linearly
+    interpolated between grid points (empty if there are none)
+    """
+    values = np.linspace(low, high, n_points)
+    saving = sweep(household, {name: values}, [(case, 'saving')])[(case, 'saving')]
+    #grid points where it is exactly zero are roots themselves, only strict sign changes are interpolated
+    i = np.flatnonzero(saving[:-1]*saving[1:] < 0)
+    crossings = values[i] + (values[i+1] - values[i]) * saving[i] / (saving[i] - saving[i+1])
+    return np.sort(np.concatenate([values[saving == 0], crossings]))
+
+
+def tornado(household, ranges, case='Typical HP Install', metric='saving'):
+    """
+    household - mapping of engine inputs for the base case
+    ranges - dict of engine input name: (low, high), each varied one at a time
+    case, metric - output to compare, see engine.metric
+    returns dict with 'base' value of the output and 'bars', a list of
+    (name, output at low, output at high) sorted by decreasing swing
+    """
+    _check_household(household)
+    names = list(ranges)
+    n = 1 + 2*len(names)
+    #row 0 is the base case, then the low and high value of each input in turn
+    inputs = dict(household)
+    for i, name in enumerate(names):
+        base = household.get(name, engine.DEFAULTS[name])
+        col = np.full(n, base, dtype=float)
+        col[1 + 2*i:3 + 2*i] = ranges[name]
+        inputs[name] = col
+    out = engine.metric(engine.calculate(inputs), case, metric)
+
+    bars = [(name, float(out[1 + 2*i]), float(out[2 + 2*i])) for i, name in enumerate(names)]
+    bars.sort(key=lambda bar: -abs(bar[2] - bar[1]))
+    return {'base': float(out[0]), 'bars': bars}
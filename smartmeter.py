@@ -0,0 +1,279 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Calculator inputs from half-hourly smart meter readings.
+#
+#   python smartmeter.py ingest profiles/ --fuel elec elec_readings.csv [more.csv ...]
+#   python smartmeter.py ingest profiles/ --fuel gas gas_readings.csv
+#   python smartmeter.py derive profiles/ homes.csv --second-tariff-hours 7 --third-tariff-hours 0
+#
+# Readings files are CSVs with a 'meter' column identifying the home (the same
+# in the electricity and gas files), 'time' (the start of the half hour, local
+# clock time) and 'kWh'.  They are read a block at a time (with pyarrow's
+# streaming CSV reader if it is installed, otherwise pandas) and each block is
+# summed straight into a profile of every meter: kWh and number of readings by
+# month and half hour of the day.  So memory depends on the number of meters,
+# not of readings, and the raw files are only parsed once.
+#
+# Profiles are saved as .npy arrays (one directory per fuel), and derive turns
+# them into batch.py inputs: annual totals, the fractions of electricity in the
+# off-peak and peak windows of a tariff and, from the summer gas baseload, hot
+# water (as hw_lday) and cooking.  Changing the tariff windows only re-runs derive.
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+import engine
+import hourly
+
+PROFILE_VERSION = 1
+FUELS = ['elec', 'gas']
+SLOTS = 48
+MONTHS = 12
+MONTH_DAYS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+#months whose gas use is taken as hot water and cooking only (June to August)
+SUMMER_MONTHS = [5, 6, 7]
+#bytes of CSV parsed at a time
+READ_BLOCK_BYTES = 1 << 24
+READ_BLOCK_ROWS = 1 << 20
+
+
+class Profile:
+    """
+    kWh and number of readings of each meter by month and half hour of the day,
+    kWh[meter, month, slot] and count[meter, month, slot]
+    """
+
+    def __init__(self, meters=(), kWh=None, count=None):
+        self.meters = list(meters)
+        self._code = {meter: i for i, meter in enumerate(self.meters)}
+        shape = (len(self.meters), MONTHS, SLOTS)
+        self.kWh = np.zeros(shape) if kWh is None else kWh
+        self.count = np.zeros(shape, dtype=np.int32) if count is None else count
+
+    def __len__(self):
+        return len(self.meters)
+
+    def _codes(self, meters):
+        codes = np.empty(len(meters), dtype=np.intp)
+        for i, meter in enumerate(meters):
+            code = self._code.get(meter)
+            if code is None:
+                code = self._code[meter] = len(self.meters)
+                self.meters.append(meter)
+            codes[i] = code
+        if len(self.meters) > len(self.kWh):
+            #grow by doubling, so adding meters one block at a time stays linear
+            size = max(len(self.meters), 2*len(self.kWh))
+            self.kWh = np.concatenate([self.kWh, np.zeros((size - len(self.kWh), MONTHS, SLOTS))])
+            self.count = np.concatenate([self.count, np.zeros((size - len(self.count), MONTHS, SLOTS), dtype=np.int32)])
+        return codes
+
+    def add(self, meter_index, meters, time, kWh):
+        """
+        meter_index - code of each reading's meter into meters
+        meters - meter ids of this block
+        time - datetime64 start of each reading
+        kWh - consumption of each reading, NaN if missing
+        """
+        codes = self._codes(meters)
+        ok = ~np.isnan(kWh)
+        seconds = time.astype('datetime64[s]').astype(np.int64)
+        month = time.astype('datetime64[M]').astype(np.int64) % MONTHS
+        slot = seconds % 86400 // (86400 // SLOTS)
+        idx = ((meter_index*MONTHS + month)*SLOTS + slot)[ok]
+        size = len(meters)*MONTHS*SLOTS
+        self.kWh[codes] += np.bincount(idx, weights=kWh[ok], minlength=size).reshape(-1, MONTHS, SLOTS)
+        self.count[codes] += np.bincount(idx, minlength=size).reshape(-1, MONTHS, SLOTS).astype(np.int32)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        n = len(self.meters)
+        np.save(os.path.join(path, 'kWh.npy'), self.kWh[:n])
+        np.save(os.path.join(path, 'count.npy'), self.count[:n])
+        with open(os.path.join(path, 'meters.json'), 'w') as f:
+            json.dump({'version': PROFILE_VERSION, 'meters': self.meters}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'meters.json')) as f:
+            index = json.load(f)
+        if index['version'] != PROFILE_VERSION:
+            raise ValueError(f'{path} is a version {index["version"]} profile, expected {PROFILE_VERSION}')
+        return cls(index['meters'], np.load(os.path.join(path, 'kWh.npy'), mmap_mode='r'),
+                   np.load(os.path.join(path, 'count.npy'), mmap_mode='r'))
+
+    def annual_by_slot(self):
+        """
+        returns (meters, 12, 48) kWh over a year: the mean reading of each month and
+        slot times the days of the month, NaN where a month and slot has no readings
+        """
+        kWh, count = self.kWh[:len(self)], self.count[:len(self)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(count > 0, kWh/count, np.nan) * MONTH_DAYS[:, None]
+
+    def coverage(self):
+        """
+        returns fraction of the month and slot combinations of each meter with readings
+        """
+        return (self.count[:len(self)] > 0).mean(axis=(1, 2))
+
+
+def read_readings(path, block_bytes=READ_BLOCK_BYTES):
+    """
+    path - CSV of 'meter', 'time' and 'kWh' columns
+    yields (meter index, meter ids, datetime64 times, kWh) for each block of rows
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+    except ImportError:
+        pa = None
+
+    if pa is not None:
+        reader = pacsv.open_csv(path, read_options=pacsv.ReadOptions(block_size=block_bytes),
+                                convert_options=pacsv.ConvertOptions(
+                                    include_columns=['meter', 'time', 'kWh'],
+                                    column_types={'meter': pa.dictionary(pa.int32(), pa.string()),
+                                                  'time': pa.timestamp('s'), 'kWh': pa.float64()}))
+        for batch in reader:
+            #meter is parsed straight to codes into the block's own dictionary of ids
+            meter = batch.column('meter')
+            yield (meter.indices.to_numpy(zero_copy_only=False).astype(np.intp), meter.dictionary.to_pylist(),
+                   batch.column('time').to_numpy(zero_copy_only=False),
+                   batch.column('kWh').to_numpy(zero_copy_only=False))
+    else:
+        import pandas as pd
+
+        for df in pd.read_csv(path, usecols=['meter', 'time', 'kWh'], dtype={'meter': str},
+                              chunksize=READ_BLOCK_ROWS):
+            index, meters = pd.factorize(df['meter'])
+            yield (index.astype(np.intp), list(meters), pd.to_datetime(df['time']).to_numpy(),
+                   df['kWh'].to_numpy(dtype=float))
+
+
+def ingest(paths, profile=None):
+    """
+    paths - readings CSVs of one fuel
+    profile - Profile to add them to, default a new one
+    returns the Profile
+    """
+    profile = Profile() if profile is None else profile
+    for path in paths:
+        for block in read_readings(path):
+            profile.add(*block)
+    return profile
+
+
+def derive(elec, gas=None, second_tariff_hours=engine.DEFAULTS['second_tariff_hours'],
+           third_tariff_hours=engine.DEFAULTS['third_tariff_hours'], cook_gas=False,
+           hw_temp_raise=engine.hw_temp_raise_default, boiler_hw_eff=engine.boiler_hw_eff):
+    """
+    elec, gas - Profile of electricity and (optionally) gas readings
+    second_tariff_hours - hours of the off-peak window, ending at hourly.OFFPEAK_END_HOUR
+    third_tariff_hours - hours of the peak window, from hourly.PEAK_START_HOUR
+    cook_gas - whether the homes cook with gas, taking the page's default weekly use
+               (at most half the summer baseload) out of the baseload
+    hw_temp_raise, boiler_hw_eff - to turn hot water gas into litres a day, as engine.split_demand
+    returns dict of columns, one row per electricity meter: 'meter', the engine inputs
+    elec_total_kWh, pc_elec_second_tariff, pc_elec_third_tariff, gas_total_kWh,
+    is_hw_gas, hw_lday, is_cook_gas and gas_cook_kWhweek, and the 'elec_coverage'
+    and 'gas_coverage' of the readings (NaN totals where a month and slot has none)
+    """
+    by_slot = elec.annual_by_slot().sum(axis=1)
+    elec_total = by_slot.sum(axis=-1)
+    offpeak = hourly.window_weights(hourly.OFFPEAK_END_HOUR - second_tariff_hours, second_tariff_hours, SLOTS)[0]
+    peak = np.minimum(hourly.window_weights(hourly.PEAK_START_HOUR, third_tariff_hours, SLOTS)[0], 1 - offpeak)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns = {'meter': np.array(elec.meters, dtype=object), 'elec_total_kWh': elec_total,
+                   'pc_elec_second_tariff': by_slot @ offpeak / elec_total,
+                   'pc_elec_third_tariff': by_slot @ peak / elec_total,
+                   'elec_coverage': elec.coverage()}
+
+    n = len(elec)
+    gas_total, baseload, gas_coverage = np.zeros(n), np.zeros(n), np.zeros(n)
+    if gas is not None:
+        #gas meters lined up with the electricity ones, homes without gas readings use none
+        row = {meter: i for i, meter in enumerate(gas.meters)}
+        found = np.array([meter in row for meter in elec.meters], dtype=bool)
+        rows = np.array([row[meter] for meter in elec.meters if meter in row], dtype=np.intp)
+        gas_by_month = gas.annual_by_slot().sum(axis=-1)[rows]
+        gas_total[found] = gas_by_month.sum(axis=-1)
+        #the least gas a day of the summer months is hot water and cooking, with no heating
+        baseload[found] = np.nanmin(gas_by_month[:, SUMMER_MONTHS]/MONTH_DAYS[SUMMER_MONTHS], axis=-1) * 365
+        gas_coverage[found] = gas.coverage()[rows]
+
+    cook = np.minimum(engine.DEFAULTS['gas_cook_kWhweek']*52, baseload/2) if cook_gas else np.zeros(n)
+    gas_hw_kWhperL = 4200*hw_temp_raise/(3600*1000*boiler_hw_eff)
+    is_hw_gas = baseload - cook > 0
+    columns.update({'gas_total_kWh': gas_total, 'is_hw_gas': is_hw_gas,
+                    'hw_lday': np.where(is_hw_gas, (baseload - cook)/(365*gas_hw_kWhperL), engine.DEFAULTS['hw_lday']),
+                    'is_cook_gas': cook > 0, 'gas_cook_kWhweek': np.where(cook > 0, cook/52,
+                                                                          engine.DEFAULTS['gas_cook_kWhweek']),
+                    'gas_coverage': gas_coverage})
+    return columns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Derive calculator inputs from half-hourly smart meter readings.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    ing = commands.add_parser('ingest', help='add readings CSVs to the profiles of one fuel')
+    ing.add_argument('profiles', help='directory of profiles, with a subdirectory per fuel')
+    ing.add_argument('readings', nargs='+', help="CSVs with 'meter', 'time' and 'kWh' columns")
+    ing.add_argument('--fuel', choices=FUELS, required=True)
+    ing.add_argument('--append', action='store_true', help='add to the saved profiles instead of replacing them')
+    der = commands.add_parser('derive', help='write batch.py inputs from the profiles')
+    der.add_argument('profiles', help='directory of profiles')
+    der.add_argument('output', help='CSV of inputs, one row per electricity meter')
+    der.add_argument('--second-tariff-hours', type=float, default=engine.DEFAULTS['second_tariff_hours'])
+    der.add_argument('--third-tariff-hours', type=float, default=engine.DEFAULTS['third_tariff_hours'])
+    der.add_argument('--cook-gas', action='store_true', help='homes cook with gas')
+    args = parser.parse_args(argv)
+
+    if args.command == 'ingest':
+        path = os.path.join(args.profiles, args.fuel)
+        profile = Profile.load(path) if args.append and os.path.exists(path) else None
+        if profile is not None:
+            #loaded memory-mapped and read-only, copied so readings can be added
+            profile = Profile(profile.meters, np.array(profile.kWh), np.array(profile.count))
+        profile = ingest(args.readings, profile)
+        profile.save(path)
+        print(f'{len(profile):,} {args.fuel} meters in {path}', file=sys.stderr)
+    else:
+        import pandas as pd
+
+        gas_path = os.path.join(args.profiles, 'gas')
+        columns = derive(Profile.load(os.path.join(args.profiles, 'elec')),
+                         Profile.load(gas_path) if os.path.exists(gas_path) else None,
+                         args.second_tariff_hours, args.third_tariff_hours, args.cook_gas)
+        columns['n_tariff_states'] = np.where(args.third_tariff_hours > 0, 3, 2 if args.second_tariff_hours > 0 else 1)
+        columns['second_tariff_hours'] = args.second_tariff_hours
+        columns['third_tariff_hours'] = args.third_tariff_hours
+        pd.DataFrame(columns).to_csv(args.output, index=False)
+        print(f'{len(columns["meter"]):,} homes', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Time-of-use electricity tariffs.  A Tariff is a vector of unit rates over the
+# day (24 or 48 slots) or over the year (8760 or 17520 slots, e.g. agile prices)
+# plus a standing charge.  Compiling it gives the rates in £/kWh with the annual
+# standing charge appended, and each end use (ENERGY_BREAKDOWNS) has a load shape
+# over the same slots, so the cost of an end use is a dot product and the annual
+# electricity bills of a whole portfolio against any number of tariffs are one
+# matrix multiply.  Compiled tariffs are cached and shared between callers.
+
+import hashlib
+
+import numpy as np
+
+import engine
+import hourly
+from cache import LRUCache
+
+#slots per day or per year a rate vector or load shape can have
+RESOLUTIONS = (24, 48, 8760, 17520)
+COMPILED_CACHE_SIZE = 64
+#hours a day the heat pump is off when switched off at peak times: the most expensive
+#hours of each day, as long as they cost more than the day's median rate
+PEAK_OFF_HOURS = engine.cosy_third_tariff_hours
+
+#typical time of day of each end use, by hour, used when no load shape is given
+_HOURLY_USE = {
+    'Heating': [0.6]*6 + [1.5]*3 + [0.9]*7 + [1.4]*6 + [0.6]*2,
+    'Hot water': [0.2]*6 + [2.5]*3 + [0.6]*8 + [1.6]*5 + [0.4]*2,
+    'Cooking': [0]*7 + [1]*2 + [0.3]*3 + [1]*2 + [0.3]*3 + [3]*3 + [0.5]*2 + [0]*2,
+    'EV': [1]*5 + [0]*13 + [0.2]*6,
+    'Other Elec.': [0.5]*6 + [1]*3 + [0.8]*7 + [1.6]*5 + [0.9]*3,
+}
+LOAD_SHAPES = {name: np.array(use)/sum(use) for name, use in _HOURLY_USE.items()}
+
+
+def resample(values, slots, is_share=False):
+    """
+    values - 1d array over 24 or 48 slots of a day, or 8760 or 17520 slots of a year
+    slots - resolution wanted, one of RESOLUTIONS
+    is_share - values are shares of a total (load shapes) rather than rates
+    returns 1d array over slots.  Rates are repeated or averaged, shares are split or
+    summed; a year converted to a day is the average day
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) not in RESOLUTIONS or slots not in RESOLUTIONS:
+        raise ValueError(f'resolution must be one of {RESOLUTIONS}, not {len(values)} and {slots}')
+    days_have = 1 if len(values) < 8760 else hourly.DAYS_PER_YEAR
+    days_want = 1 if slots < 8760 else hourly.DAYS_PER_YEAR
+
+    #change the number of slots in a day
+    have, want = len(values) // days_have, slots // days_want
+    if want > have:
+        values = np.repeat(values, want // have)
+        if is_share:
+            values = values / (want // have)
+    elif want < have:
+        values = values.reshape(-1, have // want)
+        values = values.sum(axis=1) if is_share else values.mean(axis=1)
+
+    #change between a day and a year
+    if days_want > days_have:
+        values = np.tile(values, days_want)
+        if is_share:
+            values = values / days_want
+    elif days_want < days_have:
+        values = values.reshape(days_have, -1)
+        values = values.sum(axis=0) if is_share else values.mean(axis=0)
+    return values
+
+
+class Tariff:
+    """
+    Unit rates (p/kWh) over the slots of a day or a year and a standing charge (p/day)
+    """
+
+    def __init__(self, rates, standing, name=''):
+        rates = np.array(rates, dtype=float)
+        if rates.ndim != 1 or len(rates) not in RESOLUTIONS:
+            raise ValueError(f'rates must have one of {RESOLUTIONS} slots')
+        rates.flags.writeable = False
+        self.rates = rates
+        self.standing = float(standing)
+        self.name = name
+        self.key = hashlib.sha256(rates.tobytes() + repr(self.standing).encode()).hexdigest()
+
+    def __repr__(self):
+        return f'Tariff({self.name!r}, {len(self.rates)} slots, standing {self.standing})'
+
+    @classmethod
+    def flat(cls, unit, standing, name='Flat'):
+        return cls(np.full(48, unit), standing, name)
+
+    @classmethod
+    def time_of_use(cls, unit, standing, windows, name=''):
+        """
+        unit - rate outside the windows
+        windows - list of (start hour, length in hours, rate), later windows take
+                  precedence where they overlap
+        """
+        rates = np.full(48, float(unit))
+        for start, hours, rate in windows:
+            weight = hourly.window_weights(start, hours, 48)[0]
+            rates = (1 - weight)*rates + weight*rate
+        return cls(rates, standing, name)
+
+    @classmethod
+    def from_inputs(cls, inputs, name=''):
+        """
+        inputs - engine inputs of one household
+        returns the tariff of its heat pump scenarios (its own 1, 2 or 3 rate tariff, or
+        the cosy tariff if switching), with the windows placed as in hourly
+        """
+        p = engine.prepare_inputs(inputs)
+        t = engine.heat_pump_tariff(p)
+        second_hours, third_hours = float(t['second_tariff_hours']), float(t['third_tariff_hours'])
+        windows = []
+        if t['is_multi_rate']:
+            windows.append((hourly.OFFPEAK_END_HOUR - second_hours, second_hours, float(t['elec_unit2'])))
+        if t['is_three_rate']:
+            windows.append((hourly.PEAK_START_HOUR, third_hours, float(t['elec_unit3'])))
+        return cls.time_of_use(float(t['elec_unit']), float(p['elec_stand']), windows, name)
+
+    def compile(self, slots=None):
+        """
+        slots - resolution to compile to, default the tariff's own
+        returns the CompiledTariff, from the shared cache if already compiled
+        """
+        slots = slots or len(self.rates)
+        return _compiled.get_or_compute((self.key, slots), lambda: CompiledTariff(self, slots))
+
+
+class CompiledTariff:
+    """
+    A tariff as a vector of slots rates in £/kWh followed by the annual standing charge in £
+    """
+
+    def __init__(self, tariff, slots):
+        self.name = tariff.name
+        self.slots = slots
+        vector = np.append(resample(tariff.rates, slots)/100, tariff.standing*3.65)
+        vector.flags.writeable = False
+        self.vector = vector
+        self._default_rates = {}
+
+    @property
+    def rates(self):
+        return self.vector[:-1]
+
+    @property
+    def standing_total(self):
+        return self.vector[-1]
+
+    def peak_slots(self, hours=PEAK_OFF_HOURS):
+        """
+        hours - hours a day to avoid
+        returns bool array over slots of the most expensive hours of each day, only
+        counting slots dearer than that day's median rate
+        """
+        days = 1 if self.slots < 8760 else hourly.DAYS_PER_YEAR
+        daily = self.rates.reshape(days, -1)
+        n_off = int(round(hours*daily.shape[1]/24))
+        mask = np.zeros(daily.shape, dtype=bool)
+        np.put_along_axis(mask, np.argsort(-daily, axis=1, kind='stable')[:, :n_off], True, axis=1)
+        return (mask & (daily > np.median(daily, axis=1, keepdims=True))).reshape(-1)
+
+    def component_rates(self, shapes=None, peak_off=False):
+        """
+        shapes - dict of end use (ENERGY_BREAKDOWNS) to load shape replacing LOAD_SHAPES
+        peak_off - the heat pump is off in peak_slots(), its heating moved to the other
+                   hours of the same day
+        returns 1d array of the average £/kWh of each end use, then the annual standing
+        charge, so [kWh by end use, 1] @ component_rates() is the annual bill
+        """
+        if not shapes and peak_off in self._default_rates:
+            return self._default_rates[peak_off]
+        rows = load_shapes(shapes, self.slots)
+        if peak_off:
+            rows[0] = shift_out_of(rows[0], self.peak_slots())
+        rates = np.append(rows @ self.rates, self.standing_total)
+        if not shapes:
+            self._default_rates[peak_off] = rates
+        return rates
+
+    def hp_tariff(self, shapes=None, peak_off=None):
+        """
+        shapes - as component_rates
+        peak_off - whether the heat pump is off at peak times, as component_rates; None
+                   for both, each value a (running through, off at peak) pair that
+                   engine.apply_hp_tariff picks from for each home
+        returns dict of the unit rates (p/kWh) and standing charge (£) for engine.calculate's
+        hp_tariff, so the heat pump cases are costed on this tariff
+        """
+        if peak_off is None:
+            through, off = self.hp_tariff(shapes, False), self.hp_tariff(shapes, True)
+            return {key: (through[key], off[key]) for key in through}
+        rates = self.component_rates(shapes, peak_off)
+        return {'elec_unit_heat': 100*rates[0], 'elec_unit_hw': 100*rates[1], 'elec_unit_cook': 100*rates[2],
+                'elec_unit_ev': 100*rates[3], 'elec_unit_eff': 100*rates[4], 'elec_stand_total': rates[5]}
+
+
+_compiled = LRUCache(COMPILED_CACHE_SIZE)
+
+
+def load_shapes(shapes, slots):
+    """
+    shapes - dict of end use to load shape replacing LOAD_SHAPES, or None
+    slots - resolution wanted
+    returns (len(ENERGY_BREAKDOWNS), slots) array, each row summing to one over the
+    year (slots of a year) or the day (slots of a day)
+    """
+    shapes = dict(LOAD_SHAPES, **(shapes or {}))
+    rows = np.stack([resample(shapes[name], slots, is_share=True) for name in engine.ENERGY_BREAKDOWNS])
+    return rows / rows.sum(axis=1, keepdims=True)
+
+
+def shift_out_of(shape, mask):
+    """
+    shape - load shape over the slots of a day or a year
+    mask - bool array over the same slots when there is no load
+    returns load shape with the load in masked slots moved pro rata to the other
+    slots of the same day
+    """
+    days = 1 if len(shape) < 8760 else hourly.DAYS_PER_YEAR
+    daily, mask = shape.reshape(days, -1), mask.reshape(days, -1)
+    kept = np.where(mask, 0, daily)
+    kept_total = kept.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(kept_total > 0, daily.sum(axis=1, keepdims=True)/kept_total, 1)
+    return (kept*scale).reshape(-1)
+
+
+def annual_costs(elec_energy, tariffs, shapes=None):
+    """
+    elec_energy - (len(ENERGY_BREAKDOWNS), n) electricity kWh by end use, e.g. a case's
+                  'elec_energy' from engine.calculate
+    tariffs - list of Tariff
+    shapes - dict of end use to load shape replacing LOAD_SHAPES
+    returns (n, len(tariffs)) annual electricity bill in £ on each tariff, standing
+    charges included
+    """
+    slots = max([len(t.rates) for t in tariffs] + [len(np.asarray(s)) for s in (shapes or {}).values()])
+    rates = np.column_stack([t.compile(slots).component_rates(shapes) for t in tariffs])
+    elec_energy = np.asarray(elec_energy)
+    return np.vstack([elec_energy, np.ones((1, elec_energy.shape[1]))]).T @ rates
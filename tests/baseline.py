@@ -0,0 +1,310 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# The results calculation of the original page (main.py before engine.py), one
+# household at a time, kept as the reference the engine is checked against.  It
+# is the page's code with its inputs passed in as arguments and the rows that
+# the page drops for display (no EV, no gas cooking) left in.
+
+import numpy as np
+
+import engine
+from api import INPUT_RANGES
+
+#constants of the page
+immersion_hw_eff = 1
+GAS_kgCO2perkWh = 0.21
+ELEC_RENEW_kgCO2perkWh = 0
+ELEC_AVE_kgCO2perkWh = 0.136
+pc_other_elec_cosy_offpeak = 0.2
+pc_other_elec_cosy_peak = 0.2
+cosy_offpeak_heat_demand_reduction = 1
+SECOND_HEATSOURCE_TYPES = ['gas', 'electric', 'other (not included in energy consumption calculations below)']
+
+
+def page_results(elec_total_kWh, gas_total_kWh, is_elec_renewable, is_hw_gas, hw_lday, is_cook_gas,
+                 gas_cook_kWhweek, elec_ev_kWh, is_second_heatsource, second_heatsource_type,
+                 is_second_heatsource_remains, second_heatsource_kWh, is_free_summer_hw, efficiency_boost,
+                 switch_tariff_for_hp, turn_off_hp_in_peak_hours, is_disconnect_gas, n_tariff_states,
+                 gas_stand, gas_unit, elec_stand, elec_unit, elec_unit2, elec_unit3, second_tariff_hours,
+                 third_tariff_hours, pc_elec_second_tariff, pc_elec_third_tariff, elec_unit_cosy_standard,
+                 elec_unit_cosy_offpeak, elec_unit_cosy_peak, cosy_second_tariff_hours, cosy_third_tariff_hours,
+                 boiler_heat_eff, boiler_hw_eff, hp_heat_scop_typ, hp_hw_cop_typ, hp_heat_scop_hi, hp_hw_cop_hi,
+                 hw_temp_raise):
+    """
+    arguments - the engine inputs (engine.DEFAULTS) for one household, with
+                second_heatsource_type as its integer code
+    returns dict of case name: (energy_usage, costs_by_type, energy_total,
+    emissions_total, costs_total) as the page builds them
+    """
+    second_heatsource_type = SECOND_HEATSOURCE_TYPES[second_heatsource_type]
+    offpeak_heat_demand_reduction = 2/3
+
+    #calculate hot water kWh/L
+    GAS_HW_kWhperL = 4200 * hw_temp_raise/(3600 * 1000 * boiler_hw_eff)
+    IMMERSION_HW_kWhperL = 4200 * hw_temp_raise/(3600 * 1000 * immersion_hw_eff)
+
+    #_____________first do the current case____________________
+    if n_tariff_states == 3:
+        elec_unit_eff = (pc_elec_third_tariff*elec_unit3) + (pc_elec_second_tariff*elec_unit2) + (1 - pc_elec_second_tariff - pc_elec_third_tariff)*elec_unit
+        elec_unit_ev = elec_unit2
+    if n_tariff_states == 2:
+        elec_unit_eff = (pc_elec_second_tariff*elec_unit2) + (1 - pc_elec_second_tariff)*elec_unit
+        elec_unit_ev = elec_unit2
+    else:
+        elec_unit_eff = elec_unit
+        elec_unit_ev = elec_unit
+
+    elec_other_kWh = max(elec_total_kWh - elec_ev_kWh, 0)
+    elec_ev_kWh = elec_total_kWh - elec_other_kWh
+
+    costs_by_type = [['Current', 'Gas standing', gas_stand*3.65],
+                    ['Current', 'Gas unit',  gas_total_kWh * gas_unit/100],
+                    ['Current', 'Elec.  standing', elec_stand*3.65],
+                    ['Current', 'Elec.  unit', (elec_other_kWh * elec_unit_eff + elec_ev_kWh * elec_unit_ev)/100]]
+
+    costs_total = (gas_stand + elec_stand)*3.65 + gas_total_kWh * gas_unit/100 + elec_other_kWh * elec_unit_eff/100 + elec_ev_kWh * elec_unit_ev/100
+
+    # hot water energy demand
+    if is_hw_gas:
+        gas_hw_kWh = hw_lday * 365 * GAS_HW_kWhperL
+        elec_hw_kWh = 0
+    else:
+        gas_hw_kWh = 0
+        elec_hw_kWh = hw_lday * 365 * IMMERSION_HW_kWhperL
+
+    #cooking demand - only done if gas
+    if is_cook_gas:
+        gas_cook_kWh = gas_cook_kWhweek * 52
+    else:
+        gas_cook_kWh = 0
+
+    #gas heating is remainder after hot water and cooking removed
+    gas_heat_kWh = gas_total_kWh - gas_hw_kWh - gas_cook_kWh
+
+    #see if there's any electric heating in addition:
+    if is_second_heatsource:
+        if second_heatsource_type=='electric':
+            elec_heat_kWh = second_heatsource_kWh
+        else:
+            elec_heat_kWh = 0
+    else:
+        elec_heat_kWh = 0
+
+    #electric other is remainder after heating and hw removed
+    elec_other_kWh = elec_other_kWh-elec_heat_kWh-elec_hw_kWh
+
+    #if other electricity is now negative, assume user has overestimated either
+    # their electric hw usage or electric heating - whichever the greater.
+    #reduce to bring other electricity to zero.
+    if elec_other_kWh < 0:
+        if elec_hw_kWh > elec_heat_kWh:
+            elec_hw_kWh += elec_other_kWh
+        else:
+            elec_heat_kWh += elec_other_kWh
+
+        elec_other_kWh = 0
+
+    #select carbon intensity of electricity
+    if is_elec_renewable:
+        elec_kgCO2perkWh = ELEC_RENEW_kgCO2perkWh
+    else:
+        elec_kgCO2perkWh = ELEC_AVE_kgCO2perkWh
+
+    #current energy usage table
+    energy_usage = [['Current', 'Heating', gas_heat_kWh+elec_heat_kWh, gas_heat_kWh*GAS_kgCO2perkWh+elec_heat_kWh*elec_kgCO2perkWh],
+                ['Current', 'Hot water', gas_hw_kWh+elec_hw_kWh, gas_hw_kWh*GAS_kgCO2perkWh + elec_hw_kWh*elec_kgCO2perkWh],
+                ['Current', 'Cooking', gas_cook_kWh, gas_cook_kWh*GAS_kgCO2perkWh],
+                ['Current', 'EV', elec_ev_kWh, elec_ev_kWh*elec_kgCO2perkWh],
+                ['Current', 'Other Elec.', elec_other_kWh, elec_other_kWh*elec_kgCO2perkWh]]
+
+    energy_total = gas_total_kWh + elec_total_kWh
+    emissions_total = sum([gas_heat_kWh*GAS_kgCO2perkWh, gas_hw_kWh*GAS_kgCO2perkWh, gas_cook_kWh*GAS_kgCO2perkWh, elec_total_kWh*elec_kgCO2perkWh])
+    results = {'Current': (energy_usage, costs_by_type, energy_total, emissions_total, costs_total)}
+
+    #___________now do the future/heat pump case_____________
+
+    def do_heat_pump_case(install_type, gas_heat_kWh, elec_heat_kWh, gas_hw_kWh, elec_hw_kWh, gas_cook_kWh):
+        """
+        install type either 'Typical' or 'Hi-performance'
+        """
+
+        #set heat pump performance coefficients to hi or typical:
+        if install_type == 'Hi-performance':
+            hp_heat_scop = hp_heat_scop_hi
+            hp_hw_cop = hp_hw_cop_hi
+        else:
+            hp_heat_scop = hp_heat_scop_typ
+            hp_hw_cop = hp_hw_cop_typ
+
+        #calculate future heating energy - dependent upon second heat source (if any)
+        if not is_second_heatsource:
+            elec_heat_kWh = (1 - efficiency_boost) * gas_heat_kWh * boiler_heat_eff/hp_heat_scop
+            gas_heat_kWh = 0
+        else:
+            if is_second_heatsource_remains:
+                if second_heatsource_type=='gas':
+                    elec_heat_kWh = (1 - efficiency_boost) * (gas_heat_kWh - second_heatsource_kWh) * boiler_heat_eff/hp_heat_scop
+                    gas_heat_kWh = second_heatsource_kWh
+                elif second_heatsource_type=='electric':
+                    elec_heat_kWh = second_heatsource_kWh + (1 - efficiency_boost) * gas_heat_kWh * boiler_heat_eff/hp_heat_scop
+                    gas_heat_kWh = 0
+            else:
+                if second_heatsource_type=='electric':
+                    elec_heat_kWh = (1 - efficiency_boost) * (gas_heat_kWh * boiler_heat_eff + second_heatsource_kWh)/hp_heat_scop
+                    gas_heat_kWh = 0
+                elif second_heatsource_type=='gas': #same as the no second heatsource case, as we assume same efficiency as boiler
+                    elec_heat_kWh = (1 - efficiency_boost) * gas_heat_kWh * boiler_heat_eff/hp_heat_scop
+                    gas_heat_kWh = 0
+                else:#other second heatsource, assume gas boiler efficiency, but not included in gas_heat_kWh
+                    elec_heat_kWh = (1 - efficiency_boost) * (gas_heat_kWh + second_heatsource_kWh) * boiler_heat_eff/hp_heat_scop
+                    gas_heat_kWh = 0
+
+        #hot water
+        if is_hw_gas:
+            elec_hw_kWh = gas_hw_kWh * boiler_heat_eff/hp_hw_cop
+        else:
+            elec_hw_kWh = elec_hw_kWh * immersion_hw_eff/hp_hw_cop
+
+        #gas cooking energy
+        if is_cook_gas:
+            if is_disconnect_gas:
+                emissions_cook = gas_cook_kWh * elec_kgCO2perkWh
+                elec_cook_kWh = gas_cook_kWh
+                gas_cook_kWh = 0
+            else:
+                emissions_cook = gas_cook_kWh * GAS_kgCO2perkWh
+                elec_cook_kWh = 0
+        else:
+            emissions_cook = 0
+            gas_cook_kWh = 0 #redundant, for clarity
+            elec_cook_kWh = 0
+
+        #totals
+        elec_total_kWh = elec_other_kWh + elec_heat_kWh + elec_hw_kWh + elec_cook_kWh + elec_ev_kWh
+        gas_total_kWh = gas_heat_kWh + gas_cook_kWh
+
+        #new energy consumption and emissions table
+        case_name = install_type + ' HP Install'
+        energy_usage = [[case_name, 'Heating', gas_heat_kWh+elec_heat_kWh, gas_heat_kWh*GAS_kgCO2perkWh+elec_heat_kWh*elec_kgCO2perkWh],
+                    [case_name, 'Hot water', elec_hw_kWh, elec_hw_kWh*elec_kgCO2perkWh],
+                    [case_name, 'Cooking', gas_cook_kWh+elec_cook_kWh, emissions_cook],
+                    [case_name, 'EV', elec_ev_kWh, elec_ev_kWh*elec_kgCO2perkWh],
+                    [case_name, 'Other Elec.', elec_other_kWh, elec_other_kWh*elec_kgCO2perkWh]]
+
+        energy_total = elec_heat_kWh + elec_hw_kWh + elec_cook_kWh + elec_ev_kWh + elec_other_kWh + gas_heat_kWh + gas_cook_kWh
+        emissions_total = sum([elec_heat_kWh*elec_kgCO2perkWh, gas_heat_kWh*GAS_kgCO2perkWh, elec_hw_kWh*elec_kgCO2perkWh, emissions_cook, elec_ev_kWh*elec_kgCO2perkWh, elec_other_kWh*elec_kgCO2perkWh])
+
+        #update costs
+
+        #don't include gas standing charge if disconnecting from gas
+        if is_disconnect_gas:
+            gas_stand_total = 0
+        else:
+            gas_stand_total = gas_stand*3.65
+
+        if n_tariff_states == 2:
+            #this pc of heating in second tariff
+            pc_heat_second_tariff = offpeak_heat_demand_reduction*second_tariff_hours/(24 - (1-offpeak_heat_demand_reduction)*second_tariff_hours)
+
+            if is_free_summer_hw: #those with solar panels can get free hot water for 4 months
+                elec_unit_total_cost = elec_heat_kWh * (pc_heat_second_tariff*elec_unit2 + (1-pc_heat_second_tariff)*elec_unit) + \
+                    elec_hw_kWh*(2/3)*elec_unit2 + elec_cook_kWh*elec_unit + elec_ev_kWh*elec_unit_ev + elec_other_kWh*elec_unit_eff
+            else:
+                elec_unit_total_cost = elec_heat_kWh * (pc_heat_second_tariff*elec_unit2 + (1-pc_heat_second_tariff)*elec_unit) + \
+                    elec_hw_kWh*elec_unit2 + elec_cook_kWh*elec_unit + elec_ev_kWh*elec_unit_ev + elec_other_kWh*elec_unit_eff
+            elec_unit_total_cost /= 100
+
+        elif n_tariff_states == 3:
+            #this pc of heating in second tariff
+            if turn_off_hp_in_peak_hours:
+                pc_heat_second_tariff = offpeak_heat_demand_reduction*second_tariff_hours/(24 - third_tariff_hours - (1-offpeak_heat_demand_reduction)*second_tariff_hours)
+                pc_heat_third_tariff = 0
+            else:
+                pc_heat_second_tariff = offpeak_heat_demand_reduction*second_tariff_hours/(24 - (1-offpeak_heat_demand_reduction)*second_tariff_hours)
+                pc_heat_third_tariff = third_tariff_hours/(24 - (1-offpeak_heat_demand_reduction)*second_tariff_hours)
+
+            if is_free_summer_hw: #those with solar panels can get free hot water for 4 months
+                elec_unit_total_cost = elec_heat_kWh * (pc_heat_second_tariff*elec_unit2 + pc_heat_third_tariff*elec_unit3 + (1-pc_heat_second_tariff-pc_heat_third_tariff)*elec_unit) + \
+                    elec_hw_kWh*(2/3)*elec_unit2 + elec_cook_kWh*elec_unit3 + elec_ev_kWh*elec_unit_ev + elec_other_kWh*elec_unit_eff
+            else:
+                elec_unit_total_cost = elec_heat_kWh * (pc_heat_second_tariff*elec_unit2 + pc_heat_third_tariff*elec_unit3 + (1-pc_heat_second_tariff-pc_heat_third_tariff)*elec_unit) + \
+                    elec_hw_kWh*elec_unit2 + elec_cook_kWh*elec_unit3 + elec_ev_kWh*elec_unit_ev + elec_other_kWh*elec_unit_eff
+            elec_unit_total_cost /= 100
+
+        else:
+            if is_free_summer_hw: #those with solar panels can get free hot water for 4 months
+                elec_unit_total_cost = (elec_total_kWh - elec_hw_kWh/3)*elec_unit/100
+            else:
+                elec_unit_total_cost = elec_total_kWh*elec_unit/100
+
+        costs_by_type = [[case_name, 'Gas standing', gas_stand_total],
+                        [case_name, 'Gas unit',  gas_total_kWh*gas_unit/100],
+                        [case_name, 'Elec.  standing', elec_stand*3.65],
+                        [case_name, 'Elec.  unit', elec_unit_total_cost]]
+
+        costs_total = sum([gas_stand_total, gas_total_kWh*gas_unit/100, elec_stand*3.65, elec_unit_total_cost])
+
+        return energy_usage, costs_by_type, energy_total, emissions_total, costs_total
+
+    if switch_tariff_for_hp:
+        n_tariff_states = 3
+        elec_unit = elec_unit_cosy_standard
+        elec_unit2 = elec_unit_cosy_offpeak
+        elec_unit3 = elec_unit_cosy_peak
+        pc_elec_second_tariff = pc_other_elec_cosy_offpeak
+        pc_elec_third_tariff = pc_other_elec_cosy_peak
+        second_tariff_hours = cosy_second_tariff_hours
+        third_tariff_hours = cosy_third_tariff_hours
+        elec_unit_eff = (pc_elec_third_tariff*elec_unit3) + (pc_elec_second_tariff*elec_unit2) + (1 - pc_elec_second_tariff - pc_elec_third_tariff)*elec_unit
+        elec_unit_ev = elec_unit2
+        offpeak_heat_demand_reduction = cosy_offpeak_heat_demand_reduction
+
+    for install_type in ['Typical', 'Hi-performance']:
+        results[install_type + ' HP Install'] = \
+            do_heat_pump_case(install_type, gas_heat_kWh, elec_heat_kWh, gas_hw_kWh, elec_hw_kWh, gas_cook_kWh)
+    return results
+
+
+def random_homes(n, seed=0):
+    """
+    n - number of households
+    seed - random seed
+    returns dict of engine input columns, every input drawn across the range the
+    page allows (efficiencies and SCOPs kept away from zero)
+    """
+    rng = np.random.default_rng(seed)
+    homes = {name: rng.random(n) < 0.5 for name in engine.FLAG_INPUTS}
+    for name, (low, high) in INPUT_RANGES.items():
+        if name in ('boiler_heat_eff', 'boiler_hw_eff'):
+            low = 0.5
+        elif name.startswith('hp_'):
+            low = 1.5
+        homes[name] = rng.uniform(low, high, n)
+    for name in ('n_tariff_states', 'second_tariff_hours', 'third_tariff_hours',
+                 'cosy_second_tariff_hours', 'cosy_third_tariff_hours'):
+        low, high = INPUT_RANGES[name]
+        homes[name] = rng.integers(low, high + 1, n)
+    homes['second_heatsource_type'] = rng.integers(0, len(engine.SECOND_HEATSOURCE_TYPES), n)
+    #a few homes with round numbers, so the page's branches on exact values are taken
+    homes['elec_ev_kWh'] = np.where(rng.random(n) < 0.3, 0, homes['elec_ev_kWh'])
+    homes['efficiency_boost'] = np.where(rng.random(n) < 0.3, 0, homes['efficiency_boost'])
+    return {name: homes[name] for name in engine.DEFAULTS}
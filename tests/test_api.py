@@ -0,0 +1,61 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+import asyncio
+import json
+
+import pytest
+
+import api
+
+
+@pytest.mark.parametrize('values', [{'is_cook_gas': 'false'}, {'is_cook_gas': 0}, {'is_hw_gas': None},
+                                    {'n_tariff_states': 7}, {'n_tariff_states': 1000}, {'n_tariff_states': 2.5},
+                                    {'hp_heat_scop_typ': 0}, {'boiler_hw_eff': 0}, {'boiler_heat_eff': 0},
+                                    {'gas_unit': float('nan')}, {'elec_unit': float('inf')},
+                                    {'gas_total_kWh': True}, {'gas_total_kWh': '12000'}, {'gas_total_kWh': -1},
+                                    {'second_heatsource_type': 'wood'}, {'second_heatsource_type': 3},
+                                    {'second_heatsource_type': True}, {'no_such_input': 1}])
+def test_invalid_inputs_rejected(values):
+    with pytest.raises(ValueError):
+        api.parse_inputs(values)
+    status, payload = asyncio.run(api.route('POST', '/calculate', json.dumps(values).encode(), None))
+    assert status == 400 and 'error' in payload
+
+
+def test_valid_inputs_accepted():
+    canonical = api.parse_inputs({'is_cook_gas': True, 'second_heatsource_type': 'electric', 'n_tariff_states': 3,
+                                  'hp_heat_scop_typ': 0.1, 'ev_charges_per_week': 2})
+    assert canonical['is_cook_gas'] is True
+    assert canonical['second_heatsource_type'] == 1
+    assert canonical['n_tariff_states'] == 3
+    assert canonical['elec_ev_kWh'] == 30*2*52
+
+
+def test_every_input_checked():
+    numeric = set(api.INPUT_COLUMNS) - set(api.engine.FLAG_INPUTS) - {'second_heatsource_type'}
+    assert numeric == set(api.INPUT_RANGES)
+
+
+def test_response_is_strict_json():
+    response = api._response(200, {'Heating': float('inf')}, False)
+    assert response.startswith(b'HTTP/1.1 500 ')
+    assert b'Infinity' not in response
@@ -0,0 +1,68 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+import numpy as np
+
+import batch
+import engine
+
+
+def test_empty_flag_cells_take_defaults(tmp_path):
+    path = tmp_path / 'homes.csv'
+    path.write_text('gas_total_kWh,is_cook_gas,is_disconnect_gas\n15000,,\n15000,True,False\n')
+    chunk = next(batch.read_chunks(str(path), 10))
+    p = engine.prepare_inputs(batch.engine_inputs(chunk))
+    assert p['is_cook_gas'].tolist() == [engine.DEFAULTS['is_cook_gas'], True]
+    assert p['is_disconnect_gas'].tolist() == [engine.DEFAULTS['is_disconnect_gas'], False]
+
+
+def test_empty_numeric_cells_take_defaults(tmp_path):
+    path = tmp_path / 'homes.csv'
+    path.write_text('gas_total_kWh,ev_kWh_per_charge,ev_charges_per_week\n15000,,2\n,40,\n9000,40,1\n')
+    chunk = next(batch.read_chunks(str(path), 10))
+    p = engine.prepare_inputs(batch.engine_inputs(chunk))
+    assert p['gas_total_kWh'].tolist() == [15000, engine.DEFAULTS['gas_total_kWh'], 9000]
+    assert p['elec_ev_kWh'].tolist() == [30*2*52, 0, 40*52]
+    assert np.isfinite(engine.calculate(batch.engine_inputs(chunk))['Current']['costs_total']).all()
+
+
+def test_empty_coded_cells_take_defaults(tmp_path):
+    path = tmp_path / 'homes.csv'
+    path.write_text('n_tariff_states,second_heatsource_type\n,1\n3,\n')
+    chunk = next(batch.read_chunks(str(path), 10))
+    p = engine.prepare_inputs(batch.engine_inputs(chunk))
+    assert p['n_tariff_states'].tolist() == [engine.DEFAULTS['n_tariff_states'], 3]
+    assert p['second_heatsource_type'].tolist() == [1, engine.DEFAULTS['second_heatsource_type']]
+
+
+def test_calculate_chunk_matches_engine(tmp_path):
+    path = tmp_path / 'homes.csv'
+    path.write_text('gas_total_kWh,is_cook_gas,ev_kWh_per_charge,ev_charges_per_week\n12000,True,40,2\n9000,,30,0\n')
+    table = batch.calculate_chunk(next(batch.read_chunks(str(path), 10)))
+    results = engine.calculate({'gas_total_kWh': np.array([12000., 9000.]), 'is_cook_gas': np.array([True, False]),
+                                'elec_ev_kWh': np.array([40*2*52., 0.])})
+    for home in range(2):
+        for c, case in enumerate(engine.CASE_NAMES):
+            rows = (table['home'] == home) & (table['Case'] == c)
+            costs = table['Costs (£)'][rows][len(engine.ENERGY_BREAKDOWNS):]
+            energy = table['Energy (kWh)'][rows][:len(engine.ENERGY_BREAKDOWNS)]
+            np.testing.assert_allclose(costs, results[case]['costs'][:, home])
+            np.testing.assert_allclose(energy, results[case]['energy'][:, home])
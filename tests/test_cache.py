@@ -0,0 +1,88 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+
+import numpy as np
+
+import cache
+import engine
+import metrics
+
+
+def _homes(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {'gas_total_kWh': rng.uniform(5000, 30000, n), 'elec_total_kWh': rng.uniform(1500, 6000, n),
+            'n_tariff_states': rng.integers(1, 4, n), 'hp_heat_scop_typ': rng.uniform(2, 5, n)}
+
+
+def _assert_same(results, expected):
+    for case, res in expected.items():
+        for key, val in res.items():
+            np.testing.assert_array_equal(results[case][key], val)
+
+
+def test_input_key_ignores_spelling_of_inputs():
+    key = cache.input_key({'gas_total_kWh': 15000})
+    assert cache.input_key({'gas_total_kWh': 15000.0, 'elec_total_kWh': engine.DEFAULTS['elec_total_kWh']}) == key
+    assert cache.input_key({'gas_total_kWh': np.float32(15000)}) == key
+    assert cache.input_key({'gas_total_kWh': 15001}) != key
+    assert cache.input_key({'gas_total_kWh': 15000, 'is_cook_gas': True}) != key
+
+
+def test_lru_cache_evicts_least_recently_used():
+    lru = cache.LRUCache(maxsize=2)
+    lru.put('a', 1)
+    lru.put('b', 2)
+    assert lru.get('a') == 1
+    lru.put('c', 3)
+    assert lru.get('b') is None
+    assert lru.get_or_compute('a', lambda: 0) == 1
+    assert lru.get_or_compute('d', lambda: 4) == 4
+    assert lru.get('c') is None
+    stats = lru.stats()
+    assert (stats['size'], stats['hits'], stats['misses'], stats['evictions']) == (2, 2, 3, 2)
+
+
+def test_tiered_cache_counts_both_tiers(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, '_enabled', True)
+    metrics.reset()
+    path = str(tmp_path/'cache.sqlite')
+    cache.TieredCache(path=path).put('a', 1)
+    tiered = cache.TieredCache(maxsize=4, path=path)
+    assert tiered.get('a') == 1
+    assert tiered.get('a') == 1
+    assert tiered.get('b') is None
+    stats = tiered.stats()
+    assert (stats['hits'], stats['misses'], stats['disk_hits']) == (2, 1, 1)
+    assert stats['hit_rate'] == 2/3
+    assert metrics.snapshot()['counters'] == {'cache_hits': 2, 'cache_misses': 1}
+    metrics.reset()
+
+
+def test_cached_calculate_only_recomputes_costs(tmp_path):
+    homes = _homes(200)
+    store = cache.TieredCache(path=str(tmp_path/'cache.sqlite'))
+    expected = engine.calculate(homes)
+    _assert_same(cache.cached_calculate(homes, store), expected)
+    cheaper = dict(homes, elec_unit=12.0)
+    expected = engine.calculate(cheaper)
+    _assert_same(cache.cached_calculate(cheaper, store), expected)
+    assert store.stats()['hits'] == 1
@@ -0,0 +1,66 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+
+import numpy as np
+import pandas as pd
+
+import engine
+import helper
+from columnar import ResultTable
+
+
+def _results(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return engine.calculate({'gas_total_kWh': rng.uniform(5000, 30000, n), 'n_tariff_states': rng.integers(1, 4, n)})
+
+
+def test_from_cases_matches_generate_df():
+    values = np.array([[[1.0, 2.0], [0.0, 4.0]], [[5.0, 0.0], [7.0, 8.0]]])
+    names, breakdowns, value_names = ['Current', 'New'], ['Heating', 'Hot water'], ['Energy', 'Emissions']
+    rows = [[case, b] + list(values[c, i]) for c, case in enumerate(names) for i, b in enumerate(breakdowns)]
+    expected = helper.generate_df(rows[:2], [rows[2:]], value_names)
+    frame = ResultTable.from_cases(values, names, breakdowns, value_names).frame()
+    pd.testing.assert_frame_equal(frame.astype({'Case': object, 'Breakdown': object}), expected)
+    assert list(frame['Case'].cat.categories) == names
+
+
+def test_frame_and_record_batch_share_the_value_columns():
+    results = _results(50)
+    table = ResultTable(engine.result_columns(results))
+    costs = table.columns['Costs (£)']
+    frame = table.frame()
+    assert np.shares_memory(frame['Costs (£)'].to_numpy(), costs)
+    assert (frame['Case'].astype(object).to_numpy() == table.labels('Case')).all()
+
+    batch = table.record_batch()
+    assert batch.num_rows == len(table) == 50*len(engine.CASE_NAMES)*len(engine.BREAKDOWNS)
+    assert batch.column('Case').dictionary.to_pylist() == list(engine.CASE_NAMES)
+    np.testing.assert_array_equal(batch.column('Costs (£)').to_numpy(), costs)
+    totals = frame.groupby(['home', 'Case'], observed=True)['Costs (£)'].sum().unstack()
+    for case in engine.CASE_NAMES:
+        np.testing.assert_allclose(totals[case], results[case]['costs_total'])
+
+
+def test_records_use_labels_and_none():
+    table = ResultTable.from_cases([[[1.0], [0.0]]], ['Current'], ['Heating', 'Hot water'], ['Energy'])
+    assert table.records() == [{'Case': 'Current', 'Breakdown': 'Heating', 'Energy': 1.0},
+                               {'Case': 'Current', 'Breakdown': 'Hot water', 'Energy': None}]
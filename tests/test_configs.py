@@ -0,0 +1,64 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+
+import numpy as np
+import pytest
+
+import configs
+import engine
+import hourly
+
+
+def _homes(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {'gas_total_kWh': rng.uniform(5000, 30000, n), 'elec_total_kWh': rng.uniform(1500, 6000, n),
+            'n_tariff_states': rng.integers(1, 4, n), 'is_hw_gas': rng.random(n) < 0.7}
+
+
+def test_configs_match_engine_cases():
+    homes = _homes(100)
+    quotes = configs.HeatPumpConfigs(['a', 'b', 'c'], [2.5, 3.2, 4.1], [2.2, 2.6, 3.0])
+    results = configs.calculate(homes, quotes, block_size=30)
+    for i, (heat_scop, hw_cop) in enumerate(zip(quotes.heat_scop, quotes.hw_cop)):
+        expected = engine.calculate(dict(homes, hp_heat_scop_typ=heat_scop, hp_hw_cop_typ=hw_cop))
+        for key, val in expected['Typical HP Install'].items():
+            np.testing.assert_allclose(results['configs'][key][..., i, :], val, rtol=1e-12, atol=1e-9)
+        for key, val in expected['Current'].items():
+            np.testing.assert_array_equal(results['Current'][key], val)
+
+    #the long table has every configuration's costs after the current case's
+    columns = configs.result_columns(results, quotes)
+    costs = columns['Costs (£)'].reshape(100, len(quotes) + 1, len(engine.BREAKDOWNS))
+    np.testing.assert_allclose(np.nansum(costs[:, 1:], axis=-1).T, results['configs']['costs_total'])
+    np.testing.assert_allclose(np.nansum(costs[:, 0], axis=-1), results['Current']['costs_total'])
+
+
+def test_from_table_estimates_scop_from_flow_temp():
+    quotes = configs.HeatPumpConfigs.from_table({'name': ['quoted', 'by flow'], 'heat_scop': [3.5, np.nan],
+                                                  'flow_temp': [np.nan, 40.0]})
+    np.testing.assert_allclose(quotes.heat_scop, [3.5, hourly.seasonal_cop(40.0)[0]])
+    np.testing.assert_allclose(quotes.hw_cop, engine.hp_hw_cop_typ)
+    assert quotes.case_names() == [engine.CASE_NAMES[0], 'quoted', 'by flow']
+    with pytest.raises(ValueError):
+        configs.HeatPumpConfigs.from_table({'name': ['unknown'], 'hw_cop': [2.5]})
+    with pytest.raises(ValueError):
+        configs.HeatPumpConfigs(['a', 'a'], 3.0, 2.5)
@@ -0,0 +1,54 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+import numpy as np
+import pytest
+
+import engine
+from tests.baseline import page_results, random_homes
+
+N_HOMES = 3000
+
+
+@pytest.fixture(scope='module')
+def homes():
+    return random_homes(N_HOMES, seed=1)
+
+
+def test_calculate_matches_page(homes):
+    results = engine.calculate(homes)
+    for i in range(N_HOMES):
+        page = page_results(**{name: val[i].item() for name, val in homes.items()})
+        for case, (energy_usage, costs_by_type, energy_total, emissions_total, costs_total) in page.items():
+            res = results[case]
+            np.testing.assert_allclose(res['energy'][:, i], [row[2] for row in energy_usage], rtol=1e-9, atol=1e-6)
+            np.testing.assert_allclose(res['emissions'][:, i], [row[3] for row in energy_usage], rtol=1e-9, atol=1e-6)
+            np.testing.assert_allclose(res['costs'][:, i], [row[2] for row in costs_by_type], rtol=1e-9, atol=1e-6)
+            np.testing.assert_allclose([res['energy_total'][i], res['emissions_total'][i], res['costs_total'][i]],
+                                       [energy_total, emissions_total, costs_total], rtol=1e-9, atol=1e-6)
+
+
+def test_calculate_blocks_match(homes):
+    whole = engine.calculate(homes)
+    blocks = engine.calculate(homes, block_size=257)
+    for case in engine.CASE_NAMES:
+        for key, val in whole[case].items():
+            np.testing.assert_array_equal(blocks[case][key], val)
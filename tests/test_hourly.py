@@ -0,0 +1,60 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+
+import numpy as np
+
+import engine
+import hourly
+
+
+def _homes(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {'gas_total_kWh': rng.uniform(5000, 30000, n), 'elec_total_kWh': rng.uniform(1500, 6000, n),
+            'is_hw_gas': rng.random(n) < 0.5, 'hp_heat_scop_typ': rng.uniform(2, 5, n),
+            'switch_tariff_for_hp': False}
+
+
+def test_heating_profile_follows_degree_hours():
+    temperature = hourly.synthetic_temperature()
+    profile = hourly.heating_profile(temperature)
+    assert np.isclose(profile.sum(), 1)
+    assert (profile[temperature >= hourly.HEAT_BASE_TEMP] == 0).all()
+    assert (profile[temperature < hourly.HEAT_BASE_TEMP] > 0).all()
+
+
+def test_flat_tariff_matches_engine():
+    #with a single rate and no hours off, calibrated COPs give the engine's results
+    homes = _homes(100)
+    expected = engine.calculate(homes)
+    results = hourly.calculate(homes, block_size=30, tile_size=2)
+    for case, res in expected.items():
+        for key, val in res.items():
+            np.testing.assert_allclose(results[case][key], val, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(results['Typical HP Install']['heat_scop'], homes['hp_heat_scop_typ'])
+
+
+def test_peak_hours_off_lowers_scop():
+    homes = _homes(20)
+    flat = hourly.calculate(homes)
+    peak_off = hourly.calculate(dict(homes, switch_tariff_for_hp=True))
+    for case in ('Typical HP Install', 'Hi-performance HP Install'):
+        assert (peak_off[case]['heat_scop'] < flat[case]['heat_scop']).all()
@@ -0,0 +1,70 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+
+import itertools
+
+import numpy as np
+
+import loadshift
+
+
+def _brute_force(unit_cost, elec_per_heat, demand, capacity, max_output, levels):
+    """
+    returns cost and electricity of the cheapest schedule over every sequence of
+    stored levels, without loss, valuing the heat carried in and left over as schedule
+    """
+    step = max(capacity, 1e-6)/(levels - 1)
+    stored = step*np.array(list(itertools.product(range(levels), repeat=len(demand) + 1)))
+    heat = stored[:, 1:] + demand - stored[:, :-1]
+    ok = ((heat >= -1e-9) & (heat <= max_output + 1e-9)).all(axis=1)
+    if not ok.any():
+        return np.inf, np.inf
+    cheapest = np.argmin(unit_cost)
+    carried = stored[:, -1] - stored[:, 0]
+    cost = heat @ unit_cost - unit_cost[cheapest]*carried
+    elec = heat @ elec_per_heat - elec_per_heat[cheapest]*carried
+    best = np.argmin(np.where(ok, cost, np.inf))
+    return cost[best], elec[best]
+
+
+def test_schedule_matches_brute_force():
+    #with no loss and demand in whole levels the cheapest schedule stays on the levels
+    rng = np.random.default_rng(0)
+    rows, slots, levels = 40, 5, 5
+    elec_per_heat = rng.uniform(0.2, 0.5, (rows, slots))
+    unit_cost = rng.uniform(5, 40, (rows, slots))*elec_per_heat
+    demand = rng.integers(0, 3, (rows, slots)).astype(float)
+    capacity = rng.integers(0, 3, rows)*(levels - 1.0)/2
+    max_output = rng.integers(1, 4, rows).astype(float)
+    cost, elec = loadshift.schedule(unit_cost, elec_per_heat, demand, capacity, max_output, 0.0, levels)
+    for i in range(rows):
+        expected = _brute_force(unit_cost[i], elec_per_heat[i], demand[i], capacity[i], max_output[i], levels)
+        np.testing.assert_allclose([cost[i], elec[i]], expected, rtol=1e-9, atol=1e-9)
+    assert np.isinf(cost).any() and np.isfinite(cost).any()
+
+
+def test_storage_never_costs_more():
+    homes = {'gas_total_kWh': np.array([8000., 15000., 25000.]), 'n_tariff_states': 2}
+    small = loadshift.calculate(dict(homes, thermal_mass=0.0, tank_days=0.0))
+    large = loadshift.calculate(dict(homes, thermal_mass=20.0, tank_days=1.0))
+    for case in ('Typical HP Install', 'Hi-performance HP Install'):
+        assert (large[case]['costs_total'] <= small[case]['costs_total'] + 1e-6).all()
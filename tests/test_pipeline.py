@@ -0,0 +1,63 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+
+import numpy as np
+import pytest
+
+import configs
+import engine
+import pipeline
+
+
+def test_totals_match_engine():
+    inputs = {'gas_total_kWh': 18000, 'n_tariff_states': 2, 'is_cook_gas': True}
+    out = pipeline.page_pipeline().run(pipeline.prepare(inputs, configs.HeatPumpConfigs.standard()))
+    expected = engine.calculate(inputs)
+    for case, totals in out['totals'].items():
+        for key, val in totals.items():
+            assert val == pytest.approx(float(expected[case][key][0]), rel=1e-12)
+
+
+def test_only_stages_downstream_of_a_change_rerun():
+    page = pipeline.page_pipeline()
+    quotes = configs.HeatPumpConfigs.standard()
+    inputs = {'gas_total_kWh': 18000}
+    first = page.run(pipeline.prepare(inputs, quotes))
+    assert page.recomputed == [stage.name for stage in page.stages]
+    page.run(pipeline.prepare(inputs, quotes))
+    assert page.recomputed == []
+
+    cheaper = page.run(pipeline.prepare(dict(inputs, elec_stand=40.0), quotes))
+    assert page.recomputed == ['heat_pump_tariff', 'current_costs', 'configs_costs', 'costs_table', 'costs_chart',
+                               'totals']
+    assert cheaper['energy_chart'] is first['energy_chart']
+    assert cheaper['totals']['Current']['costs_total'] < first['totals']['Current']['costs_total']
+
+
+def test_stages_must_follow_their_dependencies():
+    with pytest.raises(ValueError):
+        pipeline.Pipeline([pipeline.Stage('b', lambda p, a: a, ['a']), pipeline.Stage('a', lambda p: 1)])
+    page = pipeline.Pipeline([pipeline.Stage('a', lambda p: p['x']*2),
+                              pipeline.Stage('b', lambda p, a: a + p['y'], ['a'])])
+    assert page.run({'x': np.array(1), 'y': np.array(2)})['b'] == 4
+    assert page.run({'x': np.array(1), 'y': np.array(3)})['b'] == 5
+    assert page.recomputed == ['b']
@@ -0,0 +1,75 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+import numpy as np
+import pytest
+
+import engine
+import portfolio
+import resultstore
+
+
+def _homes(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {'gas_total_kWh': rng.uniform(5000, 30000, n), 'elec_total_kWh': rng.uniform(1500, 6000, n),
+            'n_tariff_states': rng.integers(1, 4, n), 'is_cook_gas': rng.random(n) < 0.3,
+            'hp_heat_scop_typ': rng.uniform(2, 5, n)}
+
+
+def _tiles(tmp_path, homes):
+    p = engine.prepare_inputs(homes)
+    results = engine.calculate(p)
+    with resultstore.RunWriter(str(tmp_path), 'run') as writer:
+        writer.write(np.arange(len(homes['gas_total_kWh'])), p, results)
+    return portfolio.Tiles.build(resultstore.ResultStore(str(tmp_path)), 'run'), results
+
+
+def test_select_matches_homes(tmp_path):
+    homes = _homes(5000, seed=1)
+    tiles, results = _tiles(tmp_path, homes)
+    saving = engine.metric(results, 'Typical HP Install', 'saving')
+    keep = homes['n_tariff_states'] == 3
+    view = tiles.select('saving', 'Typical HP Install', {'n_tariff_states': [3]})
+    assert view['summary']['homes'] == keep.sum()
+    assert view['summary']['mean'] == pytest.approx(saving[keep].mean())
+    #quantiles are interpolated within bins
+    width = np.diff(tiles.edges[0, 0, :2])[0]
+    np.testing.assert_allclose(list(view['summary']['quantiles'].values()),
+                               np.quantile(saving[keep], [0.1, 0.5, 0.9]), atol=2*width)
+    groups = tiles.select('saving', 'Typical HP Install', by='is_cook_gas')['groups']
+    np.testing.assert_allclose(groups['mean'], [saving[~homes['is_cook_gas']].mean(), saving[homes['is_cook_gas']].mean()])
+
+
+def test_non_finite_homes_left_out(tmp_path):
+    homes = _homes(1000, seed=2)
+    homes['boiler_hw_eff'] = np.where(np.arange(1000) < 3, 0.0, 0.88)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tiles, results = _tiles(tmp_path, homes)
+    saving = engine.metric(results, 'Typical HP Install', 'saving')
+    assert not np.isfinite(saving[:3]).any()
+    view = tiles.select('saving', 'Typical HP Install')
+    assert view['summary']['homes'] == 997 and view['summary']['not_finite'] == 3
+    assert np.isfinite(tiles.edges).all()
+    assert view['summary']['mean'] == pytest.approx(saving[3:].mean())
+    #the tiles survive a save and load
+    tiles.save(tmp_path / 'tiles.npz')
+    loaded = portfolio.Tiles.load(tmp_path / 'tiles.npz')
+    assert loaded.select('saving', 'Typical HP Install')['summary'] == view['summary']
@@ -0,0 +1,58 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+import numpy as np
+
+import engine
+import projection
+
+
+def _homes(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {'gas_total_kWh': rng.uniform(5000, 30000, n), 'elec_total_kWh': rng.uniform(1500, 6000, n),
+            'is_elec_renewable': rng.random(n) < 0.2, 'is_hw_gas': rng.random(n) < 0.8,
+            'is_cook_gas': rng.random(n) < 0.3, 'is_disconnect_gas': rng.random(n) < 0.5,
+            'switch_tariff_for_hp': rng.random(n) < 0.5, 'turn_off_hp_in_peak_hours': rng.random(n) < 0.5,
+            'n_tariff_states': rng.integers(1, 4, n), 'is_free_summer_hw': rng.random(n) < 0.2,
+            'hp_heat_scop_typ': rng.uniform(2, 5, n), 'hp_hw_cop_hi': rng.uniform(2, 4, n)}
+
+
+def test_yearly_results_match_engine():
+    homes = _homes(500, seed=1)
+    degradation, years = 0.05, 6
+    result = projection.project(homes, {'constant': {}}, years, degradation, yearly=True)
+    scops = ('hp_heat_scop_typ', 'hp_hw_cop_typ', 'hp_heat_scop_hi', 'hp_hw_cop_hi')
+    p = engine.prepare_inputs(homes)
+    for year in range(years):
+        efficiency = (1 - degradation)**year
+        results = engine.calculate(dict(homes, **{name: p[name]*efficiency for name in scops}))
+        for case in engine.CASE_NAMES:
+            np.testing.assert_allclose(result[case]['annual_cost'][0, year], results[case]['costs_total'],
+                                       rtol=1e-9, atol=1e-6)
+            np.testing.assert_allclose(result[case]['annual_tCO2'][0, year]*1000, results[case]['emissions_total'],
+                                       rtol=1e-9, atol=1e-6)
+
+
+def test_lifetime_totals_are_sums_of_years():
+    homes = _homes(50, seed=2)
+    result = projection.project(homes, years=10, yearly=True)
+    for case in engine.CASE_NAMES:
+        np.testing.assert_allclose(result[case]['cost'], result[case]['annual_cost'].sum(axis=1))
+        np.testing.assert_allclose(result[case]['tCO2'], result[case]['annual_tCO2'].sum(axis=1))
@@ -0,0 +1,52 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+import numpy as np
+
+import engine
+import recommend
+import tariffs
+
+
+def test_top_k_beyond_real_options():
+    library = [tariffs.Tariff.flat(24.5, 53.0, 'flat')]
+    matrix = recommend.TariffMatrix.build(library)
+    rec = recommend.recommend(dict(engine.DEFAULTS), matrix, top_k=3)
+    assert rec['tariff'].tolist() == [[0, -1]]
+    assert np.isfinite(rec['bill'][0, 0]) and np.isnan(rec['bill'][0, 1]) and np.isnan(rec['saving'][0, 1])
+    columns = recommend.recommendation_columns(rec, matrix.names, np.array(['a']))
+    assert columns['tariff'].tolist() == ['flat'] and columns['rank'].tolist() == [1]
+
+
+def test_recommendations_are_finite_and_sorted():
+    library = [tariffs.Tariff.flat(24.5, 53.0, 'flat'),
+               tariffs.Tariff.time_of_use(26.0, 50.0, [(0, 6, 12.0), (16, 3, 40.0)], 'cosy')]
+    matrix = recommend.TariffMatrix.build(library)
+    rng = np.random.default_rng(2)
+    homes = {'gas_total_kWh': rng.uniform(5000, 30000, 200), 'elec_total_kWh': rng.uniform(1500, 6000, 200),
+             'is_hw_gas': rng.random(200) < 0.8, 'is_free_summer_hw': rng.random(200) < 0.2,
+             'hp_heat_scop_typ': rng.uniform(2, 5, 200)}
+    rec = recommend.recommend(homes, matrix, top_k=4)
+    valid = rec['tariff'] >= 0
+    #the flat tariff has one option, the time of use tariff two
+    assert valid.sum(axis=1).tolist() == [3]*200
+    assert np.isfinite(rec['bill'][valid]).all() and np.isnan(rec['bill'][~valid]).all()
+    assert (np.diff(rec['bill'][:, :3], axis=1) >= 0).all()
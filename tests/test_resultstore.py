@@ -0,0 +1,80 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import engine
+import resultstore
+
+
+def _write_homes(path, n, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'gas_total_kWh': rng.uniform(5000, 30000, n), 'n_tariff_states': rng.integers(1, 4, n),
+                       'is_cook_gas': rng.random(n) < 0.3, 'region': rng.integers(0, 3, n)})
+    df.to_csv(path, index=False)
+    return df
+
+
+def test_runs_read_back(tmp_path):
+    homes = _write_homes(tmp_path/'homes.csv', 500)
+    root = str(tmp_path/'store')
+    resultstore.write_run(root, str(tmp_path/'homes.csv'), 'first', partition='region', chunk_size=120)
+    _write_homes(tmp_path/'more.csv', 200, seed=1)
+    resultstore.write_run(root, str(tmp_path/'more.csv'), 'second', chunk_size=120)
+    store = resultstore.ResultStore(root)
+    assert store.run_ids() == ['first', 'second']
+    assert [run['homes'] for run in store.runs()] == [500, 200]
+
+    saving = 'Typical HP Install: saving'
+    df = store.table(['home', 'region', saving], runs=['first']).to_pandas()
+    df = df.assign(home=df['home'].astype(int)).sort_values('home')
+    results = engine.calculate(homes[['gas_total_kWh', 'n_tariff_states', 'is_cook_gas']].to_dict('series'))
+    np.testing.assert_allclose(df[saving], results['Current']['costs_total'] -
+                               results['Typical HP Install']['costs_total'])
+    np.testing.assert_array_equal(df['region'], homes['region'])
+
+    cooking = store.table(['home'], where=[('is_cook_gas', '==', True), ('n_tariff_states', '==', 3)],
+                          runs=['first'])
+    assert cooking.num_rows == (homes['is_cook_gas'] & (homes['n_tariff_states'] == 3)).sum()
+    counts = store.aggregate(saving, by='run', stats=['count'])
+    assert counts.set_index('run')['count'].to_dict() == {'first': 500, 'second': 200}
+
+
+def test_runs_are_never_overwritten(tmp_path):
+    _write_homes(tmp_path/'homes.csv', 50)
+    root = str(tmp_path/'store')
+    resultstore.write_run(root, str(tmp_path/'homes.csv'), 'run')
+    with pytest.raises(FileExistsError):
+        resultstore.write_run(root, str(tmp_path/'homes.csv'), 'run')
+    with pytest.raises(KeyError):
+        resultstore.write_run(root, str(tmp_path/'homes.csv'), 'failed', partition='archetype')
+    assert resultstore.ResultStore(root).run_ids() == ['run']
+
+
+def test_parse_where():
+    assert resultstore.parse_where('is_cook_gas == true') == ('is_cook_gas', '==', True)
+    assert resultstore.parse_where('n_tariff_states >= 2') == ('n_tariff_states', '>=', 2)
+    assert resultstore.parse_where('region != north') == ('region', '!=', 'north')
+    with pytest.raises(ValueError):
+        resultstore.parse_where('region is north')
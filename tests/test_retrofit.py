@@ -0,0 +1,53 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+import numpy as np
+
+import engine
+import retrofit
+
+
+def _homes(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {'gas_total_kWh': rng.uniform(5000, 30000, n), 'elec_total_kWh': rng.uniform(1500, 6000, n),
+            'is_hw_gas': rng.random(n) < 0.8, 'is_cook_gas': rng.random(n) < 0.3,
+            'is_second_heatsource': rng.random(n) < 0.3, 'second_heatsource_type': rng.integers(0, 3, n),
+            'is_second_heatsource_remains': rng.random(n) < 0.5, 'second_heatsource_kWh': rng.uniform(0, 3000, n),
+            'efficiency_boost': np.where(rng.random(n) < 0.5, 0, rng.uniform(0, 0.3, n)),
+            'switch_tariff_for_hp': rng.random(n) < 0.5, 'turn_off_hp_in_peak_hours': rng.random(n) < 0.5,
+            'is_disconnect_gas': rng.random(n) < 0.5, 'n_tariff_states': rng.integers(1, 4, n),
+            'is_free_summer_hw': rng.random(n) < 0.2, 'hp_heat_scop_typ': rng.uniform(2, 5, n)}
+
+
+def test_front_keeps_every_undominated_package():
+    every, front = retrofit.Packages.all(), retrofit.Packages.front()
+    keep = retrofit.non_dominated(every.cost, every.factor)
+    assert sorted(every.masks[keep]) == sorted(front.masks)
+
+
+def test_optimise_matches_engine():
+    homes = _homes(500, seed=1)
+    result = retrofit.optimise(homes)
+    base = homes['efficiency_boost']
+    for j, factor in enumerate(result['packages'].factor):
+        #a package leaves factor of the demand left by the boost the home already has
+        res = engine.calculate(dict(homes, efficiency_boost=1 - (1 - base)*factor))['Typical HP Install']
+        np.testing.assert_allclose(result['bill'][:, j], res['costs_total'], rtol=1e-9, atol=1e-6)
+        np.testing.assert_allclose(result['emissions'][:, j], res['emissions_total'], rtol=1e-9, atol=1e-6)
@@ -0,0 +1,43 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+import numpy as np
+import pytest
+
+import engine
+import sensitivity
+
+
+@pytest.mark.parametrize('saving, roots', [([-1, 0, 1], [1]), ([-2, 0, 0, 1], [1, 2]), ([1, 0, -1, 0], [1, 3]),
+                                           ([0, 0, 0], [0, 1, 2]), ([-1, 1, 3], [0.5]), ([1, 2, 3], [])])
+def test_break_even_roots(monkeypatch, saving, roots):
+    case = 'Typical HP Install'
+    monkeypatch.setattr(sensitivity, 'sweep', lambda household, grid, outputs: {(case, 'saving'): np.array(saving, float)})
+    found = sensitivity.break_even({}, 'gas_unit', 0, len(saving) - 1, case, n_points=len(saving))
+    np.testing.assert_allclose(found, roots)
+
+
+def test_break_even_saving_is_zero():
+    household = {'gas_total_kWh': 15000}
+    roots = sensitivity.break_even(household, 'hp_heat_scop_typ', 1, 6)
+    assert len(roots) == 1
+    saving = engine.metric(engine.calculate(dict(household, hp_heat_scop_typ=roots[0])), 'Typical HP Install', 'saving')
+    assert abs(saving[0]) < 1
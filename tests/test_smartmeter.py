@@ -0,0 +1,75 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import engine
+import smartmeter
+
+TIMES = pd.date_range('2019-01-01', '2020-01-01', freq='30min', inclusive='left')
+
+
+def _write_readings(path, kWh_by_meter):
+    df = pd.concat([pd.DataFrame({'meter': meter, 'time': TIMES.strftime('%Y-%m-%d %H:%M:%S'), 'kWh': kWh})
+                    for meter, kWh in kWh_by_meter.items()])
+    df.to_csv(path, index=False)
+
+
+def test_derive_from_readings(tmp_path):
+    night = (TIMES.hour >= 7 - engine.DEFAULTS['second_tariff_hours']) & (TIMES.hour < 7)
+    winter = np.isin(TIMES.month, [1, 2, 3, 10, 11, 12])
+    _write_readings(tmp_path/'elec.csv', {'a': np.where(night, 0.5, 0.1), 'b': np.full(len(TIMES), 0.2),
+                                          'c': np.where(TIMES.month == 6, np.nan, 0.1)})
+    _write_readings(tmp_path/'gas.csv', {'a': np.where(winter, 2.0, 0.2), 'b': np.full(len(TIMES), 0.1)})
+    elec = smartmeter.ingest([str(tmp_path/'elec.csv')])
+    gas = smartmeter.ingest([str(tmp_path/'gas.csv')])
+    elec.save(str(tmp_path/'elec'))
+    columns = smartmeter.derive(smartmeter.Profile.load(str(tmp_path/'elec')), gas)
+
+    assert list(columns['meter']) == ['a', 'b', 'c']
+    night_share = night.sum()*0.5/(night.sum()*0.5 + (~night).sum()*0.1)
+    np.testing.assert_allclose(columns['elec_total_kWh'][:2], [night.sum()*0.5 + (~night).sum()*0.1, 17520*0.2])
+    np.testing.assert_allclose(columns['pc_elec_second_tariff'][:2], [night_share, night.mean()])
+    assert np.isnan(columns['elec_total_kWh'][2]) and columns['elec_coverage'][2] == pytest.approx(11/12)
+
+    np.testing.assert_allclose(columns['gas_total_kWh'], [winter.sum()*2.0 + (~winter).sum()*0.2, 17520*0.1, 0])
+    gas_hw_kWhperL = 4200*engine.hw_temp_raise_default/(3600*1000*engine.boiler_hw_eff)
+    np.testing.assert_allclose(columns['hw_lday'][:2], np.array([0.2, 0.1])*48/gas_hw_kWhperL)
+    np.testing.assert_array_equal(columns['is_hw_gas'], [True, True, False])
+
+
+def test_pandas_reader_gives_the_same_profile(tmp_path, monkeypatch):
+    _write_readings(tmp_path/'elec.csv', {'a': np.arange(len(TIMES)) % 7, 'b': np.full(len(TIMES), 0.2)})
+    expected = smartmeter.ingest([str(tmp_path/'elec.csv')])
+    blocks = smartmeter.Profile()
+    for block in smartmeter.read_readings(str(tmp_path/'elec.csv'), block_bytes=1 << 16):
+        blocks.add(*block)
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+    with_pandas = smartmeter.ingest([str(tmp_path/'elec.csv')])
+    for profile in (blocks, with_pandas):
+        assert profile.meters == expected.meters
+        np.testing.assert_allclose(profile.kWh[:2], expected.kWh[:2])
+        np.testing.assert_array_equal(profile.count[:2], expected.count[:2])
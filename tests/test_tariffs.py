@@ -0,0 +1,78 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+import numpy as np
+
+import engine
+import tariffs
+
+COSY = tariffs.Tariff.time_of_use(26.0, 50.0, [(0, 6, 14.0), (16, 3, 40.0)], 'cosy')
+
+
+def _homes(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {'gas_total_kWh': rng.uniform(5000, 30000, n), 'elec_total_kWh': rng.uniform(1500, 6000, n),
+            'is_cook_gas': rng.random(n) < 0.5, 'switch_tariff_for_hp': False, 'elec_unit': 26.0,
+            'elec_stand': 50.0}
+
+
+def test_resample_keeps_rates_and_totals():
+    rates = COSY.rates
+    np.testing.assert_allclose(tariffs.resample(rates, 24), rates.reshape(24, 2).mean(axis=1))
+    np.testing.assert_allclose(tariffs.resample(tariffs.resample(rates, 17520), 48), rates)
+    shape = tariffs.LOAD_SHAPES['Heating']
+    for slots in tariffs.RESOLUTIONS:
+        assert np.isclose(tariffs.resample(shape, slots, is_share=True).sum(), 1)
+
+
+def test_shift_out_of_keeps_daily_totals():
+    shape = tariffs.resample(tariffs.LOAD_SHAPES['Heating'], 8760, is_share=True)
+    mask = np.tile((np.arange(24) >= 16) & (np.arange(24) < 19), 365)
+    shifted = tariffs.shift_out_of(shape, mask)
+    assert (shifted[mask] == 0).all()
+    np.testing.assert_allclose(shifted.reshape(365, 24).sum(axis=1), shape.reshape(365, 24).sum(axis=1))
+
+
+def test_flat_tariff_matches_engine():
+    homes = _homes(50)
+    flat = tariffs.Tariff.flat(26.0, 50.0)
+    expected = engine.calculate(homes)
+    results = engine.calculate(homes, hp_tariff=flat.compile().hp_tariff())
+    for case, res in expected.items():
+        np.testing.assert_allclose(results[case]['costs'], res['costs'])
+    elec_energy = expected['Typical HP Install']['elec_energy']
+    bills = tariffs.annual_costs(elec_energy, [flat, COSY])
+    np.testing.assert_allclose(bills[:, 0], elec_energy.sum(axis=0)*0.26 + 50.0*3.65)
+    assert flat.compile() is tariffs.Tariff.flat(26.0, 50.0).compile()
+
+
+def test_hp_tariff_follows_peak_off_per_home():
+    compiled = COSY.compile()
+    homes = {'gas_total_kWh': np.array([15000., 15000.]), 'turn_off_hp_in_peak_hours': np.array([False, True])}
+    res = engine.calculate(homes, hp_tariff=compiled.hp_tariff())['Typical HP Install']
+    through = engine.calculate(homes, hp_tariff=compiled.hp_tariff(peak_off=False))['Typical HP Install']
+    off = engine.calculate(homes, hp_tariff=compiled.hp_tariff(peak_off=True))['Typical HP Install']
+    np.testing.assert_allclose(res['costs_total'], [through['costs_total'][0], off['costs_total'][1]])
+    #avoiding the peak only moves heating to cheaper hours
+    heat_rates = compiled.component_rates()[0], compiled.component_rates(peak_off=True)[0]
+    assert heat_rates[1] < heat_rates[0]
+    np.testing.assert_allclose(off['costs'][3] - through['costs'][3],
+                               through['elec_energy'][0]*(heat_rates[1] - heat_rates[0]))
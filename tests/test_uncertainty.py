@@ -0,0 +1,54 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+import numpy as np
+
+import engine
+import uncertainty
+
+
+def test_saving_falls_as_elec_unit_rises():
+    samples = uncertainty.simulate({'gas_total_kWh': 15000}, {'elec_unit': ('uniform', 15, 45)}, 2000, seed=1)
+    inputs = uncertainty.sample_inputs({'elec_unit': ('uniform', 15, 45)}, 2000, seed=1)
+    order = np.argsort(inputs['elec_unit'][0])
+    saving = samples['Typical HP Install']['saving'][0][order]
+    assert np.all(np.diff(saving) <= 1e-9)
+    assert saving[0] > saving[-1]
+
+
+def test_linked_rates_follow_elec_unit():
+    household = {'gas_total_kWh': 15000, 'elec_unit': 20.0, 'elec_unit_cosy_offpeak': 10.0}
+    fixed = dict(household, elec_unit=30.0, elec_unit_cosy_offpeak=15.0,
+                 elec_unit_cosy_standard=engine.DEFAULTS['elec_unit_cosy_standard']*1.5,
+                 elec_unit_cosy_peak=engine.DEFAULTS['elec_unit_cosy_peak']*1.5)
+    samples = uncertainty.simulate(household, {'elec_unit': ('constant', 30.0)}, 3)
+    expected = engine.calculate(fixed)['Typical HP Install']['costs_total'][0]
+    np.testing.assert_allclose(samples['Typical HP Install']['costs_total'][0], expected)
+
+
+def test_sampled_linked_rate_is_kept():
+    distributions = {'elec_unit': ('constant', 40.0), 'elec_unit_cosy_standard': ('constant', 20.0)}
+    samples = uncertainty.simulate({'gas_total_kWh': 15000}, distributions, 2)
+    inputs = {'gas_total_kWh': 15000, 'elec_unit': 40.0, 'elec_unit_cosy_standard': 20.0,
+              'elec_unit_cosy_offpeak': engine.DEFAULTS['elec_unit_cosy_offpeak']*40/engine.DEFAULTS['elec_unit'],
+              'elec_unit_cosy_peak': engine.DEFAULTS['elec_unit_cosy_peak']*40/engine.DEFAULTS['elec_unit']}
+    expected = engine.calculate(inputs)['Typical HP Install']['costs_total'][0]
+    np.testing.assert_allclose(samples['Typical HP Install']['costs_total'][0], expected)
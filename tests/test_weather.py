@@ -0,0 +1,63 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import hourly
+import weather
+
+
+def test_store_round_trip(tmp_path):
+    temperature, series_region, series_year, regions = weather.synthetic_years({'North': 8.0, 'South': 11.0},
+                                                                               years=[2015, 2016])
+    weather.WeatherStore.create(str(tmp_path), temperature, series_region, series_year, regions, dtype='float32')
+    store = weather.WeatherStore(str(tmp_path))
+    assert len(store) == 4 and store.years == [2015, 2016]
+    np.testing.assert_allclose(store.year(2016), temperature[2:].astype(np.float32))
+    np.testing.assert_array_equal(store.temperature[store.row('South', 2015)], temperature[1].astype(np.float32))
+    with pytest.raises(KeyError):
+        store.row('East', 2015)
+    with pytest.raises(KeyError):
+        store.row('North', 2020)
+
+
+def test_binned_seasonal_cop_matches_hourly(tmp_path):
+    store = weather.synthetic(str(tmp_path), years=[2015], dtype='float32')
+    flow_temp = np.array([35.0, 55.0])
+    temperature = np.asarray(store.temperature, dtype=float)
+    heat = np.maximum(store.base_temp - temperature, 0)
+    elec = heat[None]/hourly.cop(temperature[None], flow_temp[:, None, None])
+    np.testing.assert_allclose(store.seasonal_cop(flow_temp), heat.sum(axis=-1)/elec.sum(axis=-1), rtol=0.01)
+
+
+def test_convert_fills_gaps_and_skips_sparse_years(tmp_path):
+    hours = pd.date_range('2015-01-01', '2017-01-01', freq='h', inclusive='left')
+    df = pd.DataFrame({'region': 'Thames', 'time': hours, 'temperature': 10.0})
+    #a few hours missing in 2015, most of 2016
+    df = df.drop(index=list(range(100, 110)) + list(range(8760 + 100, 8760 + 8000)))
+    df.to_csv(tmp_path/'temperatures.csv', index=False)
+    store, skipped = weather.convert(str(tmp_path/'temperatures.csv'), str(tmp_path/'store'))
+    assert store.years == [2015] and store.regions == ['Thames']
+    assert [(region, year) for region, year, _ in skipped] == [('Thames', 2016)]
+    np.testing.assert_array_equal(store.year(2015), 10.0)
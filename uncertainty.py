@@ -0,0 +1,153 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler 
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Monte Carlo uncertainty on the calculator results.
+#
+# Any numeric engine input (heat pump SCOPs, boiler efficiencies, hot water
+# temperature raise, unit prices, ...) can be given a distribution.  All the
+# samples for all the households are evaluated in one engine.calculate call,
+# and the spread of costs, emissions, energy and savings is summarised as
+# quantiles and histograms.  The heat pump's Cosy Octopus rates move with a
+# sampled 'elec_unit' unless they are sampled themselves.
+#
+#   distributions = {'hp_heat_scop_typ': ('normal', 3.4, 0.4),
+#                    'elec_unit': ('triangular', 22, 26.35, 35)}
+#   samples = simulate({'gas_total_kWh': 15000}, distributions, 100000, seed=1)
+#   summary = summarise(samples)
+#   summary['Typical HP Install']['saving']['quantiles']  # P10/P50/P90 bill saving
+
+import numpy as np
+
+import engine
+
+# distributions that can be sampled, with the numpy Generator arguments they take
+DISTRIBUTIONS = {'constant': ('value',),
+                 'uniform': ('low', 'high'),
+                 'normal': ('loc', 'scale'),
+                 'triangular': ('left', 'mode', 'right'),
+                 'lognormal': ('mean', 'sigma')}
+
+# samples are clipped to the limits of the matching inputs on the page
+BOUNDS = {'boiler_heat_eff': (0.01, 1.0), 'boiler_hw_eff': (0.01, 1.0),
+          'hp_heat_scop_typ': (0.1, 10.0), 'hp_hw_cop_typ': (0.1, 10.0),
+          'hp_heat_scop_hi': (0.1, 10.0), 'hp_hw_cop_hi': (0.1, 10.0),
+          'hw_temp_raise': (1, 100), 'efficiency_boost': (0.0, 1.0)}
+PRICE_BOUNDS = (0.0, 100.0)
+
+# rates scaled with a sampled 'elec_unit', keeping their ratio to it
+LINKED_RATES = ('elec_unit_cosy_standard', 'elec_unit_cosy_offpeak', 'elec_unit_cosy_peak')
+
+METRICS = ['costs_total', 'emissions_total', 'energy_total']
+QUANTILES = (0.1, 0.5, 0.9)
+HIST_BINS = 50
+
+
+def sample_inputs(distributions, n_samples, seed=None, n_homes=1):
+    """
+    distributions - dict of engine input name: (distribution name, *arguments),
+                    see DISTRIBUTIONS
+    n_samples - samples per household
+    seed - seed or numpy Generator, the same seed gives the same samples
+    n_homes - number of households to draw independent samples for
+    returns dict of engine input name: array of shape (n_homes, n_samples)
+    """
+    rng = np.random.default_rng(seed)
+    samples = {}
+    #draw in name order so results don't depend on the order of the dict
+    for name in sorted(distributions):
+        if name not in engine.DEFAULTS or name in engine.FLAG_INPUTS:
+            raise KeyError(f'{name} is not a numeric engine input')
+        kind, *args = distributions[name]
+        if kind not in DISTRIBUTIONS or len(args) != len(DISTRIBUTIONS[kind]):
+            raise ValueError(f'{name}: expected one of {sorted(DISTRIBUTIONS)} with its arguments, got {kind}{tuple(args)}')
+        size = (n_homes, n_samples)
+        if kind == 'constant':
+            val = np.full(size, float(args[0]))
+        else:
+            val = getattr(rng, kind)(*args, size=size)
+        low, high = BOUNDS.get(name, PRICE_BOUNDS if ('unit' in name or 'stand' in name) else (-np.inf, np.inf))
+        samples[name] = np.clip(val, low, high)
+    return samples
+
+
+def simulate(household, distributions, n_samples=10000, seed=None):
+    """
+    household - mapping of engine inputs, scalars for one household or columns
+                for several
+    distributions - sampled inputs, see sample_inputs - these replace any value
+                    given in household; LINKED_RATES not sampled themselves
+                    follow a sampled 'elec_unit'
+    n_samples - samples per household
+    seed - random seed
+    returns dict of case name: dict of metric: array of shape (n_homes, n_samples)
+    for METRICS, plus 'saving' (current cost less case cost) for heat pump cases
+    """
+    n_homes = max([np.size(val) for val in household.values()] + [1])
+    sampled = sample_inputs(distributions, n_samples, seed, n_homes)
+
+    inputs = {name: np.repeat(np.asarray(val).reshape(-1), n_samples) if np.size(val) > 1 else val
+              for name, val in household.items() if name not in sampled}
+    inputs.update({name: val.reshape(-1) for name, val in sampled.items()})
+    if 'elec_unit' in sampled:
+        base = np.asarray(household.get('elec_unit', engine.DEFAULTS['elec_unit']), dtype=float).reshape(-1, 1)
+        scale = np.divide(sampled['elec_unit'], base, out=np.ones_like(sampled['elec_unit']), where=base > 0)
+        for name in LINKED_RATES:
+            if name not in sampled:
+                rate = np.asarray(household.get(name, engine.DEFAULTS[name]), dtype=float).reshape(-1, 1)
+                inputs[name] = (rate*scale).reshape(-1)
+    results = engine.calculate(inputs)
+
+    samples = {}
+    for case in engine.CASE_NAMES:
+        names = METRICS + (['saving'] if case != 'Current' else [])
+        samples[case] = {name: engine.metric(results, case, name).reshape(n_homes, n_samples) for name in names}
+    return samples
+
+
+def _histograms(values, bins):
+    #histogram of each row with its own range, in one bincount
+    n_rows = values.shape[0]
+    low = values.min(axis=1, keepdims=True)
+    high = values.max(axis=1, keepdims=True)
+    width = np.where(high > low, (high - low)/bins, 1.0)
+    idx = np.clip(((values - low)/width).astype(np.int64), 0, bins - 1)
+    counts = np.bincount((idx + bins*np.arange(n_rows)[:, None]).reshape(-1), minlength=n_rows*bins)
+    edges = low + width*np.arange(bins + 1)
+    return counts.reshape(n_rows, bins), edges
+
+
+def summarise(samples, quantiles=QUANTILES, bins=HIST_BINS):
+    """
+    samples - output of simulate
+    quantiles - quantiles to report, e.g. (0.1, 0.5, 0.9) for P10/P50/P90
+    bins - number of histogram bins, spanning the range of each household's samples
+    returns dict of case: metric: {'mean': (n_homes,), 'quantiles': {q: (n_homes,)},
+    'histogram': (counts (n_homes, bins), edges (n_homes, bins+1))}
+    """
+    summary = {}
+    for case, metrics in samples.items():
+        summary[case] = {}
+        for metric, values in metrics.items():
+            qs = np.quantile(values, quantiles, axis=1)
+            summary[case][metric] = {'mean': values.mean(axis=1),
+                                     'quantiles': dict(zip(quantiles, qs)),
+                                     'histogram': _histograms(values, bins)}
+    return summary
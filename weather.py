@@ -0,0 +1,293 @@
+# HEAT PUMP RUNNING COSTS AND EMISSIONS ESTIMATOR
+# A calculator for estimating the impact of upgrading from a gas boiler
+# to a heat pump on running costs, CO2 emissions and energy used.
+#
+# Copyright (C) 2022  Chris Warwick, Green Heat Coop Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# For enquiries about using this source code, please contact:
+# hello@greenheatcoop.co.uk
+
+# Store of hourly outdoor temperature years by weather region.
+#
+#   python weather.py convert temperatures.csv weather/ [--dtype float16]
+#   python weather.py synthetic weather/ [--years 2010-2019]
+#
+# A store is a directory of .npy arrays, opened memory-mapped so any number of
+# worker processes share the same pages, and an index.json of the regions and
+# years of each row:
+#
+#   temperature.npy    (series, 8760) hourly temperatures, float16 or float32
+#   degree_hours.npy   (series, 12) heating degree-hours of each month, below HEAT_BASE_TEMP
+#   bin_hours.npy      (series, bins) hours in each 1 degC temperature bin
+#
+# Years are 365 days (29 February is dropped) to line up with hourly.py.  The
+# binned hours give seasonal COPs of every region and year without reading the
+# hourly series (see WeatherStore.seasonal_cop).
+#
+# The CSV to convert has one row per hour: 'region', 'time' (anything pandas
+# parses as a date and time) and 'temperature' (degC).
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+import hourly
+
+STORE_VERSION = 1
+#temperature bins, 1 degC wide: bin i holds temperatures in [BIN_MIN + i, BIN_MIN + i + 1)
+BIN_MIN, BIN_MAX = -25, 40
+BIN_CENTRES = np.arange(BIN_MIN, BIN_MAX) + 0.5
+#years with more hours missing than this are left out, shorter gaps are interpolated
+MAX_MISSING = 0.05
+DTYPES = ['float16', 'float32']
+
+#SAP 10.2 weather regions, with the rough annual mean temperature (degC) the
+#synthetic dataset gives each of them
+REGIONS = {'Thames': 11.2, 'South East England': 10.6, 'Southern England': 10.7, 'South West England': 10.9,
+           'Severn Wales / Severn England': 10.6, 'Midlands': 9.9, 'West Pennines Wales / West Pennines England': 9.9,
+           'North West England / South West Scotland': 9.3, 'Borders Scotland / Borders England': 8.8,
+           'North East England': 9.2, 'East Pennines': 9.8, 'East Anglia': 10.3, 'Wales': 9.9,
+           'West Scotland': 9.1, 'East Scotland': 8.6, 'North East Scotland': 8.3, 'Highland': 8.0,
+           'Western Isles': 8.9, 'Orkney': 8.2, 'Shetland': 7.8, 'Northern Ireland': 9.4}
+
+_MONTH_DAYS = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+_MONTH_OF_HOUR = np.repeat(np.arange(12), np.array(_MONTH_DAYS)*24)
+
+
+def derived_series(temperature, base_temp=hourly.HEAT_BASE_TEMP):
+    """
+    temperature - (series, 8760) hourly temperatures
+    returns (series, 12) monthly heating degree-hours and (series, bins) hours in each temperature bin
+    """
+    temperature = np.asarray(temperature, dtype=np.float32)
+    degree_hours = np.zeros((len(temperature), 12), dtype=np.float32)
+    np.add.at(degree_hours.T, _MONTH_OF_HOUR, np.maximum(base_temp - temperature, 0).T)
+    bins = np.clip(np.floor(temperature - BIN_MIN).astype(np.intp), 0, len(BIN_CENTRES) - 1)
+    #count the bins of all series at once by offsetting each series' bin numbers
+    offset = bins + len(BIN_CENTRES)*np.arange(len(temperature))[:, None]
+    bin_hours = np.bincount(offset.reshape(-1), minlength=len(temperature)*len(BIN_CENTRES))
+    return degree_hours, bin_hours.reshape(len(temperature), len(BIN_CENTRES)).astype(np.float32)
+
+
+class WeatherStore:
+    """
+    Hourly temperature years by region, memory-mapped from a store directory
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'index.json')) as f:
+            index = json.load(f)
+        if index['version'] != STORE_VERSION:
+            raise ValueError(f'{path} is a version {index["version"]} weather store, expected {STORE_VERSION}')
+        self.regions = index['regions']
+        self.base_temp = index['base_temp']
+        self.series_region = np.array(index['series_region'], dtype=np.intp)
+        self.series_year = np.array(index['series_year'], dtype=np.intp)
+        self._rows = {(r, y): i for i, (r, y) in enumerate(zip(self.series_region.tolist(), self.series_year.tolist()))}
+        self.temperature = np.load(os.path.join(path, 'temperature.npy'), mmap_mode='r')
+        self.degree_hours = np.load(os.path.join(path, 'degree_hours.npy'), mmap_mode='r')
+        self.bin_hours = np.load(os.path.join(path, 'bin_hours.npy'), mmap_mode='r')
+
+    @classmethod
+    def create(cls, path, temperature, series_region, series_year, regions, dtype='float16'):
+        """
+        path - directory to write the store to
+        temperature - (series, 8760) hourly temperatures
+        series_region, series_year - region code (into regions) and year of each series
+        regions - list of region names
+        dtype - 'float16' (about 0.03 degC resolution) or 'float32' for the temperatures
+        returns the store, opened
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f'dtype must be one of {", ".join(DTYPES)}')
+        temperature = np.asarray(temperature)
+        if temperature.ndim != 2 or temperature.shape[1] != hourly.HOURS_PER_YEAR:
+            raise ValueError(f'temperature must be (series, {hourly.HOURS_PER_YEAR}), got {temperature.shape}')
+        keys = list(zip(np.asarray(series_region).tolist(), np.asarray(series_year).tolist()))
+        if len(set(keys)) != len(keys):
+            raise ValueError('each region and year can only be in the store once')
+        os.makedirs(path, exist_ok=True)
+        degree_hours, bin_hours = derived_series(temperature)
+        np.save(os.path.join(path, 'temperature.npy'), temperature.astype(dtype))
+        np.save(os.path.join(path, 'degree_hours.npy'), degree_hours)
+        np.save(os.path.join(path, 'bin_hours.npy'), bin_hours)
+        index = {'version': STORE_VERSION, 'regions': list(regions), 'base_temp': hourly.HEAT_BASE_TEMP,
+                 'bin_min': BIN_MIN, 'bin_max': BIN_MAX,
+                 'series_region': [r for r, _ in keys], 'series_year': [y for _, y in keys]}
+        #the index goes last, so a store is only complete once it is there
+        with open(os.path.join(path, 'index.json'), 'w') as f:
+            json.dump(index, f)
+        return cls(path)
+
+    def __len__(self):
+        return len(self.series_region)
+
+    @property
+    def years(self):
+        return sorted(set(self.series_year.tolist()))
+
+    def region_code(self, region):
+        """
+        region - region name or code
+        returns region code
+        """
+        if isinstance(region, str):
+            try:
+                return self.regions.index(region)
+            except ValueError:
+                raise KeyError(f'no region {region!r} in {self.path}') from None
+        return int(region)
+
+    def row(self, region, year):
+        """
+        returns row of the series of region (name or code) and year
+        """
+        try:
+            return self._rows[(self.region_code(region), int(year))]
+        except KeyError:
+            raise KeyError(f'no year {year} for region {region!r} in {self.path}') from None
+
+    def year(self, year):
+        """
+        returns (regions, 8760) float64 temperatures of every region in year, in region
+        code order, e.g. for hourly.calculate(temperature=..., region=codes)
+        """
+        return np.stack([self.temperature[self.row(r, year)] for r in range(len(self.regions))]).astype(float)
+
+    def seasonal_cop(self, flow_temp, rows=None, base_temp=None):
+        """
+        flow_temp - heat pump flow temperature(s), degC, scalar or 1d array
+        rows - series to use, default all of them
+        base_temp - outdoor temperature above which no heating is needed, default the store's
+        returns (flow temps, series) seasonal COP of space heating with demand in
+        proportion to degree-hours, from the binned hours (hourly.cop of the bin centres)
+        """
+        base_temp = self.base_temp if base_temp is None else base_temp
+        bin_hours = self.bin_hours if rows is None else self.bin_hours[rows]
+        heat = bin_hours*np.maximum(base_temp - BIN_CENTRES, 0)
+        elec = heat @ (1/hourly.cop(BIN_CENTRES, np.atleast_1d(flow_temp)[:, None])).T
+        return heat.sum(axis=-1)[None, :]/elec.T
+
+
+def read_csv(path, regions=None):
+    """
+    path - CSV of 'region', 'time' and 'temperature' columns, one row per hour
+    regions - list of region names, so codes match another store; default in order found
+    returns (series, 8760) temperatures, region code and year of each series, the
+    region names and list of (region, year, fraction missing) left out
+    """
+    import pandas as pd
+
+    df = pd.read_csv(path, usecols=['region', 'time', 'temperature'])
+    df['time'] = pd.to_datetime(df['time']).dt.floor('h')
+    df = df[~((df['time'].dt.month == 2) & (df['time'].dt.day == 29))]
+    regions = list(regions) if regions is not None else list(dict.fromkeys(df['region'].astype(str)))
+    series, series_region, series_year, skipped = [], [], [], []
+    for (region, year), group in df.groupby([df['region'].astype(str), df['time'].dt.year], sort=True):
+        hours = pd.date_range(f'{year}-01-01', f'{year + 1}-01-01', freq='h', inclusive='left')
+        hours = hours[~((hours.month == 2) & (hours.day == 29))]
+        values = group.groupby('time')['temperature'].mean().reindex(hours)
+        missing = values.isna().mean()
+        if missing > MAX_MISSING:
+            skipped.append((region, year, float(missing)))
+            continue
+        if region not in regions:
+            regions.append(region)
+        series.append(values.interpolate(limit_direction='both').to_numpy())
+        series_region.append(regions.index(region))
+        series_year.append(year)
+    return np.array(series).reshape(-1, hourly.HOURS_PER_YEAR), series_region, series_year, regions, skipped
+
+
+def convert(csv_path, path, dtype='float16'):
+    """
+    csv_path - CSV of hourly temperatures, see read_csv
+    path - directory for the store
+    returns the store and the (region, year, fraction missing) left out
+    """
+    temperature, series_region, series_year, regions, skipped = read_csv(csv_path)
+    return WeatherStore.create(path, temperature, series_region, series_year, regions, dtype), skipped
+
+
+def synthetic_years(regions=None, years=range(2010, 2020), seed=0):
+    """
+    regions - dict of region name to annual mean temperature, default REGIONS
+    years - years to make
+    seed - random seed, the same seed always gives the same data
+    returns (series, 8760) temperatures, region code and year of each series and the
+    region names: hourly.synthetic_temperature of each region's mean, with weather
+    (a slowly varying random anomaly shared by nearby regions) on top
+    """
+    regions = REGIONS if regions is None else regions
+    rng = np.random.default_rng(seed)
+    names, means = list(regions), np.array(list(regions.values()))
+    years = list(years)
+    temperature = np.empty((len(years)*len(names), hourly.HOURS_PER_YEAR))
+    #AR(1) anomaly with a memory of a few days, mostly common to all regions
+    phi = np.exp(-1/72)
+    for y, year in enumerate(years):
+        shocks = 0.7*rng.normal(size=hourly.HOURS_PER_YEAR) + 0.3*rng.normal(size=(len(names), hourly.HOURS_PER_YEAR))
+        anomaly = np.empty_like(shocks)
+        state = np.zeros(len(names))
+        for i in range(hourly.HOURS_PER_YEAR):
+            state = phi*state + np.sqrt(1 - phi**2)*3.0*shocks[:, i]
+            anomaly[:, i] = state
+        base = np.stack([hourly.synthetic_temperature(mean) for mean in means])
+        temperature[y*len(names):(y + 1)*len(names)] = base + anomaly + rng.normal(0, 0.5, (len(names), 1))
+    series_region = np.tile(np.arange(len(names)), len(years))
+    series_year = np.repeat(years, len(names))
+    return temperature, series_region, series_year, names
+
+
+def synthetic(path, regions=None, years=range(2010, 2020), seed=0, dtype='float16'):
+    """
+    path - directory for the store
+    regions, years, seed - see synthetic_years
+    returns the store of synthetic years
+    """
+    return WeatherStore.create(path, *synthetic_years(regions, years, seed), dtype=dtype)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build a weather-year store.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    conv = commands.add_parser('convert', help='build a store from a CSV of hourly temperatures')
+    conv.add_argument('csv', help="CSV with 'region', 'time' and 'temperature' columns")
+    conv.add_argument('store', help='directory for the store')
+    conv.add_argument('--dtype', choices=DTYPES, default='float16')
+    synth = commands.add_parser('synthetic', help='build a store of synthetic years for every SAP region')
+    synth.add_argument('store', help='directory for the store')
+    synth.add_argument('--years', default='2010-2019', help='first-last year')
+    synth.add_argument('--seed', type=int, default=0)
+    synth.add_argument('--dtype', choices=DTYPES, default='float16')
+    args = parser.parse_args(argv)
+
+    if args.command == 'convert':
+        store, skipped = convert(args.csv, args.store, args.dtype)
+        for region, year, missing in skipped:
+            print(f'left out {region} {year}: {missing:.0%} of hours missing', file=sys.stderr)
+    else:
+        first, _, last = args.years.partition('-')
+        store = synthetic(args.store, years=range(int(first), int(last or first) + 1), seed=args.seed,
+                          dtype=args.dtype)
+    print(f'{len(store):,} region years of {len(store.regions)} regions in {args.store}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()